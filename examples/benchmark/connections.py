@@ -35,6 +35,19 @@ for loop in range(ITERATIONS):
 duration = time.time() - begin
 print("%d new proxy calls in %.3f sec = %.0f calls/sec" % (ITERATIONS, duration, ITERATIONS / duration))
 
+print("Timing pooled proxy creation+connect+methodcall speed...")
+pool = Pyro4.core.ConnectionPool()
+ITERATIONS = 2000
+begin = time.time()
+for loop in range(ITERATIONS):
+    if loop % 500 == 0:
+        print(loop)
+    with pool.proxy(uri) as p:
+        p.oneway()
+duration = time.time() - begin
+print("%d new pooled proxy calls in %.3f sec = %.0f calls/sec" % (ITERATIONS, duration, ITERATIONS / duration))
+pool.close()
+
 print("Timing proxy methodcall speed...")
 p = Pyro4.core.Proxy(uri)
 p.oneway()
@@ -0,0 +1,46 @@
+from __future__ import print_function
+import time
+import socket
+import threading
+
+import Pyro4
+from Pyro4 import message, socketutil, util
+import bench
+
+
+# Measures the server side overhead of handling a call (without the network round trip):
+# a request for the echo method is processed by the daemon, and the response is sent into a socketpair.
+
+ITERATIONS = 50000
+
+
+def drain(sock):
+    while sock.recv(65536):
+        pass
+
+
+def run(daemon, conn, serializer):
+    request = (serializer, "example.benchmark", "echo", ("hello",), {})
+    msg = message.Message(message.MSG_INVOKE, b"", serializer.serializer_id, 0, 1)
+    begin = time.time()
+    for _ in range(ITERATIONS):
+        daemon._handleRequestMessage(conn, msg, request)
+    return time.time() - begin
+
+
+if not hasattr(socket, "socketpair"):
+    print("this benchmark requires socket.socketpair")
+else:
+    s1, s2 = socket.socketpair()
+    conn = socketutil.SocketConnection(s1)
+    receiver = threading.Thread(target=drain, args=(s2,))
+    receiver.daemon = True
+    receiver.start()
+    with Pyro4.Daemon(port=0) as daemon:
+        daemon.register(bench.bench, "example.benchmark")
+        serializer = util.get_serializer("serpent")
+        run(daemon, conn, serializer)   # warm up
+        duration = run(daemon, conn, serializer)
+        print("%d echo calls handled in %.3f sec = %.1f usec per call" % (ITERATIONS, duration, 1e6 * duration / ITERATIONS))
+    conn.close()
+    s2.close()
@@ -0,0 +1,52 @@
+from __future__ import print_function
+import time
+import socket
+import threading
+
+from Pyro4 import message, socketutil
+
+
+# Compares the cost of sending large messages as one concatenated bytes object (to_bytes)
+# versus sending them with a single scatter-gather call (to_buffers + sendv).
+
+SIZES_MB = [1, 10, 50]
+ITERATIONS = 20
+
+
+def drain(sock, total):
+    while total > 0:
+        chunk = sock.recv(min(total, 1024 * 1024))
+        if not chunk:
+            break
+        total -= len(chunk)
+
+
+def bench(size_mb, vectored):
+    data = b"x" * (size_mb * 1024 * 1024)
+    msg = message.Message(message.MSG_RESULT, data, 1, 0, 1, annotations={"CORR": b"0123456789abcdef"})
+    s1, s2 = socket.socketpair()
+    conn = socketutil.SocketConnection(s1)
+    msg_size = len(msg.to_bytes())
+    receiver = threading.Thread(target=drain, args=(s2, msg_size * ITERATIONS))
+    receiver.start()
+    begin = time.time()
+    for _ in range(ITERATIONS):
+        if vectored:
+            conn.sendv(msg.to_buffers())
+        else:
+            conn.send(msg.to_bytes())
+    receiver.join()
+    duration = time.time() - begin
+    conn.close()
+    s2.close()
+    return duration
+
+
+if not hasattr(socket, "socketpair") or not hasattr(socket.socket, "sendmsg"):
+    print("this benchmark requires socket.socketpair and socket.sendmsg")
+else:
+    for size in SIZES_MB:
+        joined = bench(size, False)
+        vectored = bench(size, True)
+        print("%3d Mb message: to_bytes %.3f sec, to_buffers %.3f sec  (copy overhead %.2f ms per Mb)" %
+              (size, joined, vectored, 1000.0 * (joined - vectored) / (ITERATIONS * size)))
@@ -102,3 +102,29 @@ print("--> time until everything completed: %.2f" % duration)
 print("--> work done on the server: %d" % proxy.get_work_done())
 print("you can see that this time the 10 threads didn't have to wait for each other,")
 print("and that they got a lot more work done because they really ran in parallel.")
+
+print("\nFinally, the same again with a single proxy that is shared, but that pipelines the calls.")
+print("Starting 10 threads with the same pipelined proxy that all call the work() method.")
+proxy = Pyro4.core.Proxy(proxy._pyroUri)
+proxy._pyroPipelined = True
+proxy.reset_work()
+stop = False
+threads = []
+for i in range(10):
+    thread = threading.Thread(target=myThread2, args=[proxy])
+    thread.setDaemon(False)
+    threads.append(thread)
+    thread.start()
+
+print("waiting 5 seconds")
+start = time.time()
+time.sleep(5)
+print("waiting until threads have stopped...")
+stop = True
+for thread in threads:
+    thread.join()
+duration = int(time.time() - start)
+print("--> time until everything completed: %.2f" % duration)
+print("--> work done on the server: %d" % proxy.get_work_done())
+print("you can see that the threads didn't have to wait for each other this time either,")
+print("even though they all used the same proxy and its single connection to the server.")
@@ -0,0 +1,436 @@
+"""
+Asyncio support: a proxy that is used with async/await, and wire message helpers for asyncio streams.
+This module requires Python 3.5 or newer.
+
+Pyro - Python Remote Objects.  Copyright by Irmen de Jong (irmen@razorvine.net).
+"""
+
+import asyncio
+import collections
+import logging
+import sys
+import time
+from Pyro4 import errors, util, constants, message, core, socketutil, futures
+from Pyro4.configuration import config
+
+
+__all__ = ["AsyncProxy", "read_message", "write_message"]
+
+log = logging.getLogger("Pyro4.aio")
+
+
+class _ReceivedMessage(object):
+    """The parts of a wire message that have been read from a stream, presented as a connection to Message.recv"""
+    def __init__(self, parts, writer):
+        self.parts = collections.deque(parts)
+        self.writer = writer
+
+    def __str__(self):
+        return "<stream %s>" % (self.writer.get_extra_info("peername"),)
+
+    def recv(self, size):
+        return self.parts.popleft()
+
+    def close(self):
+        self.writer.close()
+
+
+async def read_message(reader, writer, requiredMsgTypes=None, hmac_key=None):
+    """
+    Read a Pyro wire message from an asyncio stream. The message is processed and validated
+    by :meth:`Pyro4.message.Message.recv`, just like a message received from a socket connection.
+    The writer of the stream is closed when the message is too large.
+    """
+    parts = await _read_message_parts(reader)
+    return message.Message.recv(_ReceivedMessage(parts, writer), requiredMsgTypes, hmac_key)
+
+
+async def _read_message_parts(reader):
+    """read the header, annotations and data of a wire message from an asyncio stream, as separate parts"""
+    try:
+        header = await reader.readexactly(message.Message.header_size)
+        msg = message.Message.from_header(header)
+        parts = [header]
+        if not 0 < config.MAX_MESSAGE_SIZE < (msg.data_size + msg.annotations_size):
+            # (a message that is too large is not read; Message.recv reports the error)
+            if msg.annotations_size:
+                parts.append(await reader.readexactly(msg.annotations_size))
+            parts.append(await reader.readexactly(msg.data_size))
+            size = msg.data_size
+            while msg.flags & message.FLAGS_FRAGMENT and not 0 < config.MAX_MESSAGE_SIZE < size:
+                # the other fragments of a large message follow, each with a header of its own
+                header = await reader.readexactly(message.Message.header_size)
+                msg = message.Message.from_header(header)
+                parts.append(header)
+                parts.append(await reader.readexactly(msg.data_size))
+                size += msg.data_size
+        return parts
+    except asyncio.IncompleteReadError as x:
+        err = errors.ConnectionClosedError("receiving: not enough data")
+        err.partialData = x.partial
+        raise err
+    except (ConnectionError, OSError) as x:
+        raise errors.ConnectionClosedError("receiving: connection lost: " + str(x))
+
+
+def write_message(writer, msg):
+    """Write a Pyro wire message to an asyncio stream (await the writer's drain() afterwards)"""
+    writer.writelines(msg.to_buffers())
+
+
+class _AsyncRemoteMethod(object):
+    """method call abstraction for the asyncio proxy, calling it returns a coroutine"""
+    def __init__(self, proxy, name):
+        self.__proxy = proxy
+        self.__name = name
+
+    def __getattr__(self, name):
+        return _AsyncRemoteMethod(self.__proxy, "%s.%s" % (self.__name, name))
+
+    def __call__(self, *args, **kwargs):
+        return self.__proxy._pyroInvoke(self.__name, args, kwargs)
+
+
+class AsyncProxy(object):
+    """
+    Pyro proxy for a remote object, to be used from asyncio code: calling a method returns a coroutine,
+    so you ``await proxy.method(...)``. The proxy uses a single connection on which many calls can be
+    in progress at the same time (they are pipelined); the responses are matched to the calls as they arrive.
+    A remote iterator or generator result can be iterated over with ``async for``.
+    The proxy must be closed with :meth:`_pyroRelease` (or use it with ``async with``).
+
+    .. automethod:: _pyroBind
+    .. automethod:: _pyroRelease
+    .. automethod:: _pyroAnnotations
+    .. automethod:: _pyroResponseAnnotations
+    .. attribute:: _pyroTimeout
+
+        The timeout in seconds for calls on this proxy. Defaults to the COMMTIMEOUT config item.
+
+    .. autoattribute:: _pyroHmacKey
+    .. attribute:: _pyroSerializer
+
+        Name of the serializer to use by this proxy, allows you to override the default setting.
+
+    .. attribute:: _pyroHandshake
+
+        The data object that should be sent in the initial connection handshake message.
+    """
+    __pyroAttributes = frozenset(
+        ["__getnewargs__", "__getnewargs_ex__", "__getinitargs__", "_pyroUri", "_pyroMethods", "_pyroAttrs", "_pyroOneway",
+         "_pyroTimeout", "_pyroSerializer", "_pyroHandshake", "_pyroSeq", "_AsyncProxy__hmacKey", "_AsyncProxy__reader",
+         "_AsyncProxy__writer", "_AsyncProxy__readerTask", "_AsyncProxy__responses", "_AsyncProxy__connectLock",
+         "_AsyncProxy__objectId"])
+
+    def __init__(self, uri):
+        if isinstance(uri, str):
+            uri = core.URI(uri)
+        elif not isinstance(uri, core.URI):
+            raise TypeError("expected Pyro URI")
+        self._pyroUri = uri
+        self._pyroMethods = set()
+        self._pyroAttrs = set()
+        self._pyroOneway = set()
+        self._pyroTimeout = config.COMMTIMEOUT
+        self.__hmacKey = None
+        self._pyroSerializer = None
+        self._pyroHandshake = "hello"
+        self._pyroSeq = 0
+        self.__reader = self.__writer = self.__readerTask = None
+        self.__responses = {}  # seq -> future, for the calls waiting for their response
+        self.__connectLock = None
+        self.__objectId = uri.object
+        util.get_serializer(config.SERIALIZER)  # assert that the configured serializer is available
+
+    @property
+    def _pyroHmacKey(self):
+        """the HMAC key (bytes) that this proxy uses"""
+        return self.__hmacKey
+
+    @_pyroHmacKey.setter
+    def _pyroHmacKey(self, value):
+        if value and type(value) is not bytes:
+            value = value.encode("utf-8")  # convert to bytes
+        self.__hmacKey = value
+
+    def __getattr__(self, name):
+        if name in AsyncProxy.__pyroAttributes:
+            raise AttributeError(name)
+        if name in self._pyroAttrs:
+            return self._pyroInvoke("__getattr__", (name,), None)
+        if self._pyroMethods and name not in self._pyroMethods and config.METADATA:
+            raise AttributeError("remote object '%s' has no exposed attribute or method '%s'" % (self._pyroUri, name))
+        return _AsyncRemoteMethod(self, name)
+
+    def __repr__(self):
+        connected = "connected" if self.__writer else "not connected"
+        return "<%s.%s at 0x%x; %s; for %s>" % (self.__class__.__module__, self.__class__.__name__,
+                                                id(self), connected, self._pyroUri)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self._pyroRelease()
+
+    async def _pyroBind(self):
+        """
+        Connect to the remote Pyro daemon (if not connected yet), which also obtains the object's metadata.
+        Returns true if a new connection was made. Remote attributes are only accessible after this.
+        """
+        if self.__connectLock is None:
+            self.__connectLock = asyncio.Lock()
+        async with self.__connectLock:
+            if self.__writer is not None:
+                return False
+            await self.__connect()
+            return True
+
+    async def _pyroRelease(self):
+        """close the connection to the pyro daemon"""
+        writer = self.__writer
+        if writer is None:
+            return
+        self.__writer = self.__reader = None
+        if self.__readerTask is not None:
+            self.__readerTask.cancel()
+            self.__readerTask = None
+        self.__failPendingCalls(errors.ConnectionClosedError("the proxy connection has been closed"))
+        writer.close()
+        if hasattr(writer, "wait_closed"):
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        log.debug("connection released")
+
+    def _pyroAnnotations(self):
+        """Override to return a dict with custom user annotations to be sent with each request message."""
+        return {}
+
+    def _pyroResponseAnnotations(self, annotations, msgtype):
+        """Process any response annotations (dictionary set by the daemon)."""
+        pass
+
+    async def __connect(self):
+        uri = self._pyroUri
+        if uri.protocol != "PYRO":
+            # resolving a PYRONAME/PYROMETA uri involves the name server, which is done with blocking calls
+            loop = asyncio.get_event_loop()
+            uri = await loop.run_in_executor(None, core._resolve, self._pyroUri, self._pyroHmacKey)
+        if config.SSL:
+            sslContext = socketutil.getSSLcontext(clientcert=config.SSL_CLIENTCERT, clientkey=config.SSL_CLIENTKEY,
+                                                  keypassword=config.SSL_CLIENTKEYPASSWD, cacerts=config.SSL_CACERTS)
+        else:
+            sslContext = None
+        log.debug("connecting to %s", uri)
+        try:
+            if uri.sockname:
+                connect = asyncio.open_unix_connection(uri.sockname, ssl=sslContext)
+            else:
+                server_hostname = uri.host if sslContext and sslContext.check_hostname else None
+                connect = asyncio.open_connection(uri.host, uri.port, ssl=sslContext, server_hostname=server_hostname)
+            reader, writer = await asyncio.wait_for(connect, self._pyroTimeout or None)
+        except asyncio.TimeoutError:
+            raise errors.TimeoutError("connecting: timeout")
+        except OSError as x:
+            err = "cannot connect to %s: %s" % (uri.location, x)
+            log.error(err)
+            ce = errors.CommunicationError(err)
+            ce.__cause__ = x
+            raise ce
+        try:
+            await asyncio.wait_for(self.__handshake(uri, reader, writer), self._pyroTimeout or None)
+        except asyncio.TimeoutError:
+            writer.close()
+            raise errors.TimeoutError("connection handshake: timeout")
+        except Exception:
+            writer.close()
+            raise
+        self.__reader, self.__writer = reader, writer
+        self.__objectId = uri.object
+        self.__readerTask = asyncio.ensure_future(self.__readResponses(reader, writer))
+        log.debug("connected to %s", uri)
+
+    async def __handshake(self, uri, reader, writer):
+        serializer = util.get_serializer(self._pyroSerializer or config.SERIALIZER)
+        data = {"handshake": self._pyroHandshake}
+        flags = 0
+        if config.METADATA:
+            data["object"] = uri.object
+            flags |= message.FLAGS_META_ON_CONNECT
+        data, compressed = serializer.serializeData(data, config.COMPRESSION)
+        annotations = self.__annotations()
+        flags |= core._compressionFlags(compressed, annotations)
+        codecs = util.available_compressors()
+        if codecs != ["zlib"]:
+            annotations["CMPA"] = ",".join(codecs).encode("ascii")  # the daemon may compress responses with these
+        msg = message.Message(message.MSG_CONNECT, data, serializer.serializer_id, flags, self._pyroSeq,
+                              annotations=annotations, hmac_key=self._pyroHmacKey)
+        write_message(writer, msg)
+        await writer.drain()
+        msg = await read_message(reader, writer, [message.MSG_CONNECTOK, message.MSG_CONNECTFAIL], self._pyroHmacKey)
+        handshake_response = "?"
+        if msg.data:
+            serializer = util.get_serializer_by_id(msg.serializer_id)
+            handshake_response = serializer.deserializeData(msg.data, compressed=msg.compressor())
+            msg.release_buffer()
+        if msg.type == message.MSG_CONNECTFAIL:
+            error = "connection to %s rejected: %s" % (uri.location, handshake_response)
+            log.error(error)
+            raise errors.CommunicationError(error)
+        if msg.flags & message.FLAGS_META_ON_CONNECT:
+            metadata = handshake_response["meta"]
+            self._pyroOneway = set(metadata["oneway"])
+            self._pyroMethods = set(metadata["methods"])
+            self._pyroAttrs = set(metadata["attrs"])
+        if msg.annotations:
+            self._pyroResponseAnnotations(msg.annotations, msg.type)
+
+    async def __readResponses(self, reader, writer):
+        # reads the responses from the connection and hands them to the calls that are waiting for them
+        try:
+            while True:
+                msg = await read_message(reader, writer, [message.MSG_RESULT], self._pyroHmacKey)
+                future = self.__responses.pop(msg.seq, None)
+                if future is None:
+                    log.debug("ignoring response for call %d, no one is waiting for it", msg.seq)
+                    msg.release_buffer()
+                elif not future.done():
+                    future.set_result(msg)
+        except asyncio.CancelledError:
+            raise
+        except Exception as x:
+            if not isinstance(x, errors.CommunicationError):
+                x = errors.ConnectionClosedError("receiving: " + str(x))
+            self.__failPendingCalls(x)
+            if self.__writer is writer:
+                self.__writer = self.__reader = None
+                self.__readerTask = None
+                writer.close()
+
+    def __failPendingCalls(self, exception):
+        responses, self.__responses = self.__responses, {}
+        for future in responses.values():
+            if not future.done():
+                future.set_exception(exception)
+
+    def __annotations(self):
+        annotations = self._pyroAnnotations()
+        if core.current_context.correlation_id:
+            annotations["CORR"] = core.current_context.correlation_id.bytes
+        return annotations
+
+    async def _pyroInvoke(self, methodname, vargs, kwargs, flags=0, objectId=None):
+        """perform the remote method call communication"""
+        data, msg = await self.__invoke(methodname, vargs, kwargs, flags, objectId)
+        if msg is not None and msg.flags & message.FLAGS_EXCEPTION:
+            raise data  # if you see this in your traceback, you should probably inspect the remote traceback as well
+        return data
+
+    async def __invoke(self, methodname, vargs, kwargs, flags=0, objectId=None):
+        # performs the call and returns the result data and the response message (None for oneway calls)
+        if self.__writer is None:
+            await self._pyroBind()
+        if config.METADATA and objectId is None and methodname not in ("__getattr__", "__setattr__"):
+            if methodname not in self._pyroMethods:
+                raise AttributeError("remote object '%s' has no exposed attribute or method '%s'" % (self._pyroUri, methodname))
+        serializer = util.get_serializer(self._pyroSerializer or config.SERIALIZER)
+        data, compressed = serializer.serializeCall(objectId or self.__objectId, methodname, vargs, kwargs,
+                                                    compress=config.COMPRESSION)
+        annotations = self.__annotations()
+        flags |= core._compressionFlags(compressed, annotations)
+        if methodname in self._pyroOneway:
+            flags |= message.FLAGS_ONEWAY
+        else:
+            flags |= message.FLAGS_PIPELINED
+        self._pyroSeq = (self._pyroSeq + 1) & 0xffff
+        seq = self._pyroSeq
+        msg = message.Message(message.MSG_INVOKE, data, serializer.serializer_id, flags, seq,
+                              annotations=annotations, hmac_key=self._pyroHmacKey)
+        if flags & message.FLAGS_ONEWAY:
+            future = None
+        else:
+            future = asyncio.get_event_loop().create_future()
+            self.__responses[seq] = future
+        writer = self.__writer
+        try:
+            write_message(writer, msg)
+            del msg
+            await writer.drain()
+        except (ConnectionError, OSError) as x:
+            self.__responses.pop(seq, None)
+            await self._pyroRelease()
+            raise errors.ConnectionClosedError("sending: connection lost: " + str(x))
+        if future is None:
+            return None, None
+        try:
+            msg = await asyncio.wait_for(future, self._pyroTimeout or None)
+        except asyncio.TimeoutError:
+            self.__responses.pop(seq, None)   # a late response is ignored, the connection stays usable
+            raise errors.TimeoutError("receiving: timeout")
+        if msg.serializer_id != serializer.serializer_id:
+            error = "invalid serializer in response: %d" % msg.serializer_id
+            log.error(error)
+            raise errors.SerializeError(error)
+        if msg.annotations:
+            self._pyroResponseAnnotations(msg.annotations, msg.type)
+        data = serializer.deserializeData(msg.data, compressed=msg.compressor())
+        msg.release_buffer()
+        if msg.flags & message.FLAGS_ITEMSTREAMRESULT:
+            streamId = bytes(msg.annotations.get("STRM", b"")).decode()
+            if not streamId:
+                raise errors.ProtocolError("result of call is an iterator, but the server is not configured to allow streaming")
+            return _AsyncStreamResultIterator(streamId, self), None
+        if msg.flags & message.FLAGS_EXCEPTION and sys.platform == "cli":
+            util.fixIronPythonExceptionForPickle(data, False)
+        return data, msg
+
+    async def _pyroNextStreamItems(self, streamId, count):
+        # used by the stream result iterator
+        data, msg = await self.__invoke("get_next_stream_items", [streamId, count], {}, objectId=constants.DAEMON_NAME)
+        if msg.flags & message.FLAGS_EXCEPTION:
+            raise data
+        return data
+
+
+class _AsyncStreamResultIterator(object):
+    """
+    The asyncio proxy returns this as a result of a remote call which returns an iterator or generator.
+    It is an asynchronous iterator that produces elements on demand from the remote iterator: use it with ``async for``.
+    """
+    max_chunk_size = 1024
+
+    def __init__(self, streamId, proxy):
+        self.streamId = streamId
+        self.proxy = proxy
+        self.items = collections.deque()
+        self.chunk_size = 1
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.items:
+            if self.proxy is None:
+                raise StopAsyncIteration
+            start = time.time()
+            items = await self.proxy._pyroNextStreamItems(self.streamId, self.chunk_size)
+            self.chunk_size = core._streamChunkSize(self.chunk_size, len(items), time.time() - start, self.max_chunk_size)
+            self.items.extend(items)
+        item = self.items.popleft()
+        if isinstance(item, futures._ExceptionWrapper):
+            self.proxy = None  # the server has closed its part of the stream by itself already
+            # the remote StopIteration is converted because it can't pass through a coroutine
+            if isinstance(item.exception, (StopIteration, GeneratorExit)):
+                raise StopAsyncIteration
+            item.raiseIt()
+        return item
+
+    async def aclose(self):
+        """stop iterating, and close the remote iterator"""
+        self.items.clear()
+        if self.proxy is not None:
+            proxy, self.proxy = self.proxy, None
+            await proxy._pyroInvoke("close_stream", [self.streamId], {}, flags=message.FLAGS_ONEWAY,
+                                    objectId=constants.DAEMON_NAME)
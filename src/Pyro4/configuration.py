@@ -18,14 +18,19 @@ from Pyro4 import constants
 
 class Configuration(object):
     __slots__ = ("HOST", "NS_HOST", "NS_PORT", "NS_BCPORT", "NS_BCHOST", "NS_AUTOCLEAN",
-                 "COMPRESSION", "SERVERTYPE", "COMMTIMEOUT", "POLLTIMEOUT", "ONEWAY_THREADED",
-                 "DETAILED_TRACEBACK", "SOCK_REUSE", "SOCK_NODELAY", "PREFER_IP_VERSION",
-                 "THREADPOOL_SIZE", "THREADPOOL_SIZE_MIN", "AUTOPROXY", "PICKLE_PROTOCOL_VERSION",
-                 "BROADCAST_ADDRS", "NATHOST", "NATPORT", "MAX_MESSAGE_SIZE",
-                 "FLAME_ENABLED", "SERIALIZER", "SERIALIZERS_ACCEPTED", "LOGWIRE",
+                 "COMPRESSION", "COMPRESSION_CODEC", "COMPRESSION_MINSIZE", "COMPRESSION_ADAPTIVE",
+                 "COMPRESSION_LOCAL", "COMPRESSION_STREAM", "HMAC_ALGORITHM", "SERVERTYPE", "COMMTIMEOUT",
+                 "POLLTIMEOUT", "ONEWAY_THREADED",
+                 "ONEWAY_THREADPOOL_SIZE", "ONEWAY_QUEUE_SIZE", "ONEWAY_OVERFLOW", "ONEWAY_CREDITS",
+                 "DETAILED_TRACEBACK", "SOCK_REUSE", "SOCK_REUSEPORT", "SOCK_NODELAY", "PREFER_IP_VERSION",
+                 "THREADPOOL_SIZE", "THREADPOOL_SIZE_MIN", "THREADPOOL_DISPATCH", "THREADPOOL_QUEUE_SIZE",
+                 "THREADPOOL_QUEUE_TIMEOUT", "THREADPOOL_IDLE_TIMEOUT", "PROCESSPOOL_SIZE", "AUTOPROXY", "PICKLE_PROTOCOL_VERSION",
+                 "PICKLE_OOB_MINSIZE", "ATTACHMENT_MINSIZE", "BROADCAST_ADDRS", "NATHOST", "NATPORT", "MAX_MESSAGE_SIZE",
+                 "BUFFER_POOL_SIZE", "RESULT_CHUNKSIZE", "FRAGMENT_SIZE", "FRAGMENT_SPOOL_MINSIZE",
+                 "FLAME_ENABLED", "SERIALIZER", "SERIALIZERS_ACCEPTED", "SERIALIZERS_PREFERRED", "LOGWIRE",
                  "METADATA", "REQUIRE_EXPOSE", "USE_MSG_WAITALL", "JSON_MODULE",
                  "MAX_RETRIES", "DILL_PROTOCOL_VERSION", "ITER_STREAMING", "ITER_STREAM_LIFETIME",
-                 "ITER_STREAM_LINGER", "SSL", "SSL_REQUIRECLIENTCERT", "SSL_CACERTS",
+                 "ITER_STREAM_LINGER", "ITER_STREAM_CLIENT_LIMIT", "SSL", "SSL_REQUIRECLIENTCERT", "SSL_CACERTS",
                  "SSL_SERVERCERT", "SSL_SERVERKEY", "SSL_SERVERKEYPASSWD",
                  "SSL_CLIENTCERT", "SSL_CLIENTKEY", "SSL_CLIENTKEYPASSWD")
 
@@ -46,24 +51,47 @@ class Configuration(object):
         self.NATHOST = None
         self.NATPORT = 0
         self.COMPRESSION = False
+        self.COMPRESSION_CODEC = "zlib"  # codec name, optionally with a level such as "zlib:9", "lzma:1"
+        self.COMPRESSION_MINSIZE = 200  # smaller data is not compressed
+        self.COMPRESSION_ADAPTIVE = False  # learn per method and data size whether compression pays off
+        self.COMPRESSION_LOCAL = True  # also compress over loopback and unix domain socket connections
+        self.COMPRESSION_STREAM = False  # compress all messages of a connection in one zlib stream (if the server agrees)
+        self.HMAC_ALGORITHM = "sha1"  # algorithm of the message hmac (if a hmac key is set): sha1, sha256, blake2b, blake2s
         self.SERVERTYPE = "thread"
         self.COMMTIMEOUT = 0.0
         self.POLLTIMEOUT = 2.0  # seconds
         self.SOCK_REUSE = True  # so_reuseaddr on server sockets?
+        self.SOCK_REUSEPORT = False  # so_reuseport on server sockets?
         self.SOCK_NODELAY = False  # tcp_nodelay on socket?
         self.ONEWAY_THREADED = True  # oneway calls run in their own thread
+        self.ONEWAY_THREADPOOL_SIZE = 40  # max number of threads that run oneway calls
+        self.ONEWAY_QUEUE_SIZE = 10000  # max number of oneway calls waiting for a thread, 0 = unlimited
+        self.ONEWAY_OVERFLOW = "block"  # when the oneway queue is full: "block" the connection, "drop" or "reject" the call
+        self.ONEWAY_CREDITS = 100  # max number of unfinished oneway calls of a client that uses flow control
         self.DETAILED_TRACEBACK = False
         self.THREADPOOL_SIZE = 40
         self.THREADPOOL_SIZE_MIN = 4
+        self.THREADPOOL_DISPATCH = "connection"  # give worker threads to client "connection"s, or to single "request"s
+        self.THREADPOOL_QUEUE_SIZE = 0  # max number of jobs waiting for a free worker
+        self.THREADPOOL_QUEUE_TIMEOUT = 0.0  # seconds to wait for room in the job queue before refusing the job
+        self.THREADPOOL_IDLE_TIMEOUT = 0.0  # seconds before an idle worker above the minimum is retired
+        self.PROCESSPOOL_SIZE = 0  # number of processes for methods exposed with executor="process", 0 = number of cpus
         self.AUTOPROXY = True
         self.MAX_MESSAGE_SIZE = 0  # 0 = unlimited
+        self.BUFFER_POOL_SIZE = 64 * 1024 * 1024  # max bytes kept in idle pooled receive buffers, 0 = no pooling
         self.BROADCAST_ADDRS = "<broadcast>, 0.0.0.0"  # comma separated list of broadcast addresses
         self.FLAME_ENABLED = False
         self.PREFER_IP_VERSION = 4  # 4, 6 or 0 (let OS choose according to RFC 3484)
         self.SERIALIZER = "serpent"
         self.SERIALIZERS_ACCEPTED = "serpent,marshal,json"   # these are the 'safe' serializers that are always available
+        self.SERIALIZERS_PREFERRED = ""   # serializers to negotiate for each connection, best first (empty=no negotiation)
         self.LOGWIRE = False  # log wire-level messages
         self.PICKLE_PROTOCOL_VERSION = pickle.HIGHEST_PROTOCOL
+        self.PICKLE_OOB_MINSIZE = 0  # buffers of at least this size are sent outside the pickle stream (protocol 5+), 0=never
+        self.ATTACHMENT_MINSIZE = 0  # serpent, json, marshal: binary values of at least this size are sent as attachments, 0=never
+        self.RESULT_CHUNKSIZE = 0  # list/tuple results with more items are sent in chunks of this many items, 0=never
+        self.FRAGMENT_SIZE = 0  # message data larger than this is sent in fragments, 0=only when it's too large for one message (2Gb)
+        self.FRAGMENT_SPOOL_MINSIZE = 0  # fragmented data of at least this size is received in a memory mapped temp file, 0=never
         try:
             import dill
             self.DILL_PROTOCOL_VERSION = dill.HIGHEST_PROTOCOL  # Highest protocol
@@ -77,6 +105,7 @@ class Configuration(object):
         self.ITER_STREAMING = True
         self.ITER_STREAM_LIFETIME = 0.0
         self.ITER_STREAM_LINGER = 30.0
+        self.ITER_STREAM_CLIENT_LIMIT = 0  # max number of open item streams per client connection, 0 = unlimited
         self.SSL = False
         self.SSL_SERVERCERT = ""
         self.SSL_SERVERKEY = ""
@@ -110,6 +139,7 @@ class Configuration(object):
                     setattr(self, symbol, envvalue)
 
         self.SERIALIZERS_ACCEPTED = set(self.SERIALIZERS_ACCEPTED.split(','))
+        self.SERIALIZERS_PREFERRED = [name for name in self.SERIALIZERS_PREFERRED.split(',') if name]
 
     def asDict(self):
         """returns the current config as a regular dictionary"""
@@ -18,12 +18,17 @@ import base64
 import warnings
 import socket
 import random
+import select
+import collections
+import functools
+import heapq
+import pickle
 from Pyro4 import errors, socketutil, util, constants, message, futures
 from Pyro4.configuration import config
 
 
-__all__ = ["URI", "Proxy", "Daemon", "current_context", "callback", "batch", "asyncproxy", "expose", "behavior",
-           "oneway", "SerializedBlob", "_resolve", "_locateNS"]
+__all__ = ["URI", "Proxy", "Daemon", "ConnectionPool", "current_context", "callback", "batch", "asyncproxy", "expose",
+           "behavior", "oneway", "SerializedBlob", "_resolve", "_locateNS"]
 
 if sys.version_info >= (3, 0):
     basestring = str
@@ -190,6 +195,44 @@ class _RemoteMethod(object):
                     raise
 
 
+class _RemoteMethodDescriptor(object):
+    """
+    Gets a remote method from a proxy without a failed attribute lookup followed by a call of Proxy.__getattr__.
+    These are put on the Proxy class for the method names in the metadata of remote objects, so they are shared by
+    all proxies: a proxy whose remote object doesn't have the method gets the regular __getattr__ result instead.
+    The returned method refers to the proxy, but the proxy doesn't refer to it, so there's no reference cycle.
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, proxy, owner=None):
+        if proxy is None:
+            return self
+        name = self.name
+        if name in proxy._pyroMethods and name not in proxy._pyroAttrs and not proxy._Proxy__async \
+                and type(proxy).__getattr__ == Proxy.__getattr__:
+            return _RemoteMethod(proxy._pyroInvoke, name, proxy._pyroMaxRetries)
+        return proxy.__getattr__(name)
+
+
+_MAX_REMOTE_METHOD_DESCRIPTORS = 1000   # the method names come from the remote objects, don't let the Proxy class grow forever
+_remoteMethodDescriptors = set()
+
+
+def _addRemoteMethodDescriptors(names):
+    """puts a _RemoteMethodDescriptor on the Proxy class for the method names that don't have one (or another attribute) yet"""
+    for name in names:
+        if name in _remoteMethodDescriptors or name.startswith("_") or len(_remoteMethodDescriptors) >= _MAX_REMOTE_METHOD_DESCRIPTORS:
+            continue
+        try:
+            name = str(name)    # (on python 2, the names can be unicode strings)
+        except UnicodeError:
+            continue
+        if not hasattr(Proxy, name):
+            setattr(Proxy, name, _RemoteMethodDescriptor(name))
+            _remoteMethodDescriptors.add(name)
+
+
 class Proxy(object):
     """
     Pyro proxy for a remote object. Intercepts method calls and dispatches them to the remote object.
@@ -203,6 +246,7 @@ class Proxy(object):
     .. automethod:: _pyroResponseAnnotations
     .. automethod:: _pyroValidateHandshake
     .. autoattribute:: _pyroTimeout
+    .. autoattribute:: _pyroProgress
     .. autoattribute:: _pyroHmacKey
     .. attribute:: _pyroMaxRetries
 
@@ -215,12 +259,32 @@ class Proxy(object):
     .. attribute:: _pyroHandshake
 
         The data object that should be sent in the initial connection handshake message. Can be any serializable object.
+
+    .. attribute:: _pyroPipelined
+
+        Set to True to pipeline the calls from multiple threads over the proxy's single connection:
+        they no longer wait for each other, and the responses are matched to the calls by their sequence number.
+
+    .. attribute:: _pyroFlowControl
+
+        Set to True to make this proxy's oneway calls subject to credit-based flow control: the daemon grants
+        the proxy a number of oneway calls it may send (``ONEWAY_CREDITS``). When they're used up, the proxy waits
+        until the daemon has processed enough of them (at most ``_pyroTimeout`` seconds, then it raises a TimeoutError).
+
+    .. attribute:: _pyroConnectionPool
+
+        The :class:`ConnectionPool` that this proxy borrows its connection from (and gives it back to when
+        the proxy is released), or None to let the proxy create and close its own connection.
     """
     __pyroAttributes = frozenset(
         ["__getnewargs__", "__getnewargs_ex__", "__getinitargs__", "_pyroConnection", "_pyroUri",
          "_pyroOneway", "_pyroMethods", "_pyroAttrs", "_pyroTimeout", "_pyroSeq", "_pyroHmacKey",
-         "_pyroRawWireResponse", "_pyroHandshake", "_pyroMaxRetries", "_pyroSerializer", "_Proxy__async",
-         "_Proxy__pyroHmacKey", "_Proxy__pyroTimeout", "_Proxy__pyroConnLock"])
+         "_pyroRawWireResponse", "_pyroHandshake", "_pyroMaxRetries", "_pyroSerializer", "_pyroPipelined",
+         "_pyroConnectionPool", "_pyroFlowControl", "_pyroProgress", "_Proxy__async", "_Proxy__pyroHmacKey",
+         "_Proxy__pyroTimeout", "_Proxy__pyroProgress",
+         "_Proxy__pyroConnLock", "_Proxy__pyroRouter", "_Proxy__pyroPoolKey", "_Proxy__pyroCredits",
+         "_Proxy__pyroStreamsToClose", "_Proxy__pyroSerializer",
+         "_Proxy__pyroSerializerInstance"])
 
     def __init__(self, uri, connected_socket=None):
         if connected_socket:
@@ -239,9 +303,17 @@ class Proxy(object):
         self._pyroRawWireResponse = False  # internal switch to enable wire level responses
         self._pyroHandshake = "hello"  # the data object that should be sent in the initial connection handshake message
         self._pyroMaxRetries = config.MAX_RETRIES
+        self._pyroPipelined = False  # pipeline the calls from multiple threads over the connection
+        self._pyroConnectionPool = None  # connection pool to borrow the connection from
+        self._pyroFlowControl = False  # wait for credits from the daemon before sending oneway calls
+        self.__pyroProgress = None  # callback for the progress of fragmented messages
         self.__pyroHmacKey = None
         self.__pyroTimeout = config.COMMTIMEOUT
         self.__pyroConnLock = threading.RLock()
+        self.__pyroRouter = None  # routes the responses to the callers, in pipelined mode
+        self.__pyroPoolKey = None  # set when the connection is to be given back to the connection pool
+        self.__pyroCredits = 0  # number of oneway calls the daemon allows us to send (with flow control)
+        self.__pyroStreamsToClose = []  # ids of remote item streams to close with the next call
         util.get_serializer(config.SERIALIZER)  # assert that the configured serializer is available
         self.__async = False
         current_context.annotations = {}
@@ -348,7 +420,15 @@ class Proxy(object):
         self._pyroConnection = None
         self._pyroSeq = 0
         self._pyroRawWireResponse = False
+        self._pyroPipelined = False
+        self._pyroConnectionPool = None
+        self._pyroFlowControl = False
+        self.__pyroProgress = None
         self.__pyroConnLock = threading.RLock()
+        self.__pyroRouter = None
+        self.__pyroPoolKey = None
+        self.__pyroCredits = 0
+        self.__pyroStreamsToClose = []
         self.__async = False
 
     def __copy__(self):
@@ -363,6 +443,10 @@ class Proxy(object):
         p._pyroHmacKey = self._pyroHmacKey
         p._pyroRawWireResponse = self._pyroRawWireResponse
         p._pyroMaxRetries = self._pyroMaxRetries
+        p._pyroPipelined = self._pyroPipelined
+        p._pyroFlowControl = self._pyroFlowControl
+        p._pyroConnectionPool = self._pyroConnectionPool
+        p._pyroProgress = self._pyroProgress
         p.__async = self.__async
         return p
 
@@ -386,7 +470,8 @@ class Proxy(object):
         return hash(self._pyroUri)
 
     def __dir__(self):
-        result = dir(self.__class__) + list(self.__dict__.keys())
+        result = [name for name in dir(self.__class__) if name not in _remoteMethodDescriptors]   # (those of other proxies)
+        result += list(self.__dict__.keys())
         return sorted(set(result) | self._pyroMethods | self._pyroAttrs)
 
     def _pyroRelease(self):
@@ -395,8 +480,19 @@ class Proxy(object):
             if self._pyroConnection is not None:
                 if self._pyroConnection.keep_open:
                     return
-                self._pyroConnection.close()
+                if self.__pyroRouter is not None:
+                    if self.__pyroRouter.responses:
+                        self.__pyroPoolKey = None  # calls are still in progress, the connection can't be reused
+                    self.__pyroRouter.close()
+                    self.__pyroRouter = None
+                if self.__pyroPoolKey is not None and self._pyroConnectionPool is not None:
+                    self._pyroConnectionPool.checkin(self.__pyroPoolKey, self._pyroConnection)
+                else:
+                    self._pyroConnection.close()
                 self._pyroConnection = None
+                self.__pyroPoolKey = None
+                self.__pyroCredits = 0  # credits are granted per connection
+                self.__pyroSerializerInstance = None  # the serializer is resolved again for the next connection
                 log.debug("connection released")
 
     def _pyroBind(self):
@@ -420,62 +516,95 @@ class Proxy(object):
         If the timeout expires before the remote method call returns,
         Pyro will raise a :exc:`Pyro4.errors.TimeoutError`""")
 
+    def __pyroGetProgress(self):
+        return self.__pyroProgress
+
+    def __pyroSetProgress(self, callback):
+        self.__pyroProgress = callback
+        if self._pyroConnection is not None:
+            self._pyroConnection.progress = callback
+
+    _pyroProgress = property(__pyroGetProgress, __pyroSetProgress, doc="""
+        A callable that follows the transfer of messages that are sent in fragments (see ``FRAGMENT_SIZE``).
+        It is called as ``callable(direction, done, total)`` after every fragment, where direction is "send" or "recv"
+        and done and total are the number of data bytes that are transferred so far, and in total.""")
+
+    @property
+    def _pyroSerializer(self):
+        return self.__pyroSerializer
+
+    @_pyroSerializer.setter
+    def _pyroSerializer(self, value):
+        self.__pyroSerializer = value
+        self.__pyroSerializerInstance = None  # resolved again with the next call
+
+    def __pyroGetSerializer(self):
+        """
+        the serializer for the calls: the one set for this proxy, or else the one negotiated for the connection, or else
+        the configured one. It is resolved once per connection (or when _pyroSerializer changes)
+        """
+        serializer = self.__pyroSerializerInstance
+        if serializer is None:
+            name = self.__pyroSerializer or getattr(self._pyroConnection, "serializer", None) or config.SERIALIZER
+            serializer = self.__pyroSerializerInstance = util.get_serializer(name)
+        return serializer
+
     def _pyroInvoke(self, methodname, vargs, kwargs, flags=0, objectId=None):
         """perform the remote method call communication"""
         current_context.response_annotations = {}
+        if self._pyroFlowControl and (flags & message.FLAGS_ONEWAY or methodname in self._pyroOneway):
+            self.__pyroTakeCredit()
         with self.__pyroConnLock:
             if self._pyroConnection is None:
                 self.__pyroCreateConnection()
-            serializer = util.get_serializer(self._pyroSerializer or config.SERIALIZER)
+            if self.__pyroStreamsToClose and methodname != "close_stream":
+                self.__pyroCloseStreams()
+            serializer = self.__pyroGetSerializer()
             objectId = objectId or self._pyroConnection.objectId
             annotations = self.__annotations()
+            if self._pyroFlowControl:
+                annotations["CRED"] = b""   # ask the daemon to grant us oneway credits in its response
             if vargs and isinstance(vargs[0], SerializedBlob):
                 # special serialization of a 'blob' that stays serialized
                 data, compressed, flags = self.__serializeBlobArgs(vargs, kwargs, annotations, flags, objectId, methodname, serializer)
             else:
                 # normal serialization of the remote call
-                data, compressed = serializer.serializeCall(objectId, methodname, vargs, kwargs, compress=config.COMPRESSION)
-            if compressed:
-                flags |= message.FLAGS_COMPRESSED
+                data, compressed = serializer.serializeCall(objectId, methodname, vargs, kwargs,
+                                                            compress=_compression(self._pyroConnection))
+            flags |= _compressionFlags(compressed, annotations)
             if methodname in self._pyroOneway:
                 flags |= message.FLAGS_ONEWAY
+            # pipelining is not done over SSL, because an ssl socket can't be read and written by different threads at once
+            pipelined = self._pyroPipelined and not flags & message.FLAGS_ONEWAY and not config.SSL
+            if pipelined:
+                flags |= message.FLAGS_PIPELINED
+            elif not flags & message.FLAGS_ONEWAY and not self._pyroRawWireResponse:
+                flags |= message.FLAGS_CHUNKED  # a large result may be sent back in chunks
             self._pyroSeq = (self._pyroSeq + 1) & 0xffff
-            msg = message.Message(message.MSG_INVOKE, data, serializer.serializer_id, flags, self._pyroSeq,
+            seq = self._pyroSeq
+            msg = message.Message(message.MSG_INVOKE, data, serializer.serializer_id, flags, seq,
                                   annotations=annotations, hmac_key=self._pyroHmacKey)
-            if config.LOGWIRE:
+            logwire = config.LOGWIRE
+            if logwire:
                 _log_wiredata(log, "proxy wiredata sending", msg)
             try:
-                self._pyroConnection.send(msg.to_bytes())
+                if pipelined:
+                    if self.__pyroRouter is None:
+                        self.__pyroRouter = _ResponseRouter(self._pyroConnection, self._pyroHmacKey)
+                    router = self.__pyroRouter
+                    router.expect(seq)
+                msg.send(self._pyroConnection)
                 del msg  # invite GC to collect the object, don't wait for out-of-scope
                 if flags & message.FLAGS_ONEWAY:
                     return None  # oneway call, no response data
-                else:
+                if not pipelined:
                     msg = message.Message.recv(self._pyroConnection, [message.MSG_RESULT], hmac_key=self._pyroHmacKey)
-                    if config.LOGWIRE:
+                    if logwire:
                         _log_wiredata(log, "proxy wiredata received", msg)
                     self.__pyroCheckSequence(msg.seq)
-                    if msg.serializer_id != serializer.serializer_id:
-                        error = "invalid serializer in response: %d" % msg.serializer_id
-                        log.error(error)
-                        raise errors.SerializeError(error)
-                    if msg.annotations:
-                        current_context.response_annotations = msg.annotations
-                        self._pyroResponseAnnotations(msg.annotations, msg.type)
-                    if self._pyroRawWireResponse:
-                        msg.decompress_if_needed()
-                        return msg
-                    data = serializer.deserializeData(msg.data, compressed=msg.flags & message.FLAGS_COMPRESSED)
-                    if msg.flags & message.FLAGS_ITEMSTREAMRESULT:
-                        streamId = bytes(msg.annotations.get("STRM", b"")).decode()
-                        if not streamId:
-                            raise errors.ProtocolError("result of call is an iterator, but the server is not configured to allow streaming")
-                        return _StreamResultIterator(streamId, self)
-                    if msg.flags & message.FLAGS_EXCEPTION:
-                        if sys.platform == "cli":
-                            util.fixIronPythonExceptionForPickle(data, False)
-                        raise data  # if you see this in your traceback, you should probably inspect the remote traceback as well
-                    else:
-                        return data
+                    if msg.flags & message.FLAGS_CHUNKED:
+                        return self.__pyroReceiveChunks(msg, serializer)
+                    return self.__pyroProcessResponse(msg, serializer)
             except (errors.CommunicationError, KeyboardInterrupt):
                 # Communication error during read. To avoid corrupt transfers, we close the connection.
                 # Otherwise we might receive the previous reply as a result of a new method call!
@@ -483,8 +612,154 @@ class Proxy(object):
                 # may be catching the keyboardinterrupt in their code. We should probably be on the
                 # safe side and release the proxy connection in this case too, because they might
                 # be reusing the proxy object after catching the exception...
+                self.__pyroPoolKey = None  # don't give the connection back to the connection pool
+                self._pyroRelease()
+                raise
+        # Pipelined call: wait for the response without holding the connection lock,
+        # so that other threads can make their calls in the meantime.
+        try:
+            msg = router.receive(seq)
+            if logwire:
+                _log_wiredata(log, "proxy wiredata received", msg)
+            return self.__pyroProcessResponse(msg, serializer)
+        except (errors.CommunicationError, KeyboardInterrupt):
+            with self.__pyroConnLock:
+                if self.__pyroRouter is router:
+                    # (unless another thread already did this and reconnected)
+                    self.__pyroPoolKey = None
+                    self._pyroRelease()
+            raise
+
+    def _pyroCloseStream(self, streamId, now=True):
+        """
+        Close the remote item stream with the given id. If it can't be done right now, because the proxy might be
+        in the middle of another call (such as when the stream iterator is garbage collected), it is done with the next call.
+        """
+        self.__pyroStreamsToClose.append(streamId)
+        if now:
+            with self.__pyroConnLock:
+                self.__pyroCloseStreams()
+
+    def __pyroCloseStreams(self):
+        while self.__pyroStreamsToClose:
+            streamId = self.__pyroStreamsToClose.pop()
+            self._pyroInvoke("close_stream", [streamId], {}, flags=message.FLAGS_ONEWAY, objectId=constants.DAEMON_NAME)
+
+    def __pyroTakeCredit(self):
+        """use up one oneway credit; if there are none, ask the daemon for more until it grants them or the timeout expires"""
+        deadline = time.time() + self.__pyroTimeout if self.__pyroTimeout else None
+        delay = 0.001
+        while True:
+            with self.__pyroConnLock:
+                if self.__pyroCredits > 0:
+                    self.__pyroCredits -= 1
+                    return
+            self.__pyroRequestCredits()
+            with self.__pyroConnLock:
+                if self.__pyroCredits > 0:
+                    self.__pyroCredits -= 1
+                    return
+            if deadline and time.time() + delay > deadline:
+                raise errors.TimeoutError("daemon granted no oneway call credits in time")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.02)
+
+    def __pyroRequestCredits(self):
+        """
+        Ask the daemon for new oneway credits with a ping message. This doesn't go through _pyroInvoke,
+        because a call there could be a oneway call itself (when the remote object has a oneway 'ping' method).
+        """
+        with self.__pyroConnLock:
+            if self._pyroConnection is None:
+                self.__pyroCreateConnection()
+            annotations = dict(self.__annotations(clear=False), CRED=b"")
+            self._pyroSeq = (self._pyroSeq + 1) & 0xffff
+            seq = self._pyroSeq
+            msg = message.Message(message.MSG_PING, b"", self.__pyroGetSerializer().serializer_id, 0, seq,
+                                  annotations=annotations, hmac_key=self._pyroHmacKey)
+            router = self.__pyroRouter  # if there are pipelined calls waiting, the response must be read through it
+            try:
+                if router is not None:
+                    router.expect(seq)
+                msg.send(self._pyroConnection)
+                if router is None:
+                    msg = message.Message.recv(self._pyroConnection, [message.MSG_PING], hmac_key=self._pyroHmacKey)
+                    self.__pyroCheckSequence(msg.seq)
+            except (errors.CommunicationError, KeyboardInterrupt):
+                self.__pyroPoolKey = None
                 self._pyroRelease()
                 raise
+        if router is not None:
+            try:
+                msg = router.receive(seq)
+            except (errors.CommunicationError, KeyboardInterrupt):
+                with self.__pyroConnLock:
+                    if self.__pyroRouter is router:
+                        self.__pyroPoolKey = None
+                        self._pyroRelease()
+                raise
+        if "CRED" in msg.annotations:
+            self.__pyroCredits = int(bytes(msg.annotations["CRED"]))
+
+    def __pyroProcessResponse(self, msg, serializer):
+        """process the response message of a remote call, returns the result or raises the remote exception"""
+        if msg.serializer_id != serializer.serializer_id:
+            error = "invalid serializer in response: %d" % msg.serializer_id
+            log.error(error)
+            raise errors.SerializeError(error)
+        if "CRED" in msg.annotations:
+            self.__pyroCredits = int(bytes(msg.annotations["CRED"]))
+        if msg.annotations:
+            current_context.response_annotations = msg.annotations
+            self._pyroResponseAnnotations(msg.annotations, msg.type)
+        if self._pyroRawWireResponse:
+            msg.decompress_if_needed()
+            return msg
+        data = serializer.deserializeData(msg.data, compressed=msg.compressor())
+        msg.release_buffer()
+        if msg.flags & message.FLAGS_ITEMSTREAMRESULT:
+            streamId = bytes(msg.annotations.get("STRM", b"")).decode()
+            if not streamId:
+                raise errors.ProtocolError("result of call is an iterator, but the server is not configured to allow streaming")
+            return _StreamResultIterator(streamId, self)
+        if msg.flags & message.FLAGS_EXCEPTION:
+            if sys.platform == "cli":
+                util.fixIronPythonExceptionForPickle(data, False)
+            raise data  # if you see this in your traceback, you should probably inspect the remote traceback as well
+        else:
+            return data
+
+    def __pyroReceiveChunks(self, msg, serializer):
+        """
+        Receive the remaining chunks of a large list or tuple result, and join them together again.
+        The last message of the result is processed as usual (it can also be the error that ended the result).
+        If a chunk can't be deserialized, the remaining chunks are still read (so the connection stays in sync)
+        before the error is raised.
+        """
+        items = []
+        chunk_error = None
+        while msg.flags & message.FLAGS_CHUNKED:
+            if chunk_error is None:
+                try:
+                    if msg.serializer_id != serializer.serializer_id:
+                        error = "invalid serializer in response: %d" % msg.serializer_id
+                        log.error(error)
+                        raise errors.SerializeError(error)
+                    items.extend(serializer.deserializeData(msg.data, compressed=msg.compressor()))
+                except Exception as x:
+                    chunk_error = x
+                    items = None
+            msg.release_buffer()
+            msg = message.Message.recv(self._pyroConnection, [message.MSG_RESULT], hmac_key=self._pyroHmacKey)
+            if config.LOGWIRE:
+                _log_wiredata(log, "proxy wiredata received", msg)
+            self.__pyroCheckSequence(msg.seq)
+        if chunk_error is not None:
+            msg.release_buffer()
+            raise chunk_error
+        last = self.__pyroProcessResponse(msg, serializer)
+        items.extend(last)
+        return tuple(items) if type(last) is tuple else items
 
     def __pyroCheckSequence(self, seq):
         if seq != self._pyroSeq:
@@ -511,11 +786,11 @@ class Proxy(object):
                 sock = socketutil.createSocket(connect=connect_location,
                                                reuseaddr=config.SOCK_REUSE,
                                                timeout=self.__pyroTimeout,
-                                               nodelay=config.SOCK_NODELAY,
+                                               nodelay=config.SOCK_NODELAY or self._pyroFlowControl,  # don't delay credit requests
                                                sslContext=sslContext)
                 conn = socketutil.SocketConnection(sock, uri.object)
                 # Do handshake.
-                serializer = util.get_serializer(self._pyroSerializer or config.SERIALIZER)
+                serializer = self.__pyroGetSerializer()
                 data = {"handshake": self._pyroHandshake}
                 if config.METADATA:
                     # the object id is only used/needed when piggybacking the metadata on the connection response
@@ -524,14 +799,23 @@ class Proxy(object):
                     flags = message.FLAGS_META_ON_CONNECT
                 else:
                     flags = 0
-                data, compressed = serializer.serializeData(data, config.COMPRESSION)
-                if compressed:
-                    flags |= message.FLAGS_COMPRESSED
+                data, compressed = serializer.serializeData(data, _compression(conn))
+                annotations = dict(self.__annotations(False))
+                flags |= _compressionFlags(compressed, annotations)
+                if config.COMPRESSION_STREAM and _compression(conn):
+                    annotations["ZSTR"] = b""   # ask for a compression stream on this connection
+                preferred = util.available_serializers(config.SERIALIZERS_PREFERRED) if not self.__pyroSerializer else []
+                if preferred:
+                    # let the daemon choose the best serializer that both sides support, for the calls on this connection
+                    annotations["SERP"] = ",".join(preferred).encode("ascii")
+                codecs = util.available_compressors()
+                if codecs != ["zlib"]:
+                    annotations["CMPA"] = ",".join(codecs).encode("ascii")  # the daemon may compress responses with these
                 msg = message.Message(message.MSG_CONNECT, data, serializer.serializer_id, flags, self._pyroSeq,
-                                      annotations=self.__annotations(False), hmac_key=self._pyroHmacKey)
+                                      annotations=annotations, hmac_key=self._pyroHmacKey)
                 if config.LOGWIRE:
                     _log_wiredata(log, "proxy connect sending", msg)
-                conn.send(msg.to_bytes())
+                msg.send(conn)
                 msg = message.Message.recv(conn, [message.MSG_CONNECTOK, message.MSG_CONNECTFAIL], hmac_key=self._pyroHmacKey)
                 if config.LOGWIRE:
                     _log_wiredata(log, "proxy connect response received", msg)
@@ -551,7 +835,8 @@ class Proxy(object):
                 handshake_response = "?"
                 if msg.data:
                     serializer = util.get_serializer_by_id(msg.serializer_id)
-                    handshake_response = serializer.deserializeData(msg.data, compressed=msg.flags & message.FLAGS_COMPRESSED)
+                    handshake_response = serializer.deserializeData(msg.data, compressed=msg.compressor())
+                    msg.release_buffer()
                 if msg.type == message.MSG_CONNECTFAIL:
                     if sys.version_info < (3, 0):
                         error = "connection to %s rejected: %s" % (connect_location, handshake_response.decode())
@@ -561,6 +846,15 @@ class Proxy(object):
                     log.error(error)
                     raise errors.CommunicationError(error)
                 elif msg.type == message.MSG_CONNECTOK:
+                    if "ZSTR" in msg.annotations:
+                        conn.compressionStream = util.CompressionStream()
+                    conn.streamChunks = "STRM" in msg.annotations
+                    if "SERP" in msg.annotations:
+                        chosen = bytes(msg.annotations["SERP"]).decode("ascii")
+                        if chosen not in preferred:
+                            conn.close()
+                            raise errors.ProtocolError("daemon chose a serializer that was not offered: " + chosen)
+                        conn.serializer = chosen
                     if msg.flags & message.FLAGS_META_ON_CONNECT:
                         self.__processMetadata(handshake_response["meta"])
                         handshake_response = handshake_response["handshake"]
@@ -590,16 +884,35 @@ class Proxy(object):
             conn = None
             log.debug("connecting to %s", uri)
             connect_location = uri.sockname or (uri.host, uri.port)
+            pool = None if connected_socket else self._pyroConnectionPool
             if connected_socket:
                 self._pyroConnection = socketutil.SocketConnection(connected_socket, uri.object, True)
+            elif pool is not None:
+                pool_key = (connect_location, self._pyroHmacKey)
+                conn = pool.checkout(pool_key)
+                if conn is None:
+                    connect_and_handshake(conn)
+                else:
+                    # borrowed an idle connection that is already connected and handshaked
+                    conn.objectId = uri.object
+                    conn.timeout = self.__pyroTimeout
+                    self._pyroConnection = conn
+                    if replaceUri:
+                        self._pyroUri = uri
+                    log.debug("reusing pooled connection to %s", uri)
+                self.__pyroPoolKey = pool_key
             else:
                 connect_and_handshake(conn)
+            self._pyroConnection.progress = self.__pyroProgress
+            self.__pyroSerializerInstance = None    # the connection may have negotiated another serializer
             if config.METADATA:
                 # obtain metadata if this feature is enabled, and the metadata is not known yet
                 if self._pyroMethods or self._pyroAttrs:
                     log.debug("reusing existing metadata")
                 else:
-                    self._pyroGetMetadata(uri.object)
+                    self._pyroGetMetadata(uri.object, pool.getMetadata(uri) if pool else None)
+                if pool:
+                    pool.setMetadata(uri, {"methods": self._pyroMethods, "oneway": self._pyroOneway, "attrs": self._pyroAttrs})
             return True
 
     def _pyroGetMetadata(self, objectId=None, known_metadata=None):
@@ -632,6 +945,7 @@ class Proxy(object):
         self._pyroOneway = set(metadata["oneway"])
         self._pyroMethods = set(metadata["methods"])
         self._pyroAttrs = set(metadata["attrs"])
+        _addRemoteMethodDescriptors(self._pyroMethods)  # getting these methods from the proxy is faster this way
         if log.isEnabledFor(logging.DEBUG):
             log.debug("from meta: methods=%s, oneway methods=%s, attributes=%s",
                       sorted(self._pyroMethods), sorted(self._pyroOneway), sorted(self._pyroAttrs))
@@ -710,11 +1024,16 @@ class Proxy(object):
 
     def __annotations(self, clear=True):
         annotations = current_context.annotations
-        if current_context.correlation_id:
-            annotations["CORR"] = current_context.correlation_id.bytes
-        else:
+        if not annotations and current_context._correlation_id is None and type(self)._pyroAnnotations == Proxy._pyroAnnotations:
+            return {}   # the usual case of a call without any annotations: there's nothing to build
+        correlation_id = current_context.correlation_id
+        if correlation_id:
+            annotations["CORR"] = correlation_id.bytes
+        elif annotations:
             annotations.pop("CORR", None)
-        annotations.update(self._pyroAnnotations())
+        custom_annotations = self._pyroAnnotations()
+        if custom_annotations:
+            annotations.update(custom_annotations)
         if clear:
             current_context.annotations = {}
         return annotations
@@ -742,23 +1061,229 @@ class Proxy(object):
         if blob._contains_blob:
             # directly pass through the already serialized msg data from within the blob
             protocol_msg = blob._data
-            data, compressed = protocol_msg.data, protocol_msg.flags & message.FLAGS_COMPRESSED
+            data, compressed = protocol_msg.data, protocol_msg.compressor()
         else:
             # replaces SerializedBlob argument with the data to be serialized
-            data, compressed = serializer.serializeCall(objectId, methodname, blob._data, kwargs, compress=config.COMPRESSION)
+            data, compressed = serializer.serializeCall(objectId, methodname, blob._data, kwargs,
+                                                        compress=_compression(self._pyroConnection))
         return data, compressed, flags
 
 
+class ConnectionPool(object):
+    """
+    Thread-safe pool of connections to Pyro daemons. A proxy that uses the pool (see :attr:`Proxy._pyroConnectionPool`)
+    borrows an idle connection that is already connected and handshaked, instead of creating a new one.
+    When the proxy is released, the connection is given back to the pool instead of being closed.
+    Connections are pooled per daemon location (and hmac key). The pool also remembers the metadata
+    of the objects, so a proxy that borrows a connection doesn't have to obtain it again.
+    The connection handshake is only done when a new connection is created, so all proxies using
+    the pool should use the same handshake data.
+
+    :param max_idle: max number of idle connections kept per location, the surplus is closed.
+    :param min_idle: number of idle connections per location that are kept open even if they exceed the idle timeout.
+    :param idle_timeout: idle connections are closed after this many seconds (0 = never).
+    :param ping_after: idle connections are checked with a ping message before reuse, if they have been idle
+        for longer than this many seconds (0 = never). A connection that the daemon has closed is always detected.
+    """
+    def __init__(self, max_idle=10, min_idle=0, idle_timeout=60.0, ping_after=0.0):
+        if min_idle > max_idle:
+            raise ValueError("min_idle can't be larger than max_idle")
+        self.max_idle = max_idle
+        self.min_idle = min_idle
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self.__idle = collections.defaultdict(list)   # location -> list of (connection, idle since) tuples
+        self.__metadata = {}
+        self.__lock = threading.Lock()
+
+    def __repr__(self):
+        return "<%s.%s at 0x%x; %d idle connections>" % (self.__class__.__module__, self.__class__.__name__,
+                                                          id(self), self.idleCount())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def proxy(self, uri):
+        """create a proxy for the given uri that uses this connection pool"""
+        proxy = Proxy(uri)
+        proxy._pyroConnectionPool = self
+        return proxy
+
+    def fill(self, uri):
+        """create new connections to the daemon of the given uri, until min_idle connections for it are idle in the pool"""
+        proxies = []
+        try:
+            for _ in range(self.min_idle):
+                proxy = self.proxy(uri)
+                proxy._pyroBind()
+                proxies.append(proxy)
+        finally:
+            for proxy in proxies:
+                proxy._pyroRelease()
+
+    def checkout(self, location):
+        """Take an idle connection to the given location out of the pool. Returns None if there isn't one."""
+        self.evict()
+        while True:
+            with self.__lock:
+                connections = self.__idle.get(location)
+                if not connections:
+                    return None
+                conn, idle_since = connections.pop()   # the most recently used one
+            if self.__healthy(conn, idle_since, location[1]):
+                return conn
+            log.debug("discarding unhealthy pooled connection")
+            conn.close()
+
+    def checkin(self, location, conn):
+        """Give a connection back to the pool, it is closed if the pool already holds max_idle connections for the location."""
+        with self.__lock:
+            connections = self.__idle[location]
+            if len(connections) < self.max_idle:
+                connections.append((conn, time.time()))
+                return
+        conn.close()
+
+    def evict(self):
+        """close the connections that have been idle for longer than the idle timeout (except min_idle per location)"""
+        if not self.idle_timeout:
+            return
+        expired = []
+        expiry = time.time() - self.idle_timeout
+        with self.__lock:
+            for location, connections in list(self.__idle.items()):
+                # the connections are ordered from least to most recently used
+                while len(connections) > self.min_idle and connections[0][1] < expiry:
+                    expired.append(connections.pop(0)[0])
+                if not connections:
+                    del self.__idle[location]
+        for conn in expired:
+            conn.close()
+
+    def idleCount(self, location=None):
+        """the number of idle connections in the pool (for the given location, or in total)"""
+        with self.__lock:
+            if location is not None:
+                return len(self.__idle.get(location, []))
+            return sum(len(connections) for connections in self.__idle.values())
+
+    def close(self):
+        """close all idle connections and forget the cached metadata"""
+        with self.__lock:
+            connections = [conn for conns in self.__idle.values() for conn, _ in conns]
+            self.__idle.clear()
+            self.__metadata.clear()
+        for conn in connections:
+            conn.close()
+
+    def getMetadata(self, uri):
+        return self.__metadata.get(str(uri))
+
+    def setMetadata(self, uri, metadata):
+        self.__metadata[str(uri)] = metadata
+
+    def __healthy(self, conn, idle_since, hmac_key):
+        if conn.pending():
+            return False  # there should be no data left for an idle connection
+        try:
+            readable, _, _ = select.select([conn], [], [], 0)
+        except (ValueError, select.error, socket.error):
+            return False
+        if readable:
+            return False  # the daemon closed the connection (or sent data that no one's waiting for)
+        if self.ping_after and time.time() - idle_since > self.ping_after:
+            try:
+                message.Message.ping(conn, hmac_key)
+            except (errors.CommunicationError, errors.SecurityError):
+                return False
+        return True
+
+
+class _ResponseRouter(object):
+    """
+    Hands the responses that arrive on a pipelined proxy connection to the callers waiting for them,
+    based on their sequence number. There's no separate reader thread: one of the waiting callers reads
+    the responses from the connection until its own response arrives, and stores the other ones
+    for their callers. Then the next waiting caller takes over reading the connection.
+    """
+    def __init__(self, connection, hmac_key):
+        self.connection = connection
+        self.hmac_key = hmac_key
+        self.responses = {}  # seq -> response message (None if it hasn't arrived yet), for every outstanding call
+        self.reading = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    def expect(self, seq):
+        """register the sequence number of a call that's about to be sent"""
+        with self.cond:
+            self.responses[seq] = None
+
+    def receive(self, seq):
+        """wait for the response to the call with the given sequence number"""
+        with self.cond:
+            while self.responses[seq] is None:
+                if self.error:
+                    del self.responses[seq]
+                    raise self.error[0](self.error[1])
+                if not self.reading:
+                    self.reading = True
+                    break
+                self.cond.wait()
+            else:
+                return self.responses.pop(seq)
+        try:
+            while True:
+                msg = message.Message.recv(self.connection, [message.MSG_RESULT, message.MSG_PING], hmac_key=self.hmac_key)
+                with self.cond:
+                    if msg.seq == seq:
+                        del self.responses[seq]
+                        return msg
+                    if msg.seq not in self.responses or self.responses[msg.seq] is not None:
+                        err = "invoke: reply sequence out of sync, got %d which no call is waiting for" % msg.seq
+                        log.error(err)
+                        raise errors.ProtocolError(err)
+                    self.responses[msg.seq] = msg
+                    self.cond.notify_all()
+        except BaseException as x:
+            self.close(x)
+            with self.cond:
+                self.responses.pop(seq, None)
+            raise
+        finally:
+            with self.cond:
+                self.reading = False
+                self.cond.notify_all()
+
+    def close(self, reason=None):
+        """fail the calls that are still waiting for a response"""
+        with self.cond:
+            if not self.error:
+                if isinstance(reason, errors.TimeoutError):
+                    self.error = (errors.TimeoutError, str(reason))
+                else:
+                    self.error = (errors.ConnectionClosedError, "connection lost: %s" % (reason or "closed"))
+            self.cond.notify_all()
+
+
 class _StreamResultIterator(object):
     """
     Pyro returns this as a result of a remote call which returns an iterator or generator.
     It is a normal iterable and produces elements on demand from the remote iterator.
     You can simply use it in for loops, list comprehensions etc.
+    The items are fetched from the server in chunks, whose size adapts to how long it takes to get them.
     """
+    max_chunk_size = 1024
+
     def __init__(self, streamId, proxy):
         self.streamId = streamId
         self.proxy = proxy
         self.pyroseq = proxy._pyroSeq
+        self.items = collections.deque()
+        self.chunk_size = 1
 
     def __iter__(self):
         return self
@@ -768,41 +1293,58 @@ class _StreamResultIterator(object):
         return self.__next__()
 
     def __next__(self):
-        if self.proxy is None:
-            raise StopIteration
-        if self.proxy._pyroConnection is None:
-            raise errors.ConnectionClosedError("the proxy for this stream result has been closed")
-        self.pyroseq += 1
-        try:
-            return self.proxy._pyroInvoke("get_next_stream_item", [self.streamId], {}, objectId=constants.DAEMON_NAME)
-        except (StopIteration, GeneratorExit):
-            # when the iterator is exhausted, the proxy is removed to avoid unneeded close_stream calls later
-            # (the server has closed its part of the stream by itself already)
+        if not self.items:
+            if self.proxy is None:
+                raise StopIteration
+            if self.proxy._pyroConnection is None:
+                raise errors.ConnectionClosedError("the proxy for this stream result has been closed")
+            self.__fetch()
+        item = self.items.popleft()
+        if isinstance(item, futures._ExceptionWrapper):
+            # the stream is exhausted or failed, the server has closed its part of the stream by itself already
+            # the proxy is removed to avoid unneeded close_stream calls later
             self.proxy = None
-            raise
+            item.raiseIt()
+        return item
+
+    def __fetch(self):
+        self.pyroseq = (self.pyroseq + 1) & 0xffff
+        if self.proxy._pyroConnection.streamChunks:
+            start = time.time()
+            items = self.proxy._pyroInvoke("get_next_stream_items", [self.streamId, self.chunk_size], {},
+                                           objectId=constants.DAEMON_NAME)
+            self.chunk_size = _streamChunkSize(self.chunk_size, len(items), time.time() - start, self.max_chunk_size)
+            self.items.extend(items)
+            return
+        # the daemon is from an older Pyro version, it can only give one item at a time
+        try:
+            self.items.append(self.proxy._pyroInvoke("get_next_stream_item", [self.streamId], {}, objectId=constants.DAEMON_NAME))
+        except (StopIteration, GeneratorExit) as x:
+            self.items.append(futures._ExceptionWrapper(x))
 
     def __del__(self):
         self.close()
 
     def close(self):
         if self.proxy and self.proxy._pyroConnection is not None:
-            if self.pyroseq == self.proxy._pyroSeq:
-                # we're still in sync, it's okay to use the same proxy to close this stream
-                self.proxy._pyroInvoke("close_stream", [self.streamId], {},
-                                       flags=message.FLAGS_ONEWAY, objectId=constants.DAEMON_NAME)
-            else:
-                # The proxy's sequence number has diverged.
-                # One of the reasons this can happen is because this call is being done from python's GC where
-                # it decides to gc old iterator objects *during a new call on the proxy*.
-                # If we use the same proxy and do a call in between, the other call on the proxy will get an out of sync seq and crash!
-                # We create a temporary second proxy to call close_stream on. This is inefficient, but avoids the problem.
-                try:
-                    with self.proxy.__copy__() as closingProxy:
-                        closingProxy._pyroInvoke("close_stream", [self.streamId], {},
-                                                 flags=message.FLAGS_ONEWAY, objectId=constants.DAEMON_NAME)
-                except errors.CommunicationError:
-                    pass
+            # If the proxy's sequence number has diverged, it is in the middle of another call
+            # (this happens when python's GC decides to collect old iterator objects *during a new call on the proxy*),
+            # then the stream is closed with the next call on the proxy instead.
+            try:
+                self.proxy._pyroCloseStream(self.streamId, self.pyroseq == self.proxy._pyroSeq)
+            except errors.CommunicationError:
+                pass
         self.proxy = None
+        self.items.clear()
+
+
+def _streamChunkSize(chunk_size, received, duration, max_chunk_size):
+    """Fetch more stream items at a time while that is fast, and fewer when the items are big or slow to produce."""
+    if duration < 0.01 and received >= chunk_size:
+        return min(chunk_size * 2, max_chunk_size)
+    if duration > 0.1:
+        return max(chunk_size // 2, 1)
+    return chunk_size
 
 
 class _BatchedRemoteMethod(object):
@@ -972,12 +1514,17 @@ def oneway(method):
     return method
 
 
-def expose(method_or_class):
+def expose(method_or_class=None, executor=None):
     """
     Decorator to mark a method or class to be exposed for remote calls (relevant when REQUIRE_EXPOSE=True)
     You can apply it to a method or a class as a whole.
     If you need to change the default instance mode or instance creator, also use a @behavior decorator.
+    Use @expose(executor="process") to run the method (or all methods of the class) in the daemon's process pool.
     """
+    if method_or_class is None:
+        if executor not in (None, "process"):
+            raise ValueError("invalid executor: " + str(executor))
+        return lambda thing: expose(thing, executor)
     if inspect.isdatadescriptor(method_or_class):
         func = method_or_class.fget or method_or_class.fset or method_or_class.fdel
         if util.is_private_attribute(func.__name__):
@@ -1004,8 +1551,12 @@ def expose(method_or_class):
             thing = getattr(clazz, name)
             if inspect.isfunction(thing):
                 thing._pyroExposed = True
+                if executor:
+                    thing._pyroExecutor = executor
             elif inspect.ismethod(thing):
                 thing.__func__._pyroExposed = True
+                if executor:
+                    thing.__func__._pyroExecutor = executor
             elif inspect.isdatadescriptor(thing):
                 if getattr(thing, "fset", None):
                     thing.fset._pyroExposed = True
@@ -1016,6 +1567,8 @@ def expose(method_or_class):
         clazz._pyroExposed = True
         return clazz
     method_or_class._pyroExposed = True
+    if executor:
+        method_or_class._pyroExecutor = executor
     return method_or_class
 
 
@@ -1081,22 +1634,34 @@ class DaemonObject(object):
             raise errors.DaemonError("unknown object")
 
     def get_next_stream_item(self, streamId):
-        if streamId not in self.daemon.streaming_responses:
-            raise errors.PyroError("item stream terminated")
-        client, timestamp, linger_timestamp, stream = self.daemon.streaming_responses[streamId]
-        if client is None:
-            # reset client connection association (can be None if proxy disconnected)
-            self.daemon.streaming_responses[streamId] = (current_context.client, timestamp, 0, stream)
+        stream = self.daemon._getStream(streamId, current_context.client)
         try:
             return next(stream)
         except Exception:
             # in case of error (or StopIteration!) the stream is removed
-            del self.daemon.streaming_responses[streamId]
+            self.daemon._removeStream(streamId)
             raise
 
+    def get_next_stream_items(self, streamId, count):
+        """
+        Returns a list of at most count next items from the stream. When the stream ends or fails,
+        the last element in the list is the wrapped StopIteration or error, and the stream is removed.
+        """
+        stream = self.daemon._getStream(streamId, current_context.client)
+        items = []
+        try:
+            while len(items) < count:
+                items.append(next(stream))
+        except Exception:
+            xv = sys.exc_info()[1]
+            if not isinstance(xv, (StopIteration, GeneratorExit)):
+                xv._pyroTraceback = util.formatTraceback(detailed=config.DETAILED_TRACEBACK)
+            self.daemon._removeStream(streamId)
+            items.append(futures._ExceptionWrapper(xv))
+        return items
+
     def close_stream(self, streamId):
-        if streamId in self.daemon.streaming_responses:
-            del self.daemon.streaming_responses[streamId]
+        self.daemon._removeStream(streamId)
 
 
 class Daemon(object):
@@ -1123,6 +1688,8 @@ class Daemon(object):
         self.__mustshutdown.set()
         self.__loopstopped = threading.Event()
         self.__loopstopped.set()
+        self._onewayExecutor = _OnewayExecutor()   # before the server socket is created; it checks the oneway config
+        self._pipelinedExecutor = _PipelinedExecutor()
         if connected_socket:
             from Pyro4.socketserver.existingconnectionserver import SocketServer_ExistingConnection
             self.transportServer = SocketServer_ExistingConnection()
@@ -1134,6 +1701,9 @@ class Daemon(object):
             elif config.SERVERTYPE == "multiplex":
                 from Pyro4.socketserver.multiplexserver import SocketServer_Multiplex
                 self.transportServer = SocketServer_Multiplex()
+            elif config.SERVERTYPE == "asyncio":
+                from Pyro4.socketserver.asyncioserver import SocketServer_Asyncio
+                self.transportServer = SocketServer_Asyncio()
             else:
                 raise errors.PyroError("invalid server type '%s'" % config.SERVERTYPE)
             self.transportServer.init(self, host, port, unixsocket)
@@ -1158,8 +1728,15 @@ class Daemon(object):
         log.debug("pyro protocol version: %d  pickle version: %d" % (constants.PROTOCOL_VERSION, config.PICKLE_PROTOCOL_VERSION))
         self.__pyroHmacKey = None
         self._pyroInstances = {}   # pyro objects for instance_mode=single (singletons, just one per daemon)
+        self._dispatchTables = {}   # class -> {method name -> dispatch table entry}, see _dispatchEntry
         self.streaming_responses = {}   # stream_id -> (client, creation_timestamp, linger_timestamp, stream)
+        self._streamsByClient = collections.defaultdict(set)    # client -> stream ids (client None: lingering streams)
+        self._streamDeadlines = []  # heap of (deadline, stream_id, timestamp, timestamp index in streaming_responses)
+        self._streamsLock = threading.Lock()
+        self._streamsCreated = self._streamsExpired = 0
         self.housekeeper_lock = threading.Lock()
+        self._processPool = None    # created when a method with executor="process" is called
+        self._processPoolLock = threading.Lock()
         self.__mustshutdown.clear()
 
     @property
@@ -1241,7 +1818,7 @@ class Daemon(object):
     def shutdown(self):
         """Cleanly terminate a daemon that is running in the requestloop."""
         log.debug("daemon shutting down")
-        self.streaming_responses = {}
+        self._clearStreams()
         time.sleep(0.02)
         self.__mustshutdown.set()
         if self.transportServer:
@@ -1267,6 +1844,8 @@ class Daemon(object):
         """
         serializer_id = util.MarshalSerializer.serializer_id
         msg_seq = 0
+        stream = False
+        serializer_choice = None
         try:
             msg = message.Message.recv(conn, [message.MSG_CONNECT], hmac_key=self._pyroHmacKey)
             msg_seq = msg.seq
@@ -1276,13 +1855,14 @@ class Daemon(object):
                 _log_wiredata(log, "daemon handshake received", msg)
             if msg.serializer_id not in self.__serializer_ids:
                 raise errors.SerializeError("message used serializer that is not accepted: %d" % msg.serializer_id)
-            if "CORR" in msg.annotations:
-                current_context.correlation_id = uuid.UUID(bytes=msg.annotations["CORR"])
-            else:
-                current_context.correlation_id = uuid.uuid4()
+            current_context._received(msg.annotations)
+            current_context.response_annotations = {}   # don't leak annotations of an earlier call on this thread
+            # the codecs the client can decompress, older clients only have zlib
+            conn.compressionCodecs = frozenset(bytes(msg.annotations.get("CMPA", b"zlib")).decode("ascii", "replace").split(","))
             serializer_id = msg.serializer_id
             serializer = util.get_serializer_by_id(serializer_id)
-            data = serializer.deserializeData(msg.data, msg.flags & message.FLAGS_COMPRESSED)
+            data = serializer.deserializeData(msg.data, msg.compressor())
+            msg.release_buffer()
             handshake_response = self.validateHandshake(conn, data["handshake"])
             if msg.flags & message.FLAGS_META_ON_CONNECT:
                 # Usually this flag will be enabled, which results in including the object metadata
@@ -1294,10 +1874,12 @@ class Daemon(object):
                 }
             else:
                 flags = 0
-            data, compressed = serializer.serializeData(handshake_response, config.COMPRESSION)
+            data, compressed = serializer.serializeData(handshake_response, _compression(conn, msg.compressor()))
             msgtype = message.MSG_CONNECTOK
-            if compressed:
-                flags |= message.FLAGS_COMPRESSED
+            # the client asks for a compression stream, which this connection type must support
+            stream = "ZSTR" in msg.annotations and config.COMPRESSION_STREAM and hasattr(conn, "compressionStream")
+            if "SERP" in msg.annotations:
+                serializer_choice = self._negotiateSerializer(bytes(msg.annotations["SERP"]).decode("ascii").split(","))
         except errors.ConnectionClosedError:
             log.debug("handshake failed, connection closed early")
             return False
@@ -1306,15 +1888,48 @@ class Daemon(object):
             serializer = util.get_serializer_by_id(serializer_id)
             data, compressed = serializer.serializeData(str(x), False)
             msgtype = message.MSG_CONNECTFAIL
-            flags = message.FLAGS_COMPRESSED if compressed else 0
+            flags = 0
         # We need a minimal amount of response data or the socket will remain blocked
         # on some systems... (messages smaller than 40 bytes)
-        msg = message.Message(msgtype, data, serializer_id, flags, msg_seq, annotations=self.__annotations(), hmac_key=self._pyroHmacKey)
+        annotations = self.__annotations()
+        flags |= _compressionFlags(compressed, annotations)
+        if stream:
+            annotations["ZSTR"] = b""
+        if serializer_choice:
+            annotations["SERP"] = serializer_choice.encode("ascii")
+        if msgtype == message.MSG_CONNECTOK:
+            annotations["STRM"] = b""   # the client can get several items of a remote iterator at a time
+        msg = message.Message(msgtype, data, serializer_id, flags, msg_seq, annotations=annotations, hmac_key=self._pyroHmacKey)
         if config.LOGWIRE:
             _log_wiredata(log, "daemon handshake response", msg)
-        conn.send(msg.to_bytes())
+        msg.send(conn)
+        current_context.response_annotations = {}
+        if stream:
+            conn.compressionStream = util.CompressionStream()   # all further messages are compressed in the stream
         return msg.type == message.MSG_CONNECTOK
 
+    def _negotiateSerializer(self, preferences):
+        """
+        Chooses the serializer for the calls on a new connection, from the serializers that the client prefers (best first)
+        and that this daemon accepts. That is the first one of the client, unless SERIALIZERS_PREFERRED is set here as well:
+        then it's the one with the best combined rank in both preferences (the client's order decides ties).
+        Returns None if there's no serializer in common.
+        """
+        candidates = []
+        for name in preferences:
+            try:
+                if util.get_serializer(name).serializer_id in self.__serializer_ids:
+                    candidates.append(name)
+            except errors.SerializeError:
+                pass    # not available here
+        if not candidates:
+            return None
+        own = config.SERIALIZERS_PREFERRED
+        if own:
+            ranked = sorted(enumerate(candidates), key=lambda c: c[0] + (own.index(c[1]) if c[1] in own else len(own)))
+            return ranked[0][1]
+        return candidates[0]
+
     def validateHandshake(self, conn, data):
         """
         Override this to create a connection validator for new client connections.
@@ -1336,22 +1951,35 @@ class Daemon(object):
         wraps it in a reply to the calling side, as to not make this server side loop
         terminate due to exceptions caused by remote invocations.
         """
-        request_flags = 0
-        request_seq = 0
-        request_serializer_id = util.MarshalSerializer.serializer_id
-        wasBatched = False
-        isCallback = False
         try:
             msg = message.Message.recv(conn, [message.MSG_INVOKE, message.MSG_PING], hmac_key=self._pyroHmacKey)
         except errors.CommunicationError as x:
             # we couldn't even get data from the client, this is an immediate error
             # log.info("error receiving data from client %s: %s", conn.sock.getpeername(), x)
             raise x
+        if msg.flags & message.FLAGS_PIPELINED and msg.type == message.MSG_INVOKE and not msg.flags & message.FLAGS_ONEWAY:
+            # The client pipelines its calls on this connection and accepts the responses out of order.
+            # Process the call in a worker thread so that the next request can be received right away.
+            self._pipelinedExecutor.submit(self._handleRequestMessage, (conn, msg), {}, conn)
+        else:
+            self._handleRequestMessage(conn, msg)
+
+    def _handleRequestMessage(self, conn, msg, request=None):
+        """
+        Process a received request message, and send the response (if any) back over the connection.
+        The call in the message can be given already deserialized, as returned by :meth:`_deserializeRequest`.
+        """
+        request_flags = 0
+        request_seq = 0
+        request_serializer_id = util.MarshalSerializer.serializer_id
+        wasBatched = False
+        isCallback = False
         try:
             request_flags = msg.flags
             request_seq = msg.seq
             request_serializer_id = msg.serializer_id
-            current_context.correlation_id = uuid.UUID(bytes=msg.annotations["CORR"]) if "CORR" in msg.annotations else uuid.uuid4()
+            current_context._received(msg.annotations)
+            self._startResponseAnnotations(conn, msg)
             if config.LOGWIRE:
                 _log_wiredata(log, "daemon wiredata received", msg)
             if msg.type == message.MSG_PING:
@@ -1360,26 +1988,17 @@ class Daemon(object):
                                       annotations=self.__annotations(), hmac_key=self._pyroHmacKey)
                 if config.LOGWIRE:
                     _log_wiredata(log, "daemon wiredata sending", msg)
-                conn.send(msg.to_bytes())
+                msg.send(conn)
                 return
-            if msg.serializer_id not in self.__serializer_ids:
-                raise errors.SerializeError("message used serializer that is not accepted: %d" % msg.serializer_id)
-            serializer = util.get_serializer_by_id(msg.serializer_id)
-            if request_flags & message.FLAGS_KEEPSERIALIZED:
-                # pass on the wire protocol message blob unchanged
-                objId, method, vargs, kwargs = self.__deserializeBlobArgs(msg)
-            else:
-                # normal deserialization of remote call arguments
-                objId, method, vargs, kwargs = serializer.deserializeCall(msg.data, compressed=msg.flags & message.FLAGS_COMPRESSED)
+            serializer, objId, method, vargs, kwargs = request or self._deserializeRequest(msg)
+            request_method = method     # (method is replaced by the callable later)
             current_context.client = conn
-            try:
-                current_context.client_sock_addr = conn.sock.getpeername()   # store, because on oneway calls, socket will be disconnected
-            except socket.error:
-                current_context.client_sock_addr = None   # sometimes getpeername() doesn't work...
+            current_context.client_sock_addr = conn.peername   # store, because on oneway calls, socket will be disconnected
             current_context.seq = msg.seq
             current_context.annotations = msg.annotations
             current_context.msg_flags = msg.flags
             current_context.serializer_id = msg.serializer_id
+            request_compressor = msg.compressor()   # the response is compressed with the same codec as the request
             del msg  # invite GC to collect the object, don't wait for out-of-scope
             obj = self.objectsById.get(objId)
             if obj is not None:
@@ -1389,7 +2008,7 @@ class Daemon(object):
                     # batched method calls, loop over them all and collect all results
                     data = []
                     for method, vargs, kwargs in vargs:
-                        method = util.getAttribute(obj, method)
+                        method, _ = self._resolveMethod(obj, method)
                         try:
                             result = method(*vargs, **kwargs)  # this is the actual method call to the Pyro object
                         except Exception:
@@ -1412,41 +2031,29 @@ class Daemon(object):
                         # special case for direct attribute access (only exposed @properties are accessible)
                         data = util.set_exposed_property_value(obj, vargs[0], vargs[1], only_exposed=config.REQUIRE_EXPOSE)
                     else:
-                        method = util.getAttribute(obj, method)
+                        method, callback = self._resolveMethod(obj, method)
                         if request_flags & message.FLAGS_ONEWAY and config.ONEWAY_THREADED:
-                            # oneway call to be run inside its own thread
-                            _OnewayCallThread(target=method, args=vargs, kwargs=kwargs).start()
+                            # oneway call to be run in one of the oneway worker threads
+                            self._onewayExecutor.submit(method, vargs, kwargs, conn)
                         else:
-                            isCallback = getattr(method, "_pyroCallback", False)
+                            isCallback = callback
                             data = method(*vargs, **kwargs)  # this is the actual method call to the Pyro object
                             if not request_flags & message.FLAGS_ONEWAY:
                                 isStream, data = self._streamResponse(data, conn)
                                 if isStream:
-                                    # throw an exception as well as setting message flags
-                                    # this way, it is backwards compatible with older pyro versions.
-                                    exc = errors.ProtocolError("result of call is an iterator")
-                                    ann = {"STRM": data.encode()} if data else {}
-                                    self._sendExceptionResponse(conn, request_seq, serializer.serializer_id, exc, None,
-                                                                annotations=ann, flags=message.FLAGS_ITEMSTREAMRESULT)
+                                    self._sendStreamResponse(conn, request_seq, serializer, data)
                                     return
             else:
                 log.debug("unknown object requested: %s", objId)
                 raise errors.DaemonError("unknown object")
             if request_flags & message.FLAGS_ONEWAY:
                 return  # oneway call, don't send a response
+            elif request_flags & message.FLAGS_CHUNKED and not wasBatched and type(data) in (list, tuple) \
+                    and 0 < config.RESULT_CHUNKSIZE < len(data):
+                self._sendChunkedResponse(conn, request_seq, serializer, data, request_compressor, request_method)
             else:
-                data, compressed = serializer.serializeData(data, compress=config.COMPRESSION)
-                response_flags = 0
-                if compressed:
-                    response_flags |= message.FLAGS_COMPRESSED
-                if wasBatched:
-                    response_flags |= message.FLAGS_BATCH
-                msg = message.Message(message.MSG_RESULT, data, serializer.serializer_id, response_flags, request_seq,
-                                      annotations=self.__annotations(), hmac_key=self._pyroHmacKey)
-                current_context.response_annotations = {}
-                if config.LOGWIRE:
-                    _log_wiredata(log, "daemon wiredata sending", msg)
-                conn.send(msg.to_bytes())
+                self._sendResponse(conn, request_seq, serializer, data, message.FLAGS_BATCH if wasBatched else 0,
+                                   request_compressor, request_method)
         except Exception:
             xt, xv = sys.exc_info()[0:2]
             msg = getattr(xv, "pyroMsg", None)
@@ -1465,22 +2072,209 @@ class Daemon(object):
             if isCallback or isinstance(xv, (errors.CommunicationError, errors.SecurityError)):
                 raise  # re-raise if flagged as callback, communication or security error.
 
-    def _clientDisconnect(self, conn):
-        if config.ITER_STREAM_LINGER > 0:
-            # client goes away, keep streams around for a bit longer (allow reconnect)
-            for streamId in list(self.streaming_responses):
-                info = self.streaming_responses.get(streamId, None)
-                if info and info[0] is conn:
-                    _, timestamp, _, stream = info
-                    self.streaming_responses[streamId] = (None, timestamp, time.time(), stream)
+    def _resolveMethod(self, obj, name):
+        """
+        Returns the callable that performs a remote call of the named method on the Pyro object, and its callback flag.
+        This does the same checks as :func:`Pyro4.util.getAttribute`, but exposed plain methods are looked up
+        in the dispatch table of the object's class, which is built once per method.
+        """
+        cls = type(obj)
+        table = self._dispatchTables.get(cls)
+        if table is None:
+            table = self._dispatchTables[cls] = {}
+        entry = table.get(name)
+        if entry is None:
+            entry = _dispatchEntry(cls, name)
+            if entry is not None:
+                # only exposed methods are stored: the names come from the clients, the table mustn't grow with other names
+                table[name] = entry
+        if entry is None or name in getattr(obj, "__dict__", ()):
+            # not an exposed plain method, or shadowed by an instance attribute: do a regular attribute lookup
+            method = util.getAttribute(obj, name)
+            return self._withExecutor(obj, method), getattr(method, "_pyroCallback", False)
+        function, callback, executor = entry
+        if executor == "process":
+            return functools.partial(self._callInProcess, obj, name), callback
+        return function.__get__(obj, cls), callback
+
+    def _withExecutor(self, obj, method):
+        """returns the callable that performs the call of the method, according to its executor"""
+        if getattr(method, "_pyroExecutor", None) == "process":
+            return functools.partial(self._callInProcess, obj, method.__name__)
+        return method
+
+    def _callInProcess(self, obj, methodname, *vargs, **kwargs):
+        """Calls the method on a copy of the object in the daemon's process pool, and waits for the result."""
+        with self._processPoolLock:
+            if self._processPool is None:
+                try:
+                    from concurrent.futures import ProcessPoolExecutor
+                except ImportError:
+                    raise errors.PyroError("the process executor requires the concurrent.futures module")
+                log.debug("creating process pool")
+                self._processPool = ProcessPoolExecutor(config.PROCESSPOOL_SIZE or None)
+        # The state is pickled here, so that an object that can't be copied gets a clear error.
+        try:
+            state = pickle.dumps(_objectState(obj), pickle.HIGHEST_PROTOCOL)
+        except Exception as x:
+            raise errors.SerializeError("the state of %s can't be copied to the process pool: %s" % (type(obj).__name__, x))
+        return self._processPool.submit(_callMethod, type(obj), state, methodname, vargs, kwargs).result()
+
+    def _deserializeRequest(self, msg):
+        """Deserialize the call in a request message, returns (serializer, object id, method name, vargs, kwargs)"""
+        if msg.serializer_id not in self.__serializer_ids:
+            raise errors.SerializeError("message used serializer that is not accepted: %d" % msg.serializer_id)
+        serializer = util.get_serializer_by_id(msg.serializer_id)
+        if msg.flags & message.FLAGS_KEEPSERIALIZED:
+            # pass on the wire protocol message blob unchanged
+            objId, method, vargs, kwargs = self.__deserializeBlobArgs(msg)
         else:
-            # client goes away, close any streams it had open as well
-            for streamId in list(self.streaming_responses):
-                info = self.streaming_responses.get(streamId, None)
-                if info and info[0] is conn:
+            # normal deserialization of remote call arguments
+            objId, method, vargs, kwargs = serializer.deserializeCall(msg.data, compressed=msg.compressor())
+            msg.release_buffer()
+        return serializer, objId, method, vargs, kwargs
+
+    def _startResponseAnnotations(self, conn, msg):
+        """
+        Start with fresh response annotations for the request in the message. An earlier request on this thread
+        may have been from another client, and a oneway request doesn't send its response annotations,
+        so they must not carry over. Adds the oneway credits and the hmac algorithm the client asked for.
+        """
+        annotations = current_context.response_annotations = {}
+        if "CRED" in msg.annotations:
+            # the client uses flow control for its oneway calls, grant it the credits it has left
+            credits = max(0, config.ONEWAY_CREDITS - self._onewayExecutor.pending(conn))
+            annotations["CRED"] = str(credits).encode()
+        if "HALG" in msg.annotations:
+            # respond with the same hmac algorithm as the client uses
+            annotations["HALG"] = msg.annotations["HALG"]
+
+    def _sendResponse(self, conn, request_seq, serializer, data, flags=0, compressor=None, method=None):
+        """
+        serialize the result of a call and send it back to the client.
+        If the request was compressed, its compression codec is given, so the response is compressed with the same codec.
+        The name of the method that was called is used for adaptive compression.
+        """
+        data, compressed = serializer.serializeData(data, compress=_compression(conn, compressor), method=method)
+        annotations = self.__annotations()
+        flags |= _compressionFlags(compressed, annotations)
+        msg = message.Message(message.MSG_RESULT, data, serializer.serializer_id, flags, request_seq,
+                              annotations=annotations, hmac_key=self._pyroHmacKey)
+        current_context.response_annotations = {}
+        if config.LOGWIRE:
+            _log_wiredata(log, "daemon wiredata sending", msg)
+        msg.send(conn)
+
+    def _sendChunkedResponse(self, conn, request_seq, serializer, data, compressor=None, method=None):
+        """
+        Send a large list or tuple result in chunks of RESULT_CHUNKSIZE items that are serialized one by one,
+        so that the serialized form of the whole result never has to be in memory at once.
+        All but the last chunk are flagged; the client joins the chunks together again.
+        If serializing a chunk fails, the error is sent instead of the rest of the result.
+        """
+        size = config.RESULT_CHUNKSIZE
+        last = (len(data) - 1) // size * size
+        for start in range(0, last, size):
+            chunk, compressed = serializer.serializeData(data[start:start + size], compress=_compression(conn, compressor),
+                                                         method=method)
+            annotations = dict(self.__annotations())    # the final message gets the response annotations too
+            flags = message.FLAGS_CHUNKED | _compressionFlags(compressed, annotations)
+            msg = message.Message(message.MSG_RESULT, chunk, serializer.serializer_id, flags, request_seq,
+                                  annotations=annotations, hmac_key=self._pyroHmacKey)
+            del chunk
+            if config.LOGWIRE:
+                _log_wiredata(log, "daemon wiredata sending", msg)
+            msg.send(conn)
+            del msg
+        self._sendResponse(conn, request_seq, serializer, data[last:], 0, compressor, method)
+
+    def _sendStreamResponse(self, conn, request_seq, serializer, streamId):
+        """tell the client that the result of its call is an iterator that it can get the items from"""
+        # throw an exception as well as setting message flags
+        # this way, it is backwards compatible with older pyro versions.
+        exc = errors.ProtocolError("result of call is an iterator")
+        ann = {"STRM": streamId.encode()} if streamId else {}
+        self._sendExceptionResponse(conn, request_seq, serializer.serializer_id, exc, None,
+                                    annotations=ann, flags=message.FLAGS_ITEMSTREAMRESULT)
+
+    def _clientDisconnect(self, conn):
+        with self._streamsLock:
+            streamIds = self._streamsByClient.pop(conn, ())
+            if config.ITER_STREAM_LINGER > 0:
+                # client goes away, keep streams around for a bit longer (allow reconnect)
+                now = time.time()
+                for streamId in streamIds:
+                    _, timestamp, _, stream = self.streaming_responses[streamId]
+                    self.streaming_responses[streamId] = (None, timestamp, now, stream)
+                    self._streamsByClient[None].add(streamId)
+                    heapq.heappush(self._streamDeadlines, (now + config.ITER_STREAM_LINGER, streamId, now, 2))
+            else:
+                # client goes away, close any streams it had open as well
+                for streamId in streamIds:
                     del self.streaming_responses[streamId]
         self.clientDisconnect(conn)  # user overridable hook
 
+    def _getStream(self, streamId, client):
+        """returns the item stream with the given id, and associates it with the client if it was lingering"""
+        with self._streamsLock:
+            info = self.streaming_responses.get(streamId)
+            if info is None:
+                raise errors.PyroError("item stream terminated")
+            if info[0] is None:
+                # reset client connection association (can be None if proxy disconnected)
+                self.streaming_responses[streamId] = (client, info[1], 0, info[3])
+                self._streamsByClient[None].discard(streamId)
+                self._streamsByClient[client].add(streamId)
+            return info[3]
+
+    def _removeStream(self, streamId):
+        with self._streamsLock:
+            info = self.streaming_responses.pop(streamId, None)
+            if info is not None:
+                self._discardClientStream(info[0], streamId)
+
+    def _discardClientStream(self, client, streamId):
+        streamIds = self._streamsByClient.get(client)
+        if streamIds is not None:
+            streamIds.discard(streamId)
+            if not streamIds:
+                del self._streamsByClient[client]
+
+    def _clearStreams(self):
+        with self._streamsLock:
+            self.streaming_responses = {}
+            self._streamsByClient.clear()
+            del self._streamDeadlines[:]
+
+    def _expireStreams(self):
+        """remove the streams that are past their lifetime or linger time, in order of their deadline"""
+        with self._streamsLock:
+            now = time.time()
+            deadlines = self._streamDeadlines
+            while deadlines and deadlines[0][0] <= now:
+                _, streamId, timestamp, index = heapq.heappop(deadlines)
+                info = self.streaming_responses.get(streamId)
+                if info is not None and info[index] == timestamp:   # otherwise the deadline is no longer relevant
+                    del self.streaming_responses[streamId]
+                    self._discardClientStream(info[0], streamId)
+                    self._streamsExpired += 1
+            if len(deadlines) > 2 * len(self.streaming_responses) + 100:
+                # remove the deadlines of the streams that have already gone
+                self._streamDeadlines = [d for d in deadlines if d[1] in self.streaming_responses]
+                heapq.heapify(self._streamDeadlines)
+
+    def streamStats(self):
+        """
+        Returns a dict with statistics about the item streams of iterator results: the number of open streams,
+        how many of them are lingering (their client disconnected), and the number of streams created and expired.
+        """
+        with self._streamsLock:
+            return {"streams": len(self.streaming_responses),
+                    "lingering": len(self._streamsByClient.get(None, ())),
+                    "clients": len(self._streamsByClient) - (None in self._streamsByClient),
+                    "created": self._streamsCreated,
+                    "expired": self._streamsExpired}
+
     def _housekeeping(self):
         """
         Perform periodical housekeeping actions (cleanups etc)
@@ -1488,23 +2282,8 @@ class Daemon(object):
         if self._shutting_down:
             return
         with self.housekeeper_lock:
-            if self.streaming_responses:
-                if config.ITER_STREAM_LIFETIME > 0:
-                    # cleanup iter streams that are past their lifetime
-                    for streamId in list(self.streaming_responses.keys()):
-                        info = self.streaming_responses.get(streamId, None)
-                        if info:
-                            last_use_period = time.time() - info[1]
-                            if 0 < config.ITER_STREAM_LIFETIME < last_use_period:
-                                del self.streaming_responses[streamId]
-                if config.ITER_STREAM_LINGER > 0:
-                    # cleanup iter streams that are past their linger time
-                    for streamId in list(self.streaming_responses.keys()):
-                        info = self.streaming_responses.get(streamId, None)
-                        if info and info[2]:
-                            linger_period = time.time() - info[2]
-                            if linger_period > config.ITER_STREAM_LINGER:
-                                del self.streaming_responses[streamId]
+            if self._streamDeadlines:
+                self._expireStreams()
             self.housekeeping()
 
     def housekeeping(self):
@@ -1581,7 +2360,7 @@ class Daemon(object):
                               annotations=annotations, hmac_key=self._pyroHmacKey)
         if config.LOGWIRE:
             _log_wiredata(log, "daemon wiredata sending (error response)", msg)
-        connection.send(msg.to_bytes())
+        msg.send(connection)
 
     def register(self, obj_or_class, objectId=None, force=False):
         """
@@ -1698,11 +2477,16 @@ class Daemon(object):
     def close(self):
         """Close down the server and release resources"""
         self.__mustshutdown.set()
-        self.streaming_responses = {}
+        self._clearStreams()
         if self.transportServer:
             log.debug("daemon closing")
             self.transportServer.close()
             self.transportServer = None
+        if self._processPool:
+            self._processPool.shutdown()
+            self._processPool = None
+        self._onewayExecutor.close()
+        self._pipelinedExecutor.close()
 
     def annotations(self):
         """Override to return a dict with custom user annotations to be sent with each response message."""
@@ -1712,17 +2496,37 @@ class Daemon(object):
         """
         Combines the event loop of the other daemon in the current daemon's loop.
         You can then simply run the current daemon's requestLoop to serve both daemons.
-        This works fine on the multiplex server type, but doesn't work with the threaded server type.
+        This works fine on the multiplex and asyncio server types (both daemons must use the same type),
+        but doesn't work with the threaded server type.
         """
         log.debug("combining event loop with other daemon")
         self.transportServer.combine_loop(daemon.transportServer)
 
+    def onewayStats(self):
+        """
+        Returns a dict with statistics about the threads that run the oneway calls: the number of worker threads,
+        how many are busy, the number of calls waiting in the queue, and the number of processed, dropped and rejected calls.
+        """
+        return self._onewayExecutor.stats()
+
+    def attachLoop(self, loop):
+        """
+        Serves the daemon's requests on the given asyncio event loop, which you run yourself (instead of calling requestLoop).
+        This only works with the asyncio server type. The daemon stops serving when it is shut down.
+        """
+        if not hasattr(self.transportServer, "attach_loop"):
+            raise errors.PyroError("attaching to an event loop requires the asyncio server type")
+        log.debug("attaching daemon to event loop")
+        self.transportServer.attach_loop(loop)
+
     def __annotations(self):
         annotations = current_context.response_annotations
-        if current_context.correlation_id:
-            annotations["CORR"] = current_context.correlation_id.bytes
-        else:
+        correlation_id = current_context._correlation_id
+        if correlation_id is None or correlation_id is _NEW_CORRELATION_ID:
+            # the request had no correlation id and the call didn't ask for one: don't make one up just for the response
             annotations.pop("CORR", None)
+        else:
+            annotations["CORR"] = correlation_id.bytes if isinstance(correlation_id, uuid.UUID) else bytes(correlation_id)
         annotations.update(self.annotations())
         return annotations
 
@@ -1769,7 +2573,15 @@ class Daemon(object):
                 if type(data) in self.__lazy_dict_iterator_types:
                     raise errors.PyroError("won't serialize or stream lazy dict iterators, convert to list yourself")
                 stream_id = str(uuid.uuid4())
-                self.streaming_responses[stream_id] = (client, time.time(), 0, data)
+                with self._streamsLock:
+                    if 0 < config.ITER_STREAM_CLIENT_LIMIT <= len(self._streamsByClient.get(client, ())):
+                        raise errors.PyroError("too many open item streams for this client")
+                    now = time.time()
+                    self.streaming_responses[stream_id] = (client, now, 0, data)
+                    self._streamsByClient[client].add(stream_id)
+                    self._streamsCreated += 1
+                    if config.ITER_STREAM_LIFETIME > 0:
+                        heapq.heappush(self._streamDeadlines, (now + config.ITER_STREAM_LIFETIME, stream_id, now, 1))
                 return True, stream_id
             return True, None
         return False, data
@@ -1819,11 +2631,46 @@ util.SerializerBase.register_class_to_dict(Daemon, serialize_core_object_to_dict
 util.SerializerBase.register_class_to_dict(futures._ExceptionWrapper, futures._ExceptionWrapper.__serialized_dict__, serpent_too=False)
 
 
+def _compression(conn, compressor=None):
+    """
+    What to compress the message data for the connection with: False (nothing), True (the configured codec),
+    or a codec: the given one (the one the other side used), or on the daemon side the configured one if the client
+    can decompress it and zlib otherwise. Local connections are not compressed if COMPRESSION_LOCAL is off.
+    """
+    if getattr(conn, "compressionStream", None) is not None:
+        return False    # the connection's compression stream compresses the messages when they're sent
+    if config.COMPRESSION and (config.COMPRESSION_LOCAL or not getattr(conn, "local", False)):
+        if compressor:
+            return compressor
+        codecs = getattr(conn, "compressionCodecs", None)
+        if codecs is not None:
+            # daemon side: use the configured codec only if the client said it has it, zlib is always there
+            configured = util.get_compressor(config.COMPRESSION_CODEC)
+            return configured if configured.name in codecs else util.get_compressor_by_name("zlib")
+        return True
+    return False
+
+
+def _compressionFlags(compressed, annotations):
+    """returns the message flags for data that is compressed with the given codec (or not), the codec is named in the annotations"""
+    if not compressed:
+        return 0
+    if compressed is True or compressed.name == "zlib":
+        annotations.pop("CMPR", None)   # zlib is the default and is not named
+    else:
+        annotations["CMPR"] = compressed.name.encode("ascii")
+    return message.FLAGS_COMPRESSED
+
+
 def _log_wiredata(logger, text, msg):
     """logs all the given properties of the wire message in the given logger"""
     corr = str(uuid.UUID(bytes=msg.annotations["CORR"])) if "CORR" in msg.annotations else "?"
+    data = msg.data.tobytes() if type(msg.data) in (memoryview, util.OutOfBandData) else msg.data
     logger.debug("%s: msgtype=%d flags=0x%x ser=%d seq=%d corr=%s\nannotations=%r\ndata=%r" %
-                 (text, msg.type, msg.flags, msg.serializer_id, msg.seq, corr, msg.annotations, msg.data))
+                 (text, msg.type, msg.flags, msg.serializer_id, msg.seq, corr, msg.annotations, data))
+
+
+_NEW_CORRELATION_ID = object()   # a call context with this gets a new correlation id when it is first asked for
 
 
 class _CallContext(threading.local):
@@ -1836,11 +2683,32 @@ class _CallContext(threading.local):
         self.serializer_id = 0
         self.annotations = {}
         self.response_annotations = {}
-        self.correlation_id = None
+        self._correlation_id = None
+
+    @property
+    def correlation_id(self):
+        # the correlation id of a call is only created (or decoded from the CORR annotation) when it is used
+        corr = self._correlation_id
+        if corr is _NEW_CORRELATION_ID:
+            corr = self._correlation_id = uuid.uuid4()
+        elif type(corr) is bytes:
+            corr = self._correlation_id = uuid.UUID(bytes=corr)
+        return corr
+
+    @correlation_id.setter
+    def correlation_id(self, value):
+        self._correlation_id = value
+
+    def _received(self, annotations):
+        """a new call (or handshake) was received, its correlation id comes from the CORR annotation, or is new"""
+        self._correlation_id = annotations.get("CORR", _NEW_CORRELATION_ID)
 
     def to_global(self):
         if sys.platform != "cli":
-            return dict(self.__dict__)
+            values = dict(self.__dict__)
+            del values["_correlation_id"]
+            values["correlation_id"] = self.correlation_id
+            return values
         # ironpython somehow has problems getting at the values, so do it manually:
         return {
             "client": self.client,
@@ -1878,15 +2746,162 @@ class _CallContext(threading.local):
             raise errors.PyroError("cannot untrack resource on a connectionless call")
 
 
-class _OnewayCallThread(threading.Thread):
-    def __init__(self, target, args, kwargs):
-        super(_OnewayCallThread, self).__init__(target=target, args=args, kwargs=kwargs, name="oneway-call")
-        self.daemon = True
-        self.parent_context = current_context.to_global()
+class _OnewayExecutor(object):
+    """
+    Runs oneway calls in a bounded number of reusable threads. When they are all busy, the calls wait
+    in a queue of at most ``ONEWAY_QUEUE_SIZE`` calls. What happens when that is full is set by ``ONEWAY_OVERFLOW``.
+    """
+    def __init__(self):
+        self.lock = threading.Condition()
+        self.queue = collections.deque()    # (method, vargs, kwargs, context, client connection)
+        self.clients = collections.defaultdict(int)    # client connection -> number of its calls queued or running
+        self.workers = 0
+        self.idle = 0
+        self.processed = self.dropped = self.rejected = 0
+        self.closed = False
+        self._limits()  # fail early on an invalid configuration
+
+    threadname = "oneway-call"
+
+    def _limits(self):
+        """returns the max number of worker threads, the max queue size (0 = unlimited) and the overflow policy"""
+        if config.ONEWAY_OVERFLOW not in ("block", "drop", "reject"):
+            raise ValueError("invalid oneway overflow policy: " + str(config.ONEWAY_OVERFLOW))
+        return max(1, config.ONEWAY_THREADPOOL_SIZE), config.ONEWAY_QUEUE_SIZE, config.ONEWAY_OVERFLOW
+
+    def _failed(self, method):
+        log.warning("exception in oneway call %s", getattr(method, "__name__", method), exc_info=True)
+
+    def submit(self, method, vargs, kwargs, client=None):
+        """Queue the call, and start another worker thread if there's no idle one."""
+        call = (method, vargs, kwargs, current_context.to_global(), client)
+        poolsize, queuesize, overflow = self._limits()
+        with self.lock:
+            while queuesize and len(self.queue) >= queuesize and not self.closed:
+                if overflow == "drop":
+                    self.dropped += 1
+                    log.debug("%s queue is full, call dropped", self.threadname)
+                    return
+                if overflow == "reject":
+                    self.rejected += 1
+                    raise errors.DaemonError("oneway call queue is full")    # a failed call, the client stays connected
+                self.lock.wait()    # block the connection until there's room in the queue
+            self.queue.append(call)
+            self.clients[client] += 1
+            if self.idle < len(self.queue) and self.workers < poolsize:
+                self.workers += 1
+                thread = threading.Thread(target=self._work, name=self.threadname)
+                thread.daemon = True
+                thread.start()
+            self.lock.notify_all()
+
+    def _work(self):
+        while True:
+            with self.lock:
+                self.idle += 1
+                while not self.queue and not self.closed:
+                    self.lock.wait()
+                self.idle -= 1
+                if self.closed:
+                    self.workers -= 1
+                    return
+                method, vargs, kwargs, context, client = self.queue.popleft()
+                self.lock.notify_all()  # there's room in the queue again
+            current_context.from_global(context)
+            try:
+                method(*vargs, **kwargs)
+            except Exception:
+                self._failed(method)
+            with self.lock:
+                self.processed += 1
+                self.clients[client] -= 1
+                if self.clients[client] <= 0:
+                    del self.clients[client]
+
+    def pending(self, client):
+        """returns the number of oneway calls of the client that are queued or running"""
+        with self.lock:
+            return self.clients.get(client, 0)
+
+    def close(self):
+        """Stop the worker threads. Calls that are still in the queue are discarded."""
+        with self.lock:
+            self.closed = True
+            self.queue.clear()
+            self.clients.clear()
+            self.lock.notify_all()
+
+    def stats(self):
+        """returns a dict with the current worker and queue counts, and the number of processed, dropped and rejected calls"""
+        with self.lock:
+            return {"workers": self.workers,
+                    "busy": self.workers - self.idle,
+                    "queue_depth": len(self.queue),
+                    "processed": self.processed,
+                    "dropped": self.dropped,
+                    "rejected": self.rejected}
+
+
+def _dispatchEntry(clazz, name):
+    """
+    Creates the dispatch table entry for a method of a class: (function, callback, executor).
+    Returns None if the name isn't an exposed plain method that can be looked up in the class directly.
+    """
+    if util.is_private_attribute(name) or clazz.__getattribute__ is not object.__getattribute__:
+        return None
+    for base in inspect.getmro(clazz):
+        if name in vars(base):
+            function = vars(base)[name]
+            break
+    else:
+        return None
+    if not inspect.isfunction(function) or not getattr(function, "_pyroExposed", False):
+        return None
+    return function, getattr(function, "_pyroCallback", False), getattr(function, "_pyroExecutor", None)
+
+
+def _objectState(obj):
+    """
+    The state of a Pyro object to copy to another process: (attributes, slots). These are the attributes in its __dict__
+    and the values of its __slots__, except for Pyro's own attributes (such as the daemon).
+    """
+    slots = {}
+    for clazz in type(obj).__mro__:
+        names = clazz.__dict__.get("__slots__", ())
+        for name in ([names] if isinstance(names, str) else names):
+            if name.startswith("__") and not name.endswith("__"):
+                name = "_%s%s" % (clazz.__name__.lstrip("_"), name)     # private names are mangled
+            if name not in ("__dict__", "__weakref__") and not name.startswith("_pyro") and hasattr(obj, name):
+                slots[name] = getattr(obj, name)
+    attributes = {k: v for k, v in getattr(obj, "__dict__", {}).items() if not k.startswith("_pyro")}
+    return attributes, slots
+
+
+def _callMethod(clazz, state, methodname, vargs, kwargs):
+    """Calls a method on a copy of a Pyro object, in a process of the daemon's process pool."""
+    attributes, slots = pickle.loads(state)
+    obj = clazz.__new__(clazz)
+    if attributes:
+        obj.__dict__.update(attributes)
+    for name, value in slots.items():
+        object.__setattr__(obj, name, value)
+    return getattr(obj, methodname)(*vargs, **kwargs)
+
+
+class _PipelinedExecutor(_OnewayExecutor):
+    """
+    Runs pipelined calls in at most ``THREADPOOL_SIZE`` reusable threads. When they are all busy, at most that
+    many calls wait in the queue; after that, the next request isn't read from the connection until there's room.
+    """
+    threadname = "pipelined-call"
+
+    def _limits(self):
+        poolsize = max(1, config.THREADPOOL_SIZE)
+        return poolsize, poolsize, "block"
 
-    def run(self):
-        current_context.from_global(self.parent_context)
-        super(_OnewayCallThread, self).run()
+    def _failed(self, method):
+        # the client is gone or it misbehaved; its connection is dealt with by the thread that reads its requests
+        log.debug("error during pipelined call: %r", sys.exc_info()[1])
 
 
 # name server utility function, here to avoid cyclic dependencies
@@ -2034,7 +3049,7 @@ class SerializedBlob(object):
         if self._contains_blob:
             protocol_msg = self._data
             serializer = util.get_serializer_by_id(protocol_msg.serializer_id)
-            _, _, data, _ = serializer.deserializeData(protocol_msg.data, protocol_msg.flags & message.FLAGS_COMPRESSED)
+            _, _, data, _ = serializer.deserializeData(protocol_msg.data, protocol_msg.compressor())
             return data
         else:
             return self._data
@@ -6,15 +6,17 @@ Pyro - Python Remote Objects.  Copyright by Irmen de Jong (irmen@razorvine.net).
 
 import hashlib
 import hmac
+import mmap
 import struct
+import tempfile
 import logging
 import sys
-import zlib
-from Pyro4 import errors, constants
+import time
+from Pyro4 import errors, constants, socketutil, util
 from Pyro4.configuration import config
 
 
-__all__ = ["Message", "secure_compare"]
+__all__ = ["Message", "secure_compare", "hmacStats"]
 
 log = logging.getLogger("Pyro4.message")
 
@@ -31,6 +33,23 @@ FLAGS_BATCH = 1 << 3
 FLAGS_META_ON_CONNECT = 1 << 4
 FLAGS_ITEMSTREAMRESULT = 1 << 5
 FLAGS_KEEPSERIALIZED = 1 << 6
+FLAGS_PIPELINED = 1 << 7
+FLAGS_CHUNKED = 1 << 8    # request: the client accepts a chunked result, response: more chunks of the result follow
+FLAGS_FRAGMENT = 1 << 9   # more fragments of the message data follow
+
+_max_data_size = 0x7fffffff     # the data size field in the header is a signed 32 bits integer
+_fragment_struct = struct.Struct("!Q")
+
+_annotation_struct = struct.Struct("!4sH")
+_annotation_header_size = _annotation_struct.size
+
+# the conversion of annotation keys between the wire format (bytes) and the annotations dict (str)
+# is decided once here, to keep version checks out of the message processing loops
+if sys.version_info >= (3, 0):
+    _encode_annotation_key = str.encode
+    _decode_annotation_key = bytes.decode
+else:
+    _encode_annotation_key = _decode_annotation_key = str
 
 
 class Message(object):
@@ -74,16 +93,30 @@ class Message(object):
     that we are dealing with an actual correct PYRO protocol header and not some random
     data that happens to start with the 'PYRO' protocol identifier.
 
-    Pyro now uses two annotation chunks that you should not touch yourself:
+    Pyro now uses these annotation chunks that you should not touch yourself:
     'HMAC'  contains the hmac digest of the message data bytes and
     all of the annotation chunk data bytes (except those of the HMAC chunk itself).
+    'HALG'  contains the name of the hmac algorithm, if it's not sha1
     'CORR'  contains the correlation id (guid bytes)
+    'OOBF'  contains the sizes of the out-of-band pickle buffers that follow the pickle stream in the message data
+    'CMPR'  contains the name of the compression codec, if it's not zlib
+    'ZSTR'  in the connection handshake: asks for (and confirms) a compression stream for the connection
+    'SERP'  in the connection handshake: the serializers the client prefers (best first), and the one the daemon chose
+    'CMPA'  in the connection handshake: the compression codecs the client has (if it has more than zlib)
+    'STRM'  in the connection handshake response: the daemon can give several items of a remote iterator at a time
+    'FRAG'  contains the total data size of a message that is sent in fragments (see below)
+
+    Message data that is larger than the data size field allows (2 Gb), or larger than the ``FRAGMENT_SIZE``
+    config item, is sent in fragments. The first fragment is a message with the header and annotations as usual
+    and the first part of the data. The other parts follow, each with a header of its own (same type and sequence
+    number, no annotations). All fragments except the last one have the FLAGS_FRAGMENT flag set.
     Other chunk names are free to use for custom purposes, but Pyro has the right
     to reserve more of them for internal use in the future.
     """
-    __slots__ = ["type", "flags", "seq", "data", "data_size", "serializer_id", "annotations", "annotations_size", "hmac_key"]
+    __slots__ = ["type", "flags", "seq", "data", "data_size", "serializer_id", "annotations", "annotations_size", "hmac_key", "recv_buffer"]
     header_format = '!4sHHHHiHHHH'
-    header_size = struct.calcsize(header_format)
+    header_struct = struct.Struct(header_format)
+    header_size = header_struct.size
     checksum_magic = 0x34E9
 
     def __init__(self, msgType, databytes, serializer_id, flags, seq, annotations=None, hmac_key=None):
@@ -93,14 +126,20 @@ class Message(object):
         self.data = databytes
         self.data_size = len(self.data)
         self.serializer_id = serializer_id
-        self.annotations = dict(annotations or {})
+        self.annotations = dict(annotations) if annotations else {}
         self.hmac_key = hmac_key
-        if self.hmac_key:
+        self.recv_buffer = None
+        if type(databytes) is util.OutOfBandData:
+            self.annotations["OOBF"] = databytes.layout()
+        if hmac_key:
+            if "HALG" not in self.annotations and config.HMAC_ALGORITHM != "sha1":
+                self.annotations["HALG"] = config.HMAC_ALGORITHM.encode("ascii")
             self.annotations["HMAC"] = self.hmac()   # should be done last because it calculates hmac over other annotations
-        self.annotations_size = sum([6 + len(v) for v in self.annotations.values()])
-        if 0 < config.MAX_MESSAGE_SIZE < (self.data_size + self.annotations_size):
+        self.annotations_size = sum([6 + len(v) for v in self.annotations.values()]) if self.annotations else 0
+        max_size = config.MAX_MESSAGE_SIZE
+        if 0 < max_size < (self.data_size + self.annotations_size):
             raise errors.MessageTooLargeError("max message size exceeded (%d where max=%d)" %
-                                              (self.data_size + self.annotations_size, config.MAX_MESSAGE_SIZE))
+                                              (self.data_size + self.annotations_size, max_size))
 
     def __repr__(self):
         return "<%s.%s at %x; type=%d flags=%d seq=%d datasize=%d #ann=%d>" %\
@@ -108,46 +147,138 @@ class Message(object):
 
     def to_bytes(self):
         """creates a byte stream containing the header followed by annotations (if any) followed by the data"""
-        return self.__header_bytes() + self.__annotations_bytes() + self.data
+        if self.data_size > _fragment_size():
+            return b"".join(self.to_buffers())
+        data = self.data.tobytes() if type(self.data) is util.OutOfBandData else self.data
+        return self.__header_bytes() + self.__annotations_bytes() + data
+
+    def to_buffers(self):
+        """
+        Returns a list of byte buffers that, sent in sequence, form the same byte stream as :meth:`to_bytes`
+        (header, annotation chunks, data). The buffers are not concatenated, so the (possibly large)
+        payload data is not copied. Meant for scatter-gather sending.
+        """
+        size = _fragment_size()
+        if self.data_size > size:
+            return [buf for _, fragment in self.__fragments(size) for buf in fragment]
+        buffers = [self.__header_bytes()]
+        buffers.extend(self.__annotations_buffers())
+        if type(self.data) is util.OutOfBandData:
+            buffers.extend(self.data.frames())
+        else:
+            buffers.append(self.data)
+        return buffers
+
+    def __fragments(self, size):
+        """
+        Splits the message in fragments with at most the given number of data bytes. Returns a list with the
+        data size and the list of buffers of every fragment (header, annotation chunks, data parts).
+        The data is not copied, the data parts are memoryviews on it.
+        """
+        parts = self.data.frames() if type(self.data) is util.OutOfBandData else [self.data]
+        chunks = [[]]
+        filled = 0
+        for part in parts:
+            view = memoryview(part)
+            if view.itemsize != 1 or view.ndim != 1:
+                view = view.cast("B")
+            start = 0
+            while start < len(view):
+                if filled == size:
+                    chunks.append([])
+                    filled = 0
+                end = min(len(view), start + size - filled)
+                chunks[-1].append(view[start:end])
+                filled += end - start
+                start = end
+        annotations = dict(self.annotations)
+        annotations["FRAG"] = _fragment_struct.pack(self.data_size)
+        flags = self.flags | FLAGS_FRAGMENT
+        fragments = []
+        for number, chunk in enumerate(chunks, 1):
+            if number == len(chunks):
+                flags &= ~FLAGS_FRAGMENT
+            header = Message(self.type, b"", self.serializer_id, flags, self.seq, annotations=annotations)
+            header.data_size = sum(len(c) for c in chunk)
+            fragments.append((header.data_size, [header.__header_bytes()] + header.__annotations_buffers() + chunk))
+            annotations = None
+            flags = FLAGS_FRAGMENT
+        return fragments
 
     def __header_bytes(self):
-        if not (0 <= self.data_size <= 0x7fffffff):
+        if not (0 <= self.data_size <= _max_data_size):
             raise ValueError("invalid message size (outside range 0..2Gb)")
         checksum = (self.type + constants.PROTOCOL_VERSION + self.data_size + self.annotations_size +
                     self.serializer_id + self.flags + self.seq + self.checksum_magic) & 0xffff
-        return struct.pack(self.header_format, b"PYRO", constants.PROTOCOL_VERSION, self.type, self.flags,
+        return self.header_struct.pack(b"PYRO", constants.PROTOCOL_VERSION, self.type, self.flags,
                            self.seq, self.data_size, self.serializer_id, self.annotations_size, 0, checksum)
 
+    def __annotations_buffers(self):
+        a = []
+        for k, v in self.annotations.items():
+            if len(k) != 4:
+                raise errors.ProtocolError("annotation key must be of length 4")
+            a.append(_annotation_struct.pack(_encode_annotation_key(k), len(v)))
+            a.append(v)
+        return a
+
     def __annotations_bytes(self):
         if self.annotations:
-            a = []
-            for k, v in self.annotations.items():
-                if len(k) != 4:
-                    raise errors.ProtocolError("annotation key must be of length 4")
-                if sys.version_info >= (3, 0):
-                    k = k.encode("ASCII")
-                a.append(struct.pack("!4sH", k, len(v)))
-                a.append(v)
-            return b"".join(a)
+            return b"".join(self.__annotations_buffers())
         return b""
 
-    # Note: this 'chunked' way of sending is not used because it triggers Nagle's algorithm
-    # on some systems (linux). This causes big delays, unless you change the socket option
-    # TCP_NODELAY to disable the algorithm. What also works, is sending all the message bytes
-    # in one go: connection.send(message.to_bytes()). This is what Pyro does.
     def send(self, connection):
-        """send the message as bytes over the connection"""
-        connection.send(self.__header_bytes())
-        if self.annotations:
-            connection.send(self.__annotations_bytes())
-        connection.send(self.data)
+        """
+        Send the message over the connection.
+        If the connection supports it (``sendv``), the header, annotation chunks and data are written
+        with a single scatter-gather call, without first concatenating them into one bytes object.
+        Otherwise the message is sent in one go as ``connection.send(message.to_bytes())``.
+        (Sending the parts with separate send calls is avoided because that triggers Nagle's algorithm
+        on some systems (linux), which causes big delays unless TCP_NODELAY is set on the socket.)
+        """
+        stream = getattr(connection, "compressionStream", None)
+        if stream is not None and self.data_size and not self.flags & FLAGS_COMPRESSED and type(self.data) is not util.OutOfBandData:
+            with stream.lock:
+                # compressing and sending must happen in the same order, the other side decompresses in the order of arrival
+                annotations = dict(self.annotations)
+                annotations["CMPR"] = stream.name.encode("ascii")
+                msg = Message(self.type, stream.compress(self.data), self.serializer_id, self.flags | FLAGS_COMPRESSED,
+                              self.seq, annotations=annotations, hmac_key=self.hmac_key)
+                msg.__send(connection)
+        else:
+            self.__send(connection)
+
+    def __send(self, connection):
+        size = _fragment_size()
+        if self.data_size > size and hasattr(connection, "sendLock"):
+            self.__send_fragments(connection, size)
+            return
+        sendv = getattr(connection, "sendv", None)
+        if sendv is not None:
+            sendv(self.to_buffers())
+        else:
+            connection.send(self.to_bytes())
+
+    def __send_fragments(self, connection, size):
+        """
+        Send the fragments of the message one by one, and report the progress to the callback of the connection (if any).
+        The send lock of the connection is held all the while, to keep messages of other threads from getting in between.
+        """
+        progress = getattr(connection, "progress", None)
+        done = 0
+        with connection.sendLock:
+            for data_size, fragment in self.__fragments(size):
+                connection.sendv(fragment)
+                done += data_size
+                if progress:
+                    progress("send", done, self.data_size)
 
     @classmethod
     def from_header(cls, headerData):
         """Parses a message header. Does not yet process the annotations chunks and message data."""
         if not headerData or len(headerData) != cls.header_size:
             raise errors.ProtocolError("header data size mismatch")
-        tag, ver, msg_type, flags, seq, data_size, serializer_id, anns_size, _, checksum = struct.unpack(cls.header_format, headerData)
+        tag, ver, msg_type, flags, seq, data_size, serializer_id, anns_size, _, checksum = cls.header_struct.unpack(headerData)
         if tag != b"PYRO" or ver != constants.PROTOCOL_VERSION:
             raise errors.ProtocolError("invalid data or unsupported protocol version")
         if checksum != (msg_type + ver + data_size + anns_size + flags + serializer_id + seq + cls.checksum_magic) & 0xffff:
@@ -182,19 +313,21 @@ class Message(object):
             raise exc
         if msg.annotations_size:
             # read annotation chunks
-            annotations_data = connection.recv(msg.annotations_size)
-            msg.annotations = {}
-            i = 0
-            while i < msg.annotations_size:
-                anno, length = struct.unpack("!4sH", annotations_data[i:i + 6])
-                if sys.version_info >= (3, 0):
-                    anno = anno.decode("ASCII")
-                msg.annotations[anno] = annotations_data[i + 6:i + 6 + length]
-                if sys.platform == "cli":
-                    msg.annotations[anno] = bytes(msg.annotations[anno])
-                i += 6 + length
+            msg.annotations = cls.parse_annotations(connection.recv(msg.annotations_size))
         # read data
-        msg.data = connection.recv(msg.data_size)
+        if msg.flags & FLAGS_FRAGMENT:
+            msg.__recv_fragments(connection)
+        elif "OOBF" in msg.annotations and hasattr(connection, "recv_into"):
+            # out-of-band pickle buffers: receive the data in a buffer of its own, the unpickled objects will use it directly
+            msg.data = memoryview(bytearray(msg.data_size))
+            connection.recv_into(msg.data)
+        elif msg.data_size >= socketutil.bufferPool.min_size and hasattr(connection, "recv_into"):
+            # large payload: receive it directly into a pooled buffer, the data is a memoryview on that buffer
+            msg.recv_buffer = socketutil.bufferPool.acquire(msg.data_size)
+            msg.data = memoryview(msg.recv_buffer)[:msg.data_size]
+            connection.recv_into(msg.data)
+        else:
+            msg.data = connection.recv(msg.data_size)
         if "HMAC" in msg.annotations and hmac_key:
             if not secure_compare(msg.annotations["HMAC"], msg.hmac()):
                 exc = errors.SecurityError("message hmac mismatch")
@@ -207,31 +340,239 @@ class Message(object):
             exc = errors.SecurityError(err)
             exc.pyroMsg = msg
             raise exc
+        if msg.flags & FLAGS_COMPRESSED and bytes(msg.annotations.get("CMPR", b"")) == b"zstream":
+            msg.decompress_stream(connection)
+        if "OOBF" in msg.annotations:
+            data = memoryview(msg.data)
+            if data.readonly:
+                # received as bytes (the connection has no recv_into, or the data was decompressed):
+                # copy it, because the out-of-band objects must get writable buffers, as they were before pickling
+                data = memoryview(bytearray(data))
+            msg.data = util.OutOfBandData.from_frames(data, bytes(msg.annotations["OOBF"]))
         return msg
 
+    def __recv_fragments(self, connection):
+        """
+        Receive the data of a message that is sent in fragments: the first fragment, and the ones that follow it.
+        The data is received in a buffer of its own, which is a memory mapped temporary file instead of
+        memory when the data is at least ``FRAGMENT_SPOOL_MINSIZE`` bytes.
+        """
+        try:
+            total, = _fragment_struct.unpack(self.annotations.pop("FRAG"))
+        except (KeyError, struct.error):
+            exc = errors.ProtocolError("fragmented message without valid total size")
+            exc.pyroMsg = self
+            raise exc
+        if 0 < config.MAX_MESSAGE_SIZE < (total + self.annotations_size):
+            errorMsg = "max message size exceeded (%d where max=%d)" % (total + self.annotations_size, config.MAX_MESSAGE_SIZE)
+            log.error("connection " + str(connection) + ": " + errorMsg)
+            connection.close()
+            exc = errors.MessageTooLargeError(errorMsg)
+            exc.pyroMsg = self
+            raise exc
+        if 0 < config.FRAGMENT_SPOOL_MINSIZE <= total:
+            data = _spool_buffer(total)
+        else:
+            data = memoryview(bytearray(total))
+        progress = getattr(connection, "progress", None)
+        recv_into = getattr(connection, "recv_into", None)
+        fragment = self
+        received = 0
+        while True:
+            if received + fragment.data_size > total:
+                exc = errors.ProtocolError("message fragments exceed the message size")
+                exc.pyroMsg = self
+                raise exc
+            view = data[received:received + fragment.data_size]
+            if recv_into is not None:
+                recv_into(view)
+            else:
+                view[:] = connection.recv(fragment.data_size)
+            received += fragment.data_size
+            if progress:
+                progress("recv", received, total)
+            if not fragment.flags & FLAGS_FRAGMENT:
+                break
+            fragment = Message.from_header(connection.recv(self.header_size))
+            if fragment.type != self.type or fragment.seq != self.seq or fragment.annotations_size:
+                exc = errors.ProtocolError("invalid message fragment")
+                exc.pyroMsg = self
+                raise exc
+        if received != total:
+            exc = errors.ProtocolError("message fragments are incomplete")
+            exc.pyroMsg = self
+            raise exc
+        self.data = data
+        self.data_size = total
+        self.flags &= ~FLAGS_FRAGMENT
+
+    def decompress_stream(self, connection):
+        """Decompress the message data that is compressed with the connection's compression stream."""
+        stream = getattr(connection, "compressionStream", None)
+        if stream is None:
+            exc = errors.ProtocolError("received stream compressed message but no compression stream was negotiated")
+            exc.pyroMsg = self
+            raise exc
+        data = stream.decompress(self.data)
+        self.release_buffer()
+        self.data = data
+        self.data_size = len(data)
+        self.flags &= ~FLAGS_COMPRESSED
+        del self.annotations["CMPR"]
+
+    @staticmethod
+    def parse_annotations(annotations_data):
+        """Parses the annotation chunks data into a dict of annotation id -> value bytes."""
+        annotations = {}
+        unpack_from = _annotation_struct.unpack_from
+        size = len(annotations_data)
+        i = 0
+        while i < size:
+            anno, length = unpack_from(annotations_data, i)
+            i += _annotation_header_size
+            annotations[_decode_annotation_key(anno)] = annotations_data[i:i + length]
+            i += length
+        if sys.platform == "cli":
+            annotations = {k: bytes(v) for k, v in annotations.items()}
+        return annotations
+
     def hmac(self):
-        """returns the hmac of the data and the annotation chunk values (except HMAC chunk itself)"""
-        mac = hmac.new(self.hmac_key, self.data, digestmod=hashlib.sha1)
+        """
+        returns the hmac of the data and the annotation chunk values (except HMAC chunk itself),
+        computed with the algorithm that is named in the HALG chunk (sha1 if there's none).
+        """
+        start = _timer()
+        mac = _keyed_mac(self.hmac_key, self.annotations.get("HALG", b"sha1"))
+        if type(self.data) is util.OutOfBandData:
+            for frame in self.data.frames():
+                mac.update(frame)
+        else:
+            mac.update(self.data)   # (data that is a memoryview is hashed as-is, without copying it)
         for k, v in sorted(self.annotations.items()):    # note: sorted because we need fixed order to get the same hmac
             if k != "HMAC":
                 mac.update(v)
-        return mac.digest() if sys.platform != "cli" else bytes(mac.digest())
+        digest = mac.digest() if sys.platform != "cli" else bytes(mac.digest())
+        hmacStats.record(self.data_size, _timer() - start)
+        return digest
 
     @staticmethod
     def ping(pyroConnection, hmac_key=None):
         """Convenience method to send a 'ping' message and wait for the 'pong' response"""
         ping = Message(MSG_PING, b"ping", 42, 0, 0, hmac_key=hmac_key)
-        pyroConnection.send(ping.to_bytes())
-        Message.recv(pyroConnection, [MSG_PING])
+        ping.send(pyroConnection)
+        Message.recv(pyroConnection, [MSG_PING], hmac_key=hmac_key)
+
+    def compressor(self):
+        """
+        The compression codec of the message data, None if it isn't compressed.
+        It is named in the 'CMPR' annotation, messages without it are compressed with zlib.
+        """
+        if not self.flags & FLAGS_COMPRESSED:
+            return None
+        if "CMPR" in self.annotations:
+            # the name comes from the other side: only look up a registered codec, don't parse or cache anything for it
+            return util.get_compressor_by_name(bytes(self.annotations["CMPR"]).decode("ascii", "replace"))
+        return util.get_compressor_by_name("zlib")
 
     def decompress_if_needed(self):
         """Decompress the message data if it is compressed."""
         if self.flags & FLAGS_COMPRESSED:
-            self.data = zlib.decompress(self.data)
+            data = self.compressor().decompress(self.data)
+            self.release_buffer()
+            self.data = data
             self.flags &= ~FLAGS_COMPRESSED
             self.data_size = len(self.data)
         return self
 
+    def release_buffer(self):
+        """
+        Give the pooled receive buffer that holds the message data (if any) back to the pool.
+        Call this when the data has been processed (deserialized); the message data is cleared.
+        """
+        if self.recv_buffer is not None:
+            self.data = b""
+            socketutil.bufferPool.release(self.recv_buffer)
+            self.recv_buffer = None
+
+
+def _fragment_size():
+    """the size of the fragments that message data is sent in, when it's larger than that"""
+    size = config.FRAGMENT_SIZE
+    return size if 0 < size < _max_data_size else _max_data_size
+
+
+def _spool_buffer(size):
+    """returns a writable buffer of the given size on a memory mapped temporary file, to keep very large data out of memory"""
+    with tempfile.TemporaryFile() as spoolfile:
+        spoolfile.truncate(size)
+        return memoryview(mmap.mmap(spoolfile.fileno(), size))
+
+
+class HmacStats(object):
+    """
+    Keeps track of the number of message hmacs that have been computed (sending and receiving), their data size and the time it took.
+    The counters are updated without a lock (that would cost more than the hmac of a small message),
+    so with many threads the numbers can be slightly off.
+    """
+    def __init__(self):
+        self.reset()
+
+    def record(self, size, duration):
+        self.count += 1
+        self.size += size
+        self.duration += duration
+
+    def reset(self):
+        self.count = 0
+        self.size = 0
+        self.duration = 0.0
+
+    def stats(self):
+        """returns a dict with the number of hmacs computed, the total message data size (bytes) and the total time (seconds)"""
+        return {"count": self.count, "bytes": self.size, "seconds": self.duration}
+
+
+hmacStats = HmacStats()
+
+_timer = getattr(time, "perf_counter", time.time)
+
+
+def _blake2(constructor, max_key_size):
+    def new(key):
+        if len(key) > max_key_size:
+            key = constructor(key).digest()     # a longer key is hashed first, like hmac does
+        return constructor(key=key)
+    return new
+
+
+"""The hmac algorithms that can be used for the message hmac (config item HMAC_ALGORITHM): name -> keyed mac constructor"""
+hmac_algorithms = {
+    "sha1": lambda key: hmac.new(key, digestmod=hashlib.sha1),
+    "sha256": lambda key: hmac.new(key, digestmod=hashlib.sha256)
+}
+if hasattr(hashlib, "blake2b"):
+    # blake2 has a keyed mode of its own, which is a lot faster than hmac (a single pass over the data)
+    hmac_algorithms["blake2b"] = _blake2(hashlib.blake2b, 64)
+    hmac_algorithms["blake2s"] = _blake2(hashlib.blake2s, 32)
+
+_keyed_macs = {}    # (key, algorithm name bytes) -> keyed mac object that is copied for every message
+
+
+def _keyed_mac(key, algorithm):
+    # Keying a mac costs about as much as hashing a small message, so it's only done once per key.
+    try:
+        return _keyed_macs[key, algorithm].copy()
+    except KeyError:
+        name = bytes(algorithm).decode("ascii", "replace")
+        try:
+            new = hmac_algorithms[name]
+        except KeyError:
+            raise errors.SecurityError("unsupported hmac algorithm: " + name)
+        if len(_keyed_macs) >= 64:
+            _keyed_macs.clear()
+        mac = _keyed_macs[key, bytes(algorithm)] = new(key)
+        return mac.copy()
+
 
 try:
     from hmac import compare_digest as secure_compare
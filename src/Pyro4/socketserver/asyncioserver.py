@@ -0,0 +1,413 @@
+"""
+Socket server based on an asyncio event loop. Coroutine methods (async def) of Pyro objects run on the loop itself,
+other methods run in a thread pool. Requires Python 3.5 or newer.
+
+Pyro - Python Remote Objects.  Copyright by Irmen de Jong (irmen@razorvine.net).
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import inspect
+import logging
+import os
+import socket
+import sys
+import threading
+import weakref
+from Pyro4 import socketutil, errors, util, message, aio
+from Pyro4.core import current_context
+from Pyro4.configuration import config
+
+log = logging.getLogger("Pyro4.asyncioserver")
+
+
+class StreamConnection(object):
+    """
+    A client connection on an asyncio stream, that looks like a :class:`Pyro4.socketutil.SocketConnection` to the daemon.
+    Messages are read by the server before they're given to the daemon; sending can be done from any thread.
+    """
+    def __init__(self, server, reader, writer):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.sock = writer.get_extra_info("socket")
+        self.received = collections.deque()    # parts of a message that has already been read from the stream
+        self.objectId = None
+        self.pyroInstances = {}    # pyro objects for instance_mode=session
+        self.tracked_resources = weakref.WeakSet()      # weakrefs to resources for this connection
+        self.keep_open = False
+        self.compressionCodecs = None   # names of the codecs the client can decompress, from the handshake
+
+    def __str__(self):
+        return "<StreamConnection %s>" % (self.peername,)
+
+    @property
+    def peername(self):
+        return self.writer.get_extra_info("peername")
+
+    @property
+    def local(self):
+        return socketutil.isLocalConnection(self.sock, self.peername)
+
+    def recv(self, size):
+        if not self.received:
+            raise errors.ConnectionClosedError("receiving: not enough data")
+        return self.received.popleft()
+
+    def send(self, data):
+        self.sendv([data])
+
+    def sendv(self, buffers):
+        if self.writer.transport.is_closing():
+            raise errors.ConnectionClosedError("sending: connection closed")
+        if threading.get_ident() == self.server.loop_thread:
+            self.writer.writelines(buffers)
+        else:
+            try:
+                self.server.eventloop.call_soon_threadsafe(self.writer.writelines, list(buffers))
+            except RuntimeError:
+                raise errors.ConnectionClosedError("sending: event loop closed")
+
+    def close(self):
+        if threading.get_ident() == self.server.loop_thread:
+            self.writer.close()
+        else:
+            try:
+                self.server.eventloop.call_soon_threadsafe(self.writer.close)
+            except RuntimeError:
+                pass    # event loop closed, the transport is gone already
+
+    def fileno(self):
+        return self.sock.fileno()
+
+
+class SocketServer_Asyncio(object):
+    """transport server for socket connections, that runs on an asyncio event loop"""
+    def __init__(self):
+        self.sock = self.daemon = self.locationStr = None
+        self.sslContext = None
+        self.eventloop = self.loop_thread = None
+        self.server = None
+        self.executor = None
+        self.connections = set()
+        self.tasks = set()
+        self.combined = []
+        self.stopped = None
+        self.shutting_down = False
+
+    def init(self, daemon, host, port, unixsocket=None):
+        log.info("starting asyncio socketserver")
+        self.daemon = daemon
+        self.sock = None
+        bind_location = unixsocket if unixsocket else (host, port)
+        if config.SSL:
+            self.sslContext = socketutil.getSSLcontext(servercert=config.SSL_SERVERCERT,
+                                                       serverkey=config.SSL_SERVERKEY,
+                                                       keypassword=config.SSL_SERVERKEYPASSWD,
+                                                       cacerts=config.SSL_CACERTS)
+            log.info("using SSL,  cert=%s  key=%s  cacerts=%s", config.SSL_SERVERCERT, config.SSL_SERVERKEY, config.SSL_CACERTS)
+        else:
+            self.sslContext = None
+            log.info("not using SSL")
+        # the ssl context is not given to the socket itself, asyncio takes care of wrapping the connections
+        self.sock = socketutil.createSocket(bind=bind_location,
+                                            reuseaddr=config.SOCK_REUSE,
+                                            reuseport=config.SOCK_REUSEPORT,
+                                            timeout=None,
+                                            noinherit=True,
+                                            nodelay=config.SOCK_NODELAY)
+        try:
+            self.sock.listen(socket.SOMAXCONN)    # the event loop can deal with a lot more pending connections
+        except (OSError, IOError):
+            pass
+        self._socketaddr = sockaddr = self.sock.getsockname()
+        if not unixsocket and sockaddr[0].startswith("127."):
+            if host is None or host.lower() != "localhost" and not host.startswith("127."):
+                log.warning("weird DNS setup: %s resolves to localhost (127.x.x.x)", host)
+        if unixsocket:
+            self.locationStr = "./u:" + unixsocket
+        else:
+            host = host or sockaddr[0]
+            port = port or sockaddr[1]
+            if ":" in host:  # ipv6
+                self.locationStr = "[%s]:%d" % (host, port)
+            else:
+                self.locationStr = "%s:%d" % (host, port)
+
+    def __repr__(self):
+        return "<%s on %s; %d connections>" % (self.__class__.__name__, self.locationStr, len(self.connections))
+
+    def __del__(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def loop(self, loopCondition=lambda: True):
+        log.debug("entering asyncio requestloop")
+        loop = asyncio.new_event_loop()
+        try:
+            self.attach_loop(loop)
+            loop.run_until_complete(self._serve(loopCondition))
+        except KeyboardInterrupt:
+            log.debug("stopping on break signal")
+        finally:
+            loop.run_until_complete(self._stop())
+            loop.close()
+
+    def attach_loop(self, loop):
+        """start serving on the given event loop, the server will run once the loop runs"""
+        if self.eventloop is not None:
+            raise errors.PyroError("server is already running on an event loop")
+        self.eventloop = loop
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=config.THREADPOOL_SIZE)
+        loop.call_soon_threadsafe(self._startTask)
+        for server in self.combined:
+            server.attach_loop(loop)
+
+    def _startTask(self):
+        self.loop_thread = threading.get_ident()
+        self.stopped = self.eventloop.create_future()
+        self._spawn(self._start())
+        self._spawn(self._housekeeping())
+
+    async def _start(self):
+        if self.sock.family == getattr(socket, "AF_UNIX", None):
+            self.server = await asyncio.start_unix_server(self._handleConnection, sock=self.sock, ssl=self.sslContext)
+        else:
+            self.server = await asyncio.start_server(self._handleConnection, sock=self.sock, ssl=self.sslContext)
+
+    async def _serve(self, loopCondition):
+        while loopCondition() and not self.stopped.done():
+            await asyncio.wait([self.stopped], timeout=config.POLLTIMEOUT)
+
+    async def _housekeeping(self):
+        while not self.stopped.done():
+            await asyncio.wait([self.stopped], timeout=config.POLLTIMEOUT)
+            self.daemon._housekeeping()
+
+    def _spawn(self, coro):
+        task = self.eventloop.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def _handleConnection(self, reader, writer):
+        if self.shutting_down:
+            writer.close()
+            return
+        conn = StreamConnection(self, reader, writer)
+        log.debug("connected %s - %s", writer.get_extra_info("peername"), "SSL" if self.sslContext else "unencrypted")
+        task = asyncio.Task.current_task() if sys.version_info < (3, 7) else asyncio.current_task()
+        self.tasks.add(task)
+        self.connections.add(conn)
+        try:
+            if await self._handshake(conn):
+                await self._handleRequests(conn)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.connections.discard(conn)
+            self.tasks.discard(task)
+            writer.close()
+
+    async def _handshake(self, conn):
+        try:
+            conn.received.extend(await asyncio.wait_for(aio._read_message_parts(conn.reader), config.COMMTIMEOUT or None))
+            return self.daemon._handshake(conn)
+        except (errors.ConnectionClosedError, asyncio.TimeoutError):
+            log.debug("handshake failed, connection closed early")
+        except Exception:
+            ex_t, ex_v, ex_tb = sys.exc_info()
+            tb = util.formatTraceback(ex_t, ex_v, ex_tb)
+            log.warning("error during connect/handshake: %s; %s", ex_v, "\n".join(tb))
+        return False
+
+    async def _handleRequests(self, conn):
+        """read and process the requests of a client until it disconnects"""
+        try:
+            while not self.shutting_down:
+                msg = await aio.read_message(conn.reader, conn.writer, [message.MSG_INVOKE, message.MSG_PING],
+                                             hmac_key=self.daemon._pyroHmacKey)
+                if msg.flags & message.FLAGS_PIPELINED and msg.type == message.MSG_INVOKE and not msg.flags & message.FLAGS_ONEWAY:
+                    # the client accepts responses out of order, so process the next request right away
+                    self._spawn(self._handlePipelinedRequest(conn, msg))
+                else:
+                    await self._handleRequest(conn, msg)
+                await conn.writer.drain()
+        except (socket.error, errors.ConnectionClosedError, errors.SecurityError):
+            # client went away or caused a security error.
+            # close the connection silently.
+            log.debug("disconnected %s", conn.writer.get_extra_info("peername"))
+        except errors.TimeoutError as x:
+            # for timeout errors we're not really interested in detailed traceback info
+            log.warning("error during handleRequest: %s" % x)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # other error occurred, close the connection, but also log a warning
+            ex_t, ex_v, ex_tb = sys.exc_info()
+            tb = util.formatTraceback(ex_t, ex_v, ex_tb)
+            log.warning("error during handleRequest: %s; %s", ex_v, "".join(tb))
+        finally:
+            try:
+                self.daemon._clientDisconnect(conn)
+            except Exception as x:
+                log.warning("Error in clientDisconnect: " + str(x))
+
+    async def _handlePipelinedRequest(self, conn, msg):
+        try:
+            await self._handleRequest(conn, msg)
+        except Exception as x:
+            # the client is gone or it misbehaved; its connection is dealt with by the task that reads its requests
+            log.debug("error during pipelined call: %r", x)
+
+    async def _handleRequest(self, conn, msg):
+        """
+        Process a request message. Coroutine methods are awaited on the event loop,
+        everything else is handed to the daemon in a worker thread.
+        """
+        request = method = None
+        if msg.type == message.MSG_INVOKE and not msg.flags & message.FLAGS_BATCH:
+            try:
+                request = self.daemon._deserializeRequest(msg)
+                method = self._lookupCoroutineMethod(request[1], request[2])
+            except Exception:
+                pass    # the daemon will report the problem when it processes the request
+        if method is not None:
+            if msg.flags & message.FLAGS_ONEWAY and config.ONEWAY_THREADED:
+                self._spawn(self._invokeCoroutine(conn, msg, request))
+            else:
+                await self._invokeCoroutine(conn, msg, request)
+        else:
+            await self.eventloop.run_in_executor(self.executor, self.daemon._handleRequestMessage, conn, msg, request)
+
+    def _lookupCoroutineMethod(self, objId, methodname):
+        """returns the method if it is a coroutine function, otherwise None"""
+        if methodname in ("__getattr__", "__setattr__"):
+            return None
+        obj = self.daemon.objectsById.get(objId)
+        if obj is None:
+            return None
+        method = util.getAttribute(obj, methodname)    # (on a class, this doesn't create an instance)
+        return method if inspect.iscoroutinefunction(method) else None
+
+    async def _invokeCoroutine(self, conn, msg, request):
+        """call a coroutine method of a Pyro object, and send the response (if any) back to the client"""
+        serializer, objId, methodname, vargs, kwargs = request
+        context = self._setCallContext(conn, msg)
+        isCallback = False
+        try:
+            obj = self.daemon.objectsById.get(objId)
+            if obj is None:
+                raise errors.DaemonError("unknown object")
+            if inspect.isclass(obj):
+                obj = self.daemon._getInstance(obj, conn)
+            method, isCallback = self.daemon._resolveMethod(obj, methodname)
+            data = await method(*vargs, **kwargs)
+            # other calls have been running on the loop in the meantime, restore the call context
+            current_context.from_global(context)
+            if msg.flags & message.FLAGS_ONEWAY:
+                return
+            isStream, data = self.daemon._streamResponse(data, conn)
+            if isStream:
+                self.daemon._sendStreamResponse(conn, msg.seq, serializer, data)
+            else:
+                self.daemon._sendResponse(conn, msg.seq, serializer, data, compressor=msg.compressor(), method=methodname)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            xt, xv = sys.exc_info()[0:2]
+            current_context.from_global(context)
+            if xt is not errors.ConnectionClosedError:
+                log.debug("Exception occurred while handling request: %r", xv)
+                if not msg.flags & message.FLAGS_ONEWAY:
+                    if isinstance(xv, errors.SerializeError) or not isinstance(xv, errors.CommunicationError):
+                        tblines = util.formatTraceback(detailed=config.DETAILED_TRACEBACK)
+                        self.daemon._sendExceptionResponse(conn, msg.seq, serializer.serializer_id, xv, tblines)
+            if isCallback or isinstance(xv, (errors.CommunicationError, errors.SecurityError)):
+                raise
+
+    def _setCallContext(self, conn, msg):
+        """set up the call context for a coroutine call, returns it so it can be restored after an await"""
+        current_context._received(msg.annotations)
+        self.daemon._startResponseAnnotations(conn, msg)
+        current_context.client = conn
+        current_context.client_sock_addr = conn.peername
+        current_context.seq = msg.seq
+        current_context.annotations = msg.annotations
+        current_context.msg_flags = msg.flags
+        current_context.serializer_id = msg.serializer_id
+        return current_context.to_global()
+
+    def combine_loop(self, server):
+        if not isinstance(server, SocketServer_Asyncio):
+            raise TypeError("can only combine the asyncio server with another asyncio server")
+        if self.eventloop is not None:
+            server.attach_loop(self.eventloop)
+        else:
+            self.combined.append(server)
+
+    def events(self, eventsockets):
+        raise TypeError("asyncio server doesn't support external event loops, use attachLoop instead")
+
+    def shutdown(self):
+        self.shutting_down = True
+        if self.eventloop is None or self.eventloop.is_closed():
+            return
+        if threading.get_ident() == self.loop_thread:
+            self._spawn(self._stop())
+        else:
+            try:
+                asyncio.run_coroutine_threadsafe(self._stop(), self.eventloop).result(timeout=5)
+            except Exception:
+                pass    # loop stopped or closed in the meantime
+
+    async def _stop(self):
+        """stop accepting connections, and close all client connections"""
+        self.shutting_down = True
+        if self.stopped and not self.stopped.done():
+            self.stopped.set_result(None)
+        if self.server:
+            self.server.close()
+            self.server = None
+        for conn in list(self.connections):
+            conn.writer.close()
+        current = asyncio.Task.current_task() if sys.version_info < (3, 7) else asyncio.current_task()
+        tasks = [task for task in self.tasks if task is not current]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+        if self.executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def close(self):
+        if self.server is not None and threading.get_ident() == self.loop_thread:
+            # stop listening before the socket is closed, the connections are closed by the stop task
+            self.server.close()
+            self.server = None
+        if self.sock:
+            sockname = None
+            try:
+                sockname = self.sock.getsockname()
+            except (socket.error, OSError):
+                pass
+            self.sock.close()
+            if type(sockname) is str:
+                # it was a Unix domain socket, remove it from the filesystem
+                if os.path.exists(sockname):
+                    os.remove(sockname)
+        self.sock = None
+
+    @property
+    def sockets(self):
+        return [self.sock] + [conn.sock for conn in self.connections]
+
+    @property
+    def selector(self):
+        raise TypeError("asyncio server doesn't have multiplexing selector")
+
+    def wakeup(self):
+        pass
@@ -58,6 +58,7 @@ class SocketServer_Multiplex(object):
             log.info("not using SSL")
         self.sock = socketutil.createSocket(bind=bind_location,
                                             reuseaddr=config.SOCK_REUSE,
+                                            reuseport=config.SOCK_REUSEPORT,
                                             timeout=config.COMMTIMEOUT,
                                             noinherit=True,
                                             nodelay=config.SOCK_NODELAY,
@@ -183,6 +184,10 @@ class SocketServer_Multiplex(object):
         """Handles a single connection request event and returns if the connection is still active"""
         try:
             self.daemon.handleRequest(conn)
+            while conn.pending():
+                # more requests were already received into the connection's read buffer,
+                # the selector won't signal those so process them now.
+                self.daemon.handleRequest(conn)
             return True
         except (socket.error, errors.ConnectionClosedError, errors.SecurityError):
             # client went away or caused a security error.
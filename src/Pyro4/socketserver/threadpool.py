@@ -1,5 +1,6 @@
 """
 Thread pool job processor with variable number of worker threads (between max/min amount).
+Jobs can wait in a bounded queue when all workers are busy.
 
 Pyro - Python Remote Objects.  Copyright by Irmen de Jong (irmen@razorvine.net).
 """
@@ -8,6 +9,7 @@ from __future__ import with_statement
 import time
 import logging
 import threading
+import collections
 from Pyro4.configuration import config
 
 log = logging.getLogger("Pyro4.threadpool")
@@ -29,6 +31,7 @@ class Worker(threading.Thread):
         self.job_available = threading.Event()
         self.job = None
         self.pool = pool
+        self.idle_since = 0.0
 
     def process(self, job):
         self.job = job
@@ -36,7 +39,10 @@ class Worker(threading.Thread):
 
     def run(self):
         while True:
-            self.job_available.wait()
+            if not self.job_available.wait(config.THREADPOOL_IDLE_TIMEOUT or None):
+                if self.pool.retire(self):
+                    break
+                continue
             self.job_available.clear()
             if self.job is None:
                 break
@@ -53,6 +59,10 @@ class Pool(object):
     """
     A job processing pool that is using a pool of worker threads.
     The amount of worker threads in the pool is configurable and scales between min/max size.
+    When all workers are busy, jobs wait in a queue of at most ``THREADPOOL_QUEUE_SIZE`` jobs.
+    When that is full as well, :meth:`process` waits at most ``THREADPOOL_QUEUE_TIMEOUT`` seconds
+    for room before it gives up. Workers above the minimum amount retire after being idle
+    for ``THREADPOOL_IDLE_TIMEOUT`` seconds.
     """
     def __init__(self):
         if config.THREADPOOL_SIZE < 1 or config.THREADPOOL_SIZE_MIN < 1:
@@ -61,13 +71,16 @@ class Pool(object):
             raise ValueError("minimum threadpool size must be less than or equal to max size")
         self.idle = set()
         self.busy = set()
+        self.queue = collections.deque()    # (job, time queued)
         self.closed = False
+        self.count_lock = threading.Condition()
+        self.processed = self.rejected = self.queued = 0
+        self.wait_time_total = self.wait_time_max = 0.0
         for _ in range(config.THREADPOOL_SIZE_MIN):
             worker = Worker(self)
             self.idle.add(worker)
             worker.start()
         log.debug("worker pool created with initial size %d", self.num_workers())
-        self.count_lock = threading.Lock()
 
     def __enter__(self):
         return self
@@ -78,11 +91,14 @@ class Pool(object):
     def close(self):
         if not self.closed:
             log.debug("closing down")
+            with self.count_lock:
+                self.closed = True
+                self.queue.clear()
+                self.count_lock.notify_all()
             for w in list(self.busy):
                 w.process(None)
             for w in list(self.idle):
                 w.process(None)
-            self.closed = True
             time.sleep(0.1)
             idle, self.idle = self.idle, set()
             busy, self.busy = self.busy, set()
@@ -99,34 +115,86 @@ class Pool(object):
                     p.join(timeout=0.1)
 
     def __repr__(self):
-        return "<%s.%s at 0x%x; %d busy workers; %d idle workers>" % \
-               (self.__class__.__module__, self.__class__.__name__, id(self), len(self.busy), len(self.idle))
+        return "<%s.%s at 0x%x; %d busy workers; %d idle workers; %d queued jobs>" % \
+               (self.__class__.__module__, self.__class__.__name__, id(self), len(self.busy), len(self.idle), len(self.queue))
 
     def num_workers(self):
         return len(self.busy) + len(self.idle)
 
+    def stats(self):
+        """returns a dict with the current worker counts and queue depth, and statistics about the processed jobs"""
+        with self.count_lock:
+            return {
+                "busy": len(self.busy),
+                "idle": len(self.idle),
+                "queue_depth": len(self.queue),
+                "processed": self.processed,
+                "queued": self.queued,
+                "rejected": self.rejected,
+                "wait_time_avg": self.wait_time_total / self.queued if self.queued else 0.0,
+                "wait_time_max": self.wait_time_max
+            }
+
     def process(self, job):
-        if self.closed:
-            raise PoolError("job queue is closed")
-        if self.idle:
-            worker = self.idle.pop()
-        elif self.num_workers() < config.THREADPOOL_SIZE:
-            worker = Worker(self)
-            worker.start()
-        else:
-            raise NoFreeWorkersError("no free workers available, increase thread pool size")
-        self.busy.add(worker)
+        deadline = None
+        with self.count_lock:
+            while True:
+                if self.closed:
+                    raise PoolError("job queue is closed")
+                if self.idle:
+                    worker = self.idle.pop()
+                    break
+                if self.num_workers() < config.THREADPOOL_SIZE:
+                    worker = Worker(self)
+                    worker.start()
+                    break
+                if len(self.queue) < config.THREADPOOL_QUEUE_SIZE:
+                    self.queue.append((job, time.time()))
+                    self.queued += 1
+                    log.debug("all workers busy, job queued (queue depth %d)", len(self.queue))
+                    return
+                if deadline is None:
+                    deadline = time.time() + config.THREADPOOL_QUEUE_TIMEOUT
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.rejected += 1
+                    raise NoFreeWorkersError("no free workers available, increase thread pool size")
+                self.count_lock.wait(remaining)
+            self.busy.add(worker)
+            self.processed += 1
         worker.process(job)
         log.debug("worker counts: %d busy, %d idle", len(self.busy), len(self.idle))
 
     def notify_done(self, worker):
-        if worker in self.busy:
-            self.busy.remove(worker)
-        if self.closed:
-            worker.process(None)
-            return
-        if len(self.idle) >= config.THREADPOOL_SIZE_MIN:
-            worker.process(None)
-        else:
-            self.idle.add(worker)
+        with self.count_lock:
+            if self.queue and not self.closed:
+                # keep the worker busy with the next job that is waiting
+                job, queued = self.queue.popleft()
+                wait_time = time.time() - queued
+                self.wait_time_total += wait_time
+                self.wait_time_max = max(self.wait_time_max, wait_time)
+                self.processed += 1
+                self.count_lock.notify()
+                worker.process(job)
+                return
+            self.busy.discard(worker)
+            if self.closed:
+                worker.process(None)
+                return
+            if len(self.idle) >= config.THREADPOOL_SIZE_MIN and not config.THREADPOOL_IDLE_TIMEOUT:
+                worker.process(None)
+            else:
+                worker.idle_since = time.time()
+                self.idle.add(worker)
+            self.count_lock.notify()
         log.debug("worker counts: %d busy, %d idle", len(self.busy), len(self.idle))
+
+    def retire(self, worker):
+        """called by an idle worker when it has waited for a job for the idle timeout, returns True if it must stop"""
+        with self.count_lock:
+            if worker in self.idle and self.num_workers() > config.THREADPOOL_SIZE_MIN:
+                if time.time() - worker.idle_since >= config.THREADPOOL_IDLE_TIMEOUT:
+                    self.idle.remove(worker)
+                    log.debug("idle worker retired, worker counts: %d busy, %d idle", len(self.busy), len(self.idle))
+                    return True
+            return False
@@ -1,7 +1,8 @@
 """
-Socket server based on a worker thread pool. Doesn't use select.
+Socket server based on a worker thread pool.
 
-Uses a single worker thread per client connection.
+Uses a single worker thread per client connection, or (with THREADPOOL_DISPATCH="request")
+only hands a connection to a worker thread when a request has arrived on it.
 
 Pyro - Python Remote Objects.  Copyright by Irmen de Jong (irmen@razorvine.net).
 """
@@ -13,9 +14,24 @@ import sys
 import time
 import threading
 import os
+import collections
 from Pyro4 import socketutil, errors, util
 from Pyro4.configuration import config
 from .threadpool import Pool, NoFreeWorkersError
+if sys.version_info >= (3, 5):
+    import selectors
+else:
+    try:
+        # first try selectors2 as it has better semantics when dealing with interrupted system calls
+        import selectors2 as selectors
+    except ImportError:
+        if sys.version_info >= (3, 4):
+            import selectors
+        else:
+            try:
+                import selectors34 as selectors
+            except ImportError:
+                selectors = None
 
 log = logging.getLogger("Pyro4.threadpoolserver")
 _client_disconnect_lock = threading.Lock()
@@ -35,34 +51,39 @@ class ClientConnectionJob(object):
     def __call__(self):
         if self.handleConnection():
             try:
-                while True:
-                    try:
-                        self.daemon.handleRequest(self.csock)
-                    except (socket.error, errors.ConnectionClosedError):
-                        # client went away.
-                        log.debug("disconnected %s", self.caddr)
-                        break
-                    except errors.SecurityError:
-                        log.debug("security error on client %s", self.caddr)
-                        break
-                    except errors.TimeoutError as x:
-                        # for timeout errors we're not really interested in detailed traceback info
-                        log.warning("error during handleRequest: %s" % x)
-                        break
-                    except:
-                        # other errors log a warning, break this loop and close the client connection
-                        ex_t, ex_v, ex_tb = sys.exc_info()
-                        tb = util.formatTraceback(ex_t, ex_v, ex_tb)
-                        msg = "error during handleRequest: %s; %s" % (ex_v, "".join(tb))
-                        log.warning(msg)
-                        break
+                while self.handleRequest():
+                    pass
             finally:
-                with _client_disconnect_lock:
-                    try:
-                        self.daemon._clientDisconnect(self.csock)
-                    except Exception as x:
-                        log.warning("Error in clientDisconnect: " + str(x))
-                self.csock.close()
+                self.disconnect()
+
+    def handleRequest(self):
+        """process a single request, returns False if the connection must be closed"""
+        try:
+            self.daemon.handleRequest(self.csock)
+            return True
+        except (socket.error, errors.ConnectionClosedError):
+            # client went away.
+            log.debug("disconnected %s", self.caddr)
+        except errors.SecurityError:
+            log.debug("security error on client %s", self.caddr)
+        except errors.TimeoutError as x:
+            # for timeout errors we're not really interested in detailed traceback info
+            log.warning("error during handleRequest: %s" % x)
+        except:
+            # other errors log a warning, and close the client connection
+            ex_t, ex_v, ex_tb = sys.exc_info()
+            tb = util.formatTraceback(ex_t, ex_v, ex_tb)
+            msg = "error during handleRequest: %s; %s" % (ex_v, "".join(tb))
+            log.warning(msg)
+        return False
+
+    def disconnect(self):
+        with _client_disconnect_lock:
+            try:
+                self.daemon._clientDisconnect(self.csock)
+            except Exception as x:
+                log.warning("Error in clientDisconnect: " + str(x))
+        self.csock.close()
 
     def handleConnection(self):
         # connection handshake
@@ -84,6 +105,35 @@ class ClientConnectionJob(object):
         self.csock.close()
 
 
+class ClientRequestJob(ClientConnectionJob):
+    """
+    Takes care of a single client connection, but only occupies a worker thread
+    for the connection handshake or for a request that has arrived.
+    In between, the connection waits in the server's selector.
+    """
+
+    def __init__(self, clientSocket, clientAddr, daemon, server):
+        super(ClientRequestJob, self).__init__(clientSocket, clientAddr, daemon)
+        self.server = server
+        self.connected = False
+
+    def __call__(self):
+        if not self.connected:
+            if not self.handleConnection():
+                return
+            self.connected = True
+        elif not self.handleRequest():
+            self.disconnect()
+            return
+        while self.csock.pending():
+            # more requests were already received into the connection's read buffer,
+            # the selector won't signal those so process them now.
+            if not self.handleRequest():
+                self.disconnect()
+                return
+        self.server.rearm(self)
+
+
 class Housekeeper(threading.Thread):
     def __init__(self, daemon):
         super(Housekeeper, self).__init__(name="housekeeper")
@@ -106,9 +156,12 @@ class SocketServer_Threadpool(object):
         self.daemon = self.sock = self._socketaddr = self.locationStr = self.pool = None
         self.shutting_down = False
         self.housekeeper = None
+        self._selector = None   # only used when dispatching requests instead of connections
 
     def init(self, daemon, host, port, unixsocket=None):
         log.info("starting thread pool socketserver")
+        if config.THREADPOOL_DISPATCH not in ("connection", "request"):
+            raise ValueError("invalid threadpool dispatch mode: " + config.THREADPOOL_DISPATCH)
         self.daemon = daemon
         self.sock = None
         bind_location = unixsocket if unixsocket else (host, port)
@@ -123,6 +176,7 @@ class SocketServer_Threadpool(object):
             log.info("not using SSL")
         self.sock = socketutil.createSocket(bind=bind_location,
                                             reuseaddr=config.SOCK_REUSE,
+                                            reuseport=config.SOCK_REUSEPORT,
                                             timeout=config.COMMTIMEOUT,
                                             noinherit=True,
                                             nodelay=config.SOCK_NODELAY,
@@ -141,6 +195,19 @@ class SocketServer_Threadpool(object):
             else:
                 self.locationStr = "%s:%d" % (host, port)
         self.pool = Pool()
+        if config.THREADPOOL_DISPATCH == "request":
+            if selectors is None:
+                raise RuntimeError("This Python installation doesn't have the 'selectors2' or 'selectors34' module installed, " +
+                                   "which is required to dispatch requests instead of connections to the worker threads.")
+            log.debug("dispatching requests to the worker threads")
+            self._selector = selectors.DefaultSelector()
+            self._rearmed = collections.deque()     # connections that are done with a request, to be watched again
+            self._waiting = collections.deque()     # jobs for which no worker was available yet
+            self._wakeupReceiver, self._wakeupSender = _socketPair()
+            self._wakeupReceiver.setblocking(False)
+            self._wakeupSender.setblocking(False)
+            self._selector.register(self.sock, selectors.EVENT_READ)
+            self._selector.register(self._wakeupReceiver, selectors.EVENT_READ)
         self.housekeeper = Housekeeper(daemon)
         self.housekeeper.start()
 
@@ -163,7 +230,12 @@ class SocketServer_Threadpool(object):
         log.debug("threadpool server requestloop")
         while (self.sock is not None) and not self.shutting_down and loopCondition():
             try:
-                self.events([self.sock])
+                if self._selector:
+                    # wait briefly when there are jobs waiting for a worker, the pool doesn't signal free workers
+                    events = self._selector.select(0.01 if self._waiting else config.POLLTIMEOUT)
+                    self.events([key.fileobj for key, mask in events])
+                else:
+                    self.events([self.sock])
             except (socket.error, OSError) as x:
                 if not loopCondition():
                     # swallow the socket error if loop terminates anyway
@@ -182,9 +254,15 @@ class SocketServer_Threadpool(object):
 
     def events(self, eventsockets):
         """used for external event loops: handle events that occur on one of the sockets of this server"""
+        if self._selector:
+            self._requestEvents(eventsockets)
+            return
         # we only react on events on our own server socket.
         # all other (client) sockets are owned by their individual threads.
         assert self.sock in eventsockets
+        self._accept()
+
+    def _accept(self):
         try:
             csock, caddr = self.sock.accept()
             if self.shutting_down:
@@ -196,6 +274,9 @@ class SocketServer_Threadpool(object):
                 log.debug("connected %s - unencrypted", caddr)
             if config.COMMTIMEOUT:
                 csock.settimeout(config.COMMTIMEOUT)
+            if self._selector:
+                self._dispatch(ClientRequestJob(csock, caddr, self.daemon, self))
+                return
             job = ClientConnectionJob(csock, caddr, self.daemon)
             try:
                 self.pool.process(job)
@@ -204,6 +285,53 @@ class SocketServer_Threadpool(object):
         except socket.timeout:
             pass  # just continue the loop on a timeout on accept
 
+    def _requestEvents(self, eventsockets):
+        for s in eventsockets:
+            if self.shutting_down:
+                return
+            if s is self.sock:
+                self._accept()
+            elif s is self._wakeupReceiver:
+                try:
+                    while self._wakeupReceiver.recv(1024):
+                        pass
+                except (socket.error, OSError):
+                    pass    # nothing more to read
+                while self._rearmed:
+                    job = self._rearmed.popleft()
+                    try:
+                        self._selector.register(job.csock, selectors.EVENT_READ, job)
+                    except (ValueError, KeyError, OSError):
+                        job.disconnect()    # the connection got closed in the meantime
+            else:
+                # a request has arrived on a client connection
+                job = self._selector.get_key(s).data
+                self._selector.unregister(s)
+                self._dispatch(job)
+        while self._waiting:
+            try:
+                self.pool.process(self._waiting[0])
+            except NoFreeWorkersError:
+                break
+            self._waiting.popleft()
+
+    def _dispatch(self, job):
+        if self._waiting:
+            self._waiting.append(job)   # keep the order in which the jobs arrived
+            return
+        try:
+            self.pool.process(job)
+        except NoFreeWorkersError:
+            self._waiting.append(job)
+
+    def rearm(self, job):
+        """called from a worker thread when it is done with the connection, so that it can be watched for requests again"""
+        self._rearmed.append(job)
+        try:
+            self._wakeupSender.send(b"!")
+        except (socket.error, OSError):
+            pass    # the server is closing down
+
     def shutdown(self):
         self.shutting_down = True
         self.wakeup()
@@ -231,10 +359,25 @@ class SocketServer_Threadpool(object):
             except Exception:
                 pass
             self.sock = None
+        if self._selector:
+            for key in list(self._selector.get_map().values()):
+                if key.data:
+                    key.data.csock.close()
+            for job in list(self._rearmed) + list(self._waiting):
+                job.csock.close()
+            self._rearmed.clear()
+            self._waiting.clear()
+            self._selector.close()
+            self._wakeupReceiver.close()
+            self._wakeupSender.close()
+            self._selector = None
         self.pool.close()
 
     @property
     def sockets(self):
+        if self._selector:
+            # the server socket, the idle client connections, and the socket that signals returned connections
+            return [key.fileobj for key in self._selector.get_map().values()]
         # the server socket is all we care about, all client sockets are running in their own threads
         return [self.sock]
 
@@ -244,3 +387,16 @@ class SocketServer_Threadpool(object):
 
     def wakeup(self):
         socketutil.interruptSocket(self._socketaddr)
+
+
+def _socketPair():
+    """a pair of connected sockets, used to wake up the thread that waits in the selector"""
+    if hasattr(socket, "socketpair"):
+        return socket.socketpair()
+    listener = socketutil.createSocket(bind=("127.0.0.1", 0))
+    try:
+        sender = socketutil.createSocket(connect=listener.getsockname())
+        receiver, _ = listener.accept()
+        return receiver, sender
+    finally:
+        listener.close()
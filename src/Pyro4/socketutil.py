@@ -11,6 +11,8 @@ import time
 import sys
 import select
 import weakref
+import threading
+from collections import defaultdict
 try:
     import ssl
 except ImportError:
@@ -193,6 +195,113 @@ def receiveData(sock, size):
         raise TimeoutError("receiving: timeout")
 
 
+def receiveDataInto(sock, buffer, size=None):
+    """Receive a given number of bytes (default: the length of the buffer) from a socket,
+    directly into the given writable buffer (such as a bytearray or a memoryview on it).
+    Unlike receiveData, this doesn't gather the data in separate chunks that have to be joined afterwards.
+    It is expected the socket is able to supply that number of bytes, otherwise an exception is raised.
+    The partial data that has been received is stored in the 'partialData' attribute of the exception object."""
+    view = memoryview(buffer)
+    if size is None:
+        size = len(view)
+    # Note that on SSL sockets, you cannot use MSG_WAITALL (or any other flag)
+    use_waitall = config.USE_MSG_WAITALL and not hasattr(sock, "getpeercert")
+    retrydelay = 0.0
+    received = 0
+    while received < size:
+        try:
+            if use_waitall:
+                count = sock.recv_into(view[received:], size - received, socket.MSG_WAITALL)
+            else:
+                # 60k buffer limit avoids problems on certain OSes like VMS, Windows
+                count = sock.recv_into(view[received:], min(60000, size - received))
+        except socket.timeout:
+            raise TimeoutError("receiving: timeout")
+        except socket.error as x:
+            err = getattr(x, "errno", x.args[0])
+            if err not in ERRNO_RETRIES:
+                raise ConnectionClosedError("receiving: connection lost: " + str(x))
+            time.sleep(0.00001 + retrydelay)  # a slight delay to wait before retrying
+            retrydelay = __nextRetrydelay(retrydelay)
+            continue
+        if not count:
+            err = ConnectionClosedError("receiving: not enough data")
+            err.partialData = view[:received].tobytes()  # store the message that was received until now
+            raise err
+        received += count
+    return size
+
+
+def receiveAvailable(sock, size):
+    """Receive whatever data is available on a socket, at most the given number of bytes.
+    Blocks until at least some data has arrived; unlike receiveData, it doesn't wait for all of it.
+    Raises ConnectionClosedError if the connection was closed."""
+    retrydelay = 0.0
+    while True:
+        try:
+            data = sock.recv(size)
+        except socket.timeout:
+            raise TimeoutError("receiving: timeout")
+        except socket.error as x:
+            err = getattr(x, "errno", x.args[0])
+            if err not in ERRNO_RETRIES:
+                raise ConnectionClosedError("receiving: connection lost: " + str(x))
+            time.sleep(0.00001 + retrydelay)  # a slight delay to wait before retrying
+            retrydelay = __nextRetrydelay(retrydelay)
+            continue
+        if not data:
+            raise ConnectionClosedError("receiving: not enough data")
+        return data
+
+
+class BufferPool(object):
+    """
+    Thread safe pool of reusable receive buffers (bytearrays), grouped in size classes.
+    Large messages are received into a buffer taken from the pool, instead of
+    allocating a new one (and a list of chunks to join) for every message.
+    The total size of the idle buffers that are kept is limited by the BUFFER_POOL_SIZE config item.
+    """
+    def __init__(self, min_size=65536):
+        self.min_size = min_size
+        self.lock = threading.Lock()
+        self.idle = defaultdict(list)   # size class -> idle buffers
+        self.pooled_size = 0
+
+    @staticmethod
+    def size_class(size):
+        """Round the size up to the next 1/8th step of its power-of-two range (wastes at most 12.5%)."""
+        step = max(1 << max(size.bit_length() - 4, 0), 4096)
+        return (size + step - 1) // step * step
+
+    def acquire(self, size):
+        """Get a buffer that is at least the requested size."""
+        size = self.size_class(size)
+        with self.lock:
+            buffers = self.idle.get(size)
+            if buffers:
+                self.pooled_size -= size
+                return buffers.pop()
+        return bytearray(size)
+
+    def release(self, buffer):
+        """Give a buffer back to the pool. It must not be used anymore by the caller."""
+        size = len(buffer)
+        if size < self.min_size or size != self.size_class(size):
+            return
+        with self.lock:
+            if self.pooled_size + size <= config.BUFFER_POOL_SIZE:
+                self.idle[size].append(buffer)
+                self.pooled_size += size
+
+    def clear(self):
+        with self.lock:
+            self.idle.clear()
+            self.pooled_size = 0
+
+
+bufferPool = BufferPool()
+
+
 def sendData(sock, data):
     """
     Send some data over a socket.
@@ -226,17 +335,84 @@ def sendData(sock, data):
                 retrydelay = __nextRetrydelay(retrydelay)
 
 
+try:
+    _IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = 16
+if _IOV_MAX <= 0:
+    _IOV_MAX = 16
+
+
+def sendDataVectored(sock, buffers):
+    """
+    Send a sequence of data buffers over a socket, as if they were one consecutive piece of data.
+    Uses scatter-gather I/O (``sendmsg``) where possible so that the buffers don't have
+    to be concatenated (copied) first, which matters for large message payloads.
+    For SSL sockets, and on systems that don't have ``sendmsg``, it falls back to a send loop
+    that only glues the small buffers together and sends the large ones as they are.
+    """
+    if hasattr(sock, "getpeercert") or not hasattr(sock, "sendmsg"):
+        # SSL sockets don't support sendmsg
+        for chunk in _coalesceBuffers(buffers):
+            sendData(sock, chunk)
+        return
+    views = []
+    for buf in buffers:
+        if len(buf):
+            view = memoryview(buf)
+            if view.itemsize != 1 or view.ndim != 1:
+                view = view.cast("B")
+            views.append(view)
+    retrydelay = 0.0
+    while views:
+        try:
+            sent = sock.sendmsg(views[:_IOV_MAX])
+        except socket.timeout:
+            raise TimeoutError("sending: timeout")
+        except socket.error as x:
+            err = getattr(x, "errno", x.args[0])
+            if err not in ERRNO_RETRIES:
+                raise ConnectionClosedError("sending: connection lost: " + str(x))
+            time.sleep(0.00001 + retrydelay)  # a slight delay to wait before retrying
+            retrydelay = __nextRetrydelay(retrydelay)
+            continue
+        # skip past the buffers that were sent completely, and slice the one that was sent partially
+        done = 0
+        while sent and sent >= len(views[done]):
+            sent -= len(views[done])
+            done += 1
+        del views[:done]
+        if sent:
+            views[0] = views[0][sent:]
+
+
+def _coalesceBuffers(buffers, threshold=65536):
+    """Joins consecutive small buffers together, but leaves the large buffers alone (to avoid copying them)."""
+    pending = []
+    for buf in buffers:
+        if len(buf) >= threshold:
+            if pending:
+                yield b"".join(pending)
+                pending = []
+            yield buf
+        elif len(buf):
+            pending.append(buf)
+    if pending:
+        yield b"".join(pending)
+
+
 _GLOBAL_DEFAULT_TIMEOUT = object()
 
 
 def createSocket(bind=None, connect=None, reuseaddr=False, keepalive=True,
-                 timeout=_GLOBAL_DEFAULT_TIMEOUT, noinherit=False, ipv6=False, nodelay=True, sslContext=None):
+                 timeout=_GLOBAL_DEFAULT_TIMEOUT, noinherit=False, ipv6=False, nodelay=True, sslContext=None, reuseport=False):
     """
     Create a socket. Default socket options are keepalive and IPv4 family, and nodelay (nagle disabled).
     If 'bind' or 'connect' is a string, it is assumed a Unix domain socket is requested.
     Otherwise, a normal tcp/ip socket is used.
     Set ipv6=True to create an IPv6 socket rather than IPv4.
     Set ipv6=None to use the PREFER_IP_VERSION config setting.
+    Set reuseport=True to let multiple sockets (processes) bind to the same address and port.
     """
     if bind and connect:
         raise ValueError("bind and connect cannot both be specified at the same time")
@@ -287,6 +463,8 @@ def createSocket(bind=None, connect=None, reuseaddr=False, keepalive=True,
         setNoDelay(sock)
     if reuseaddr:
         setReuseAddr(sock)
+    if reuseport:
+        setReusePort(sock)
     if noinherit:
         setNoInherit(sock)
     if timeout == 0:
@@ -390,6 +568,16 @@ def setReuseAddr(sock):
         pass
 
 
+def setReusePort(sock):
+    """
+    sets the SO_REUSEPORT option on the socket, so that other sockets with this option can bind to the same port.
+    On Linux, incoming connections are then distributed over the listening sockets.
+    """
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise CommunicationError("SO_REUSEPORT is not supported on this platform")
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
+
 def setNoDelay(sock):
     """sets the TCP_NODELAY option on the socket (to disable Nagle's algorithm), if possible."""
     try:
@@ -439,13 +627,28 @@ except ImportError:
 
 
 class SocketConnection(object):
-    """A wrapper class for plain sockets, containing various methods such as :meth:`send` and :meth:`recv`"""
+    """
+    A wrapper class for plain sockets, containing various methods such as :meth:`send` and :meth:`recv`.
+    Receiving is buffered: small reads take whatever data is available on the socket (up to ``read_ahead`` bytes)
+    so that a complete message (header, annotations and data) is usually obtained with a single system call.
+    Bytes that are left over are kept for the next read.
+    """
+    read_ahead = 16384
+
     def __init__(self, sock, objectId=None, keep_open=False):
         self.sock = sock
+        self.__rbuf = b""
+        self.__rpos = 0
+        self.sendLock = threading.RLock()   # responses to pipelined calls are sent from multiple threads
         self.objectId = objectId
         self.pyroInstances = {}    # pyro objects for instance_mode=session
         self.tracked_resources = weakref.WeakSet()      # weakrefs to resources for this connection
         self.keep_open = keep_open
+        self.compressionStream = None   # util.CompressionStream, if it's negotiated in the handshake
+        self.progress = None    # callable(direction, done, total) that is called for every fragment of a large message
+        self.serializer = None  # name of the serializer that is negotiated in the handshake (client side)
+        self.compressionCodecs = None   # names of the codecs the client can decompress, from the handshake (daemon side)
+        self.streamChunks = False   # can the daemon give several items of a remote iterator at a time, from the handshake (client side)
 
     def __del__(self):
         self.close()
@@ -457,10 +660,71 @@ class SocketConnection(object):
         self.close()
 
     def send(self, data):
-        sendData(self.sock, data)
+        with self.sendLock:
+            sendData(self.sock, data)
+
+    def sendv(self, buffers):
+        with self.sendLock:
+            sendDataVectored(self.sock, buffers)
 
     def recv(self, size):
-        return receiveData(self.sock, size)
+        buffered = len(self.__rbuf) - self.__rpos
+        if buffered >= size:
+            data = self.__rbuf[self.__rpos:self.__rpos + size]
+            self.__rpos += size
+            if self.__rpos == len(self.__rbuf):
+                self.__rbuf = b""
+                self.__rpos = 0
+            return data
+        chunks = [self.__rbuf[self.__rpos:]] if buffered else []
+        self.__rbuf = b""
+        self.__rpos = 0
+        if size - buffered >= self.read_ahead:
+            # large read, no use in buffering: receive the remaining data directly
+            chunks.append(receiveData(self.sock, size - buffered))
+            return b"".join(chunks)
+        try:
+            while buffered < size:
+                chunk = receiveAvailable(self.sock, self.read_ahead)
+                chunks.append(chunk)
+                buffered += len(chunk)
+        except ConnectionClosedError as x:
+            x.partialData = b"".join(chunks)
+            raise
+        except TimeoutError:
+            self.__rbuf = b"".join(chunks)   # keep what we have, the read may be retried
+            raise
+        data = b"".join(chunks)
+        if buffered == size:
+            return data
+        self.__rbuf = data
+        self.__rpos = size
+        return data[:size]
+
+    def recv_into(self, buffer, size=None):
+        view = memoryview(buffer)
+        if size is None:
+            size = len(view)
+        buffered = min(len(self.__rbuf) - self.__rpos, size)
+        if buffered:
+            view[:buffered] = self.__rbuf[self.__rpos:self.__rpos + buffered]
+            self.__rpos += buffered
+            if self.__rpos == len(self.__rbuf):
+                self.__rbuf = b""
+                self.__rpos = 0
+        if size > buffered:
+            receiveDataInto(self.sock, view[buffered:], size - buffered)
+        return size
+
+    def pending(self):
+        """
+        number of bytes that have been received and are buffered, but haven't been read yet.
+        For an ssl socket, this includes the data that it has already decrypted (a selector won't signal that data).
+        """
+        pending = len(self.__rbuf) - self.__rpos
+        if hasattr(self.sock, "pending"):
+            pending += self.sock.pending()
+        return pending
 
     def close(self):
         if self.keep_open:
@@ -499,9 +763,38 @@ class SocketConnection(object):
         except AttributeError:
             return None
 
+    @property
+    def peername(self):
+        """address of the other side of the connection (None if it can't be determined), it is only looked up once"""
+        try:
+            return self.__peername
+        except AttributeError:
+            try:
+                self.__peername = self.sock.getpeername()
+            except socket.error:
+                self.__peername = None   # sometimes getpeername() doesn't work...
+            return self.__peername
+
+    @property
+    def local(self):
+        """is the other side of the connection on this machine (loopback address, or unix domain socket)"""
+        try:
+            return self.__local
+        except AttributeError:
+            self.__local = isLocalConnection(self.sock, self.peername)
+            return self.__local
+
     timeout = property(getTimeout, setTimeout)
 
 
+def isLocalConnection(sock, peername):
+    """returns if the connected socket talks to this machine itself: over a loopback address, or a unix domain socket"""
+    if sock.family == getattr(socket, "AF_UNIX", None):
+        return True
+    host = peername[0] if peername else ""
+    return host.startswith("127.") or host.startswith("::ffff:127.") or host == "::1"
+
+
 def family_str(sock):
     f = sock.family
     if f == socket.AF_INET:
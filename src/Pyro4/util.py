@@ -5,7 +5,9 @@ Pyro - Python Remote Objects.  Copyright by Irmen de Jong (irmen@razorvine.net).
 """
 
 import sys
+import time
 import zlib
+import threading
 import uuid
 import logging
 import linecache
@@ -14,6 +16,7 @@ import inspect
 import struct
 import datetime
 import decimal
+import array
 import numbers
 from Pyro4 import errors
 from Pyro4.configuration import config
@@ -154,34 +157,50 @@ class SerializerBase(object):
     """Base class for (de)serializer implementations (which must be thread safe)"""
     __custom_class_to_dict_registry = {}
     __custom_dict_to_class_registry = {}
+    binary_attachments = False    # can large binary values be sent as attachments (config item ATTACHMENT_MINSIZE, Python 3 only)
 
-    def serializeData(self, data, compress=False):
+    def serializeData(self, data, compress=False, method=None):
         """Serialize the given data object, try to compress if told so.
-        Returns a tuple of the serialized data (bytes) and a bool indicating if it is compressed or not."""
+        Compress can be True (use the configured codec), or a compression codec (name or :class:`Compressor`).
+        The method is the name of the call that the data is the result of, for adaptive compression.
+        Returns a tuple of the serialized data (bytes) and the codec that compressed it, or False if it is not compressed."""
+        if self.binary_attachments and config.ATTACHMENT_MINSIZE and sys.version_info >= (3, 0):
+            attachments = []
+            data = _extract_attachments(data, config.ATTACHMENT_MINSIZE, attachments)
+            if attachments:
+                return OutOfBandData(self.dumps(data), attachments), False
         data = self.dumps(data)
-        return self.__compressdata(data, compress)
+        return self.__compressdata(data, compress, method)
 
     def deserializeData(self, data, compressed=False):
-        """Deserializes the given data (bytes). Set compressed to True to decompress the data first."""
+        """Deserializes the given data (bytes). Set compressed to True (zlib) or to the codec to decompress the data first."""
         if compressed:
-            if sys.version_info < (3, 0):
-                data = self._convertToBytes(data)
-            data = zlib.decompress(data)
+            data = self.__decompressdata(data, compressed)
+        if self.binary_attachments and type(data) is OutOfBandData:
+            return _insert_attachments(self.loads(data.stream), data.buffers)
         return self.loads(data)
 
     def serializeCall(self, obj, method, vargs, kwargs, compress=False):
         """Serialize the given method call parameters, try to compress if told so.
-        Returns a tuple of the serialized data and a bool indicating if it is compressed or not."""
+        Compress can be True (use the configured codec), or a compression codec (name or :class:`Compressor`).
+        Returns a tuple of the serialized data and the codec that compressed it, or False if it is not compressed."""
+        if self.binary_attachments and config.ATTACHMENT_MINSIZE and sys.version_info >= (3, 0):
+            attachments = []
+            vargs = _extract_attachments(vargs, config.ATTACHMENT_MINSIZE, attachments)
+            kwargs = _extract_attachments(kwargs, config.ATTACHMENT_MINSIZE, attachments)
+            if attachments:
+                return OutOfBandData(self.dumpsCall(obj, method, vargs, kwargs), attachments), False
         data = self.dumpsCall(obj, method, vargs, kwargs)
-        return self.__compressdata(data, compress)
+        return self.__compressdata(data, compress, method)
 
     def deserializeCall(self, data, compressed=False):
         """Deserializes the given call data back to (object, method, vargs, kwargs) tuple.
-        Set compressed to True to decompress the data first."""
+        Set compressed to True (zlib) or to the codec to decompress the data first."""
         if compressed:
-            if sys.version_info < (3, 0):
-                data = self._convertToBytes(data)
-            data = zlib.decompress(data)
+            data = self.__decompressdata(data, compressed)
+        if self.binary_attachments and type(data) is OutOfBandData:
+            obj, method, vargs, kwargs = self.loadsCall(data.stream)
+            return obj, method, _insert_attachments(vargs, data.buffers), _insert_attachments(kwargs, data.buffers)
         return self.loadsCall(data)
 
     def loads(self, data):
@@ -205,14 +224,31 @@ class SerializerBase(object):
                 return data.tobytes()
         return data
 
-    def __compressdata(self, data, compress):
-        if not compress or len(data) < 200:
-            return data, False  # don't waste time compressing small messages
-        compressed = zlib.compress(data)
+    def __compressdata(self, data, compress, method):
+        if not compress or len(data) < config.COMPRESSION_MINSIZE or type(data) is OutOfBandData:
+            return data, False  # don't waste time compressing small messages (or large binary buffers)
+        if compress is True:
+            compressor = get_compressor(config.COMPRESSION_CODEC)
+        elif isinstance(compress, Compressor):
+            compressor = compress
+        else:
+            compressor = get_compressor(compress)
+        adaptive = config.COMPRESSION_ADAPTIVE
+        if adaptive and not compressionPolicy.shouldCompress(compressor, method, len(data)):
+            return data, False
+        compressed = compressor.compress(data)
+        if adaptive:
+            compressionPolicy.record(compressor, method, len(data), len(compressed))
         if len(compressed) < len(data):
-            return compressed, True
+            return compressed, compressor
         return data, False
 
+    def __decompressdata(self, data, compressed):
+        if sys.version_info < (3, 0):
+            data = self._convertToBytes(data)
+        compressor = compressed if isinstance(compressed, Compressor) else _zlibCompressor
+        return compressor.decompress(data)
+
     @classmethod
     def register_type_replacement(cls, object_type, replacement_function):
         raise NotImplementedError("implement in subclass")
@@ -329,6 +365,8 @@ class SerializerBase(object):
         if classname in cls.__custom_dict_to_class_registry:
             converter = cls.__custom_dict_to_class_registry[classname]
             return converter(classname, data)
+        if classname == _ATTACHMENT_CLASS:
+            return data     # the attachment is inserted after deserialization
         if "__" in classname:
             raise errors.SecurityError("refused to deserialize types with double underscores in their name: " + classname)
         # for performance, the constructors below are hardcoded here instead of added on a per-class basis to the dict-to-class registry
@@ -429,6 +467,137 @@ class SerializerBase(object):
     __hash__ = object.__hash__
 
 
+class OutOfBandData(object):
+    """
+    Serialized data that consists of a pickle stream and the out-of-band buffers (pickle protocol 5) it refers to.
+    The buffers are not copied into the pickle stream, they are sent as separate frames after it in the message data.
+    """
+    def __init__(self, stream, buffers):
+        self.stream = stream
+        self.buffers = buffers
+
+    def __len__(self):
+        return len(self.stream) + sum(buffer.nbytes for buffer in self.buffers)
+
+    def frames(self):
+        """the pickle stream followed by the buffers, as they appear in the message data"""
+        return [self.stream] + self.buffers
+
+    def layout(self):
+        """the sizes of the out-of-band buffers, encoded for the 'OOBF' message annotation"""
+        return struct.pack("!%dQ" % len(self.buffers), *[buffer.nbytes for buffer in self.buffers])
+
+    def tobytes(self):
+        return b"".join(self.frames())
+
+    @classmethod
+    def from_frames(cls, data, layout):
+        """splits the received message data (a memoryview) into the pickle stream and the buffers, without copying"""
+        sizes = struct.unpack("!%dQ" % (len(layout) // 8), layout) if len(layout) % 8 == 0 else [-1]
+        end = len(data) - sum(sizes)
+        if end < 0 or min(sizes or [0]) < 0:
+            raise errors.ProtocolError("invalid out-of-band buffers layout")
+        stream = data[:end]
+        buffers = []
+        for size in sizes:
+            buffers.append(data[end:end + size])
+            end += size
+        return cls(stream, buffers)
+
+
+_ATTACHMENT_CLASS = "Pyro4.attachment"
+_attachment_types = {bytes: "bytes", bytearray: "bytearray", memoryview: "memoryview", array.array: "array"}
+
+
+def _extract_attachments(obj, minsize, attachments):
+    """
+    Replaces binary values (bytes, bytearray, memoryview, array.array) of at least minsize bytes in the object
+    and the lists, tuples and dicts in it, by references to attachments. Their memory is added to the attachments list.
+    Returns the object itself if nothing was replaced, otherwise a copy. Python 3 only (it needs memoryview.cast).
+    """
+    t = type(obj)
+    if t in _attachment_types:
+        try:
+            view = memoryview(obj).cast("B")
+        except (TypeError, ValueError):
+            return obj      # not contiguous, or not castable to bytes
+        if view.nbytes < minsize:
+            return obj
+        reference = {"__class__": _ATTACHMENT_CLASS, "index": len(attachments), "type": _attachment_types[t]}
+        if t is array.array:
+            reference["typecode"] = obj.typecode
+        attachments.append(view)
+        return reference
+    if t is list or t is tuple:
+        items = [_extract_attachments(item, minsize, attachments) for item in obj]
+        if any(new is not old for new, old in zip(items, obj)):
+            return t(items)
+    elif t is dict:
+        items = {key: _extract_attachments(value, minsize, attachments) for key, value in obj.items()}
+        if any(items[key] is not value for key, value in obj.items()):
+            return items
+    return obj
+
+
+def _insert_attachments(obj, buffers):
+    """
+    Replaces the attachment references in the deserialized object by the attachments (buffers) that were received.
+    (Python 2 can't send attachments, but it does accept them)
+    """
+    t = type(obj)
+    if t is list or t is tuple:
+        return t(_insert_attachments(item, buffers) for item in obj)
+    if t is dict:
+        if obj.get("__class__") == _ATTACHMENT_CLASS:
+            try:
+                buffer = buffers[obj["index"]]
+            except (IndexError, TypeError):
+                raise errors.SerializeError("invalid attachment reference")
+            kind = obj["type"]
+            if kind == "bytearray":
+                return bytearray(buffer)
+            if kind == "array":
+                result = array.array(str(obj["typecode"]))
+                if sys.version_info >= (3, 0):
+                    result.frombytes(buffer)
+                else:
+                    result.fromstring(buffer.tobytes())
+                return result
+            return buffer.tobytes()     # bytes, and memoryviews (which can't be sent as-is by these serializers)
+        return {key: _insert_attachments(value, buffers) for key, value in obj.items()}
+    return obj
+
+
+def _pickle_dumps(dumps, obj, protocol):
+    """
+    Pickles the object. With pickle protocol 5 or newer and PICKLE_OOB_MINSIZE set, buffers of at least that size
+    are kept out of the pickle stream (they're not copied), and an :class:`OutOfBandData` is returned instead of bytes.
+    """
+    minsize = config.PICKLE_OOB_MINSIZE
+    if minsize and protocol >= 5:
+        buffers = []
+
+        def buffer_callback(buffer):
+            try:
+                raw = buffer.raw()
+            except BufferError:
+                return True     # not contiguous, can only be pickled in-band
+            if raw.nbytes < minsize:
+                return True
+            buffers.append(raw)
+            return False
+        stream = dumps(obj, protocol, buffer_callback=buffer_callback)
+        return OutOfBandData(stream, buffers) if buffers else stream
+    return dumps(obj, protocol)
+
+
+def _pickle_loads(loads, data):
+    """Unpickles the data, which can be :class:`OutOfBandData` (the buffers are passed to the unpickler as-is)."""
+    if type(data) is OutOfBandData:
+        return loads(data.stream, buffers=data.buffers)
+    return loads(data)
+
+
 class PickleSerializer(SerializerBase):
     """
     A (de)serializer that wraps the Pickle serialization protocol.
@@ -437,18 +606,20 @@ class PickleSerializer(SerializerBase):
     serializer_id = 4  # never change this
 
     def dumpsCall(self, obj, method, vargs, kwargs):
-        return pickle.dumps((obj, method, vargs, kwargs), config.PICKLE_PROTOCOL_VERSION)
+        return _pickle_dumps(pickle.dumps, (obj, method, vargs, kwargs), config.PICKLE_PROTOCOL_VERSION)
 
     def dumps(self, data):
-        return pickle.dumps(data, config.PICKLE_PROTOCOL_VERSION)
+        return _pickle_dumps(pickle.dumps, data, config.PICKLE_PROTOCOL_VERSION)
 
     def loadsCall(self, data):
-        data = self._convertToBytes(data)
-        return pickle.loads(data)
+        if sys.version_info < (3, 0):
+            data = self._convertToBytes(data)
+        return _pickle_loads(pickle.loads, data)   # python 3's pickle accepts memoryviews etc. directly, avoids a copy
 
     def loads(self, data):
-        data = self._convertToBytes(data)
-        return pickle.loads(data)
+        if sys.version_info < (3, 0):
+            data = self._convertToBytes(data)
+        return _pickle_loads(pickle.loads, data)
 
     @classmethod
     def register_type_replacement(cls, object_type, replacement_function):
@@ -471,16 +642,16 @@ class CloudpickleSerializer(SerializerBase):
     serializer_id = 7  # never change this
 
     def dumpsCall(self, obj, method, vargs, kwargs):
-        return cloudpickle.dumps((obj, method, vargs, kwargs), config.PICKLE_PROTOCOL_VERSION)
+        return _pickle_dumps(cloudpickle.dumps, (obj, method, vargs, kwargs), config.PICKLE_PROTOCOL_VERSION)
 
     def dumps(self, data):
-        return cloudpickle.dumps(data, config.PICKLE_PROTOCOL_VERSION)
+        return _pickle_dumps(cloudpickle.dumps, data, config.PICKLE_PROTOCOL_VERSION)
 
     def loadsCall(self, data):
-        return cloudpickle.loads(data)
+        return _pickle_loads(cloudpickle.loads, data)
 
     def loads(self, data):
-        return cloudpickle.loads(data)
+        return _pickle_loads(cloudpickle.loads, data)
 
     @classmethod
     def register_type_replacement(cls, object_type, replacement_function):
@@ -503,16 +674,16 @@ class DillSerializer(SerializerBase):
     serializer_id = 5  # never change this
 
     def dumpsCall(self, obj, method, vargs, kwargs):
-        return dill.dumps((obj, method, vargs, kwargs), config.DILL_PROTOCOL_VERSION)
+        return _pickle_dumps(dill.dumps, (obj, method, vargs, kwargs), config.DILL_PROTOCOL_VERSION)
 
     def dumps(self, data):
-        return dill.dumps(data, config.DILL_PROTOCOL_VERSION)
+        return _pickle_dumps(dill.dumps, data, config.DILL_PROTOCOL_VERSION)
 
     def loadsCall(self, data):
-        return dill.loads(data)
+        return _pickle_loads(dill.loads, data)
 
     def loads(self, data):
-        return dill.loads(data)
+        return _pickle_loads(dill.loads, data)
 
     @classmethod
     def register_type_replacement(cls, object_type, replacement_function):
@@ -530,6 +701,7 @@ class DillSerializer(SerializerBase):
 class MarshalSerializer(SerializerBase):
     """(de)serializer that wraps the marshal serialization protocol."""
     serializer_id = 3  # never change this
+    binary_attachments = True
 
     def dumpsCall(self, obj, method, vargs, kwargs):
         return marshal.dumps((obj, method, vargs, kwargs))
@@ -581,6 +753,7 @@ class MarshalSerializer(SerializerBase):
 class SerpentSerializer(SerializerBase):
     """(de)serializer that wraps the serpent serialization protocol."""
     serializer_id = 1  # never change this
+    binary_attachments = True
 
     def dumpsCall(self, obj, method, vargs, kwargs):
         return serpent.dumps((obj, method, vargs, kwargs), module_in_classname=True)
@@ -626,6 +799,7 @@ class SerpentSerializer(SerializerBase):
 class JsonSerializer(SerializerBase):
     """(de)serializer that wraps the json serialization protocol."""
     serializer_id = 2  # never change this
+    binary_attachments = True
 
     __type_replacements = {}
 
@@ -758,6 +932,41 @@ def get_serializer_by_id(sid):
         raise errors.SerializeError("no serializer available for id %d" % sid)
 
 
+def available_serializers(names):
+    """returns the names of the given serializers that are available, in the same order"""
+    return [name for name in names if name in _serializers]
+
+
+_benchmark_data = {
+    "name": "sample",
+    "numbers": list(range(100)),
+    "ratio": 3.14159,
+    "enabled": True,
+    "records": [{"id": i, "label": "record %d" % i, "score": i * 1.5, "tags": ["a", "b"]} for i in range(20)]
+}
+
+
+def rank_serializers(names, data=None, rounds=100):
+    """
+    Returns the names of the given serializers that are available, ordered by how fast they serialize and
+    deserialize the data (fastest first). Pass data that is representative for your calls, or use the built-in sample.
+    Serializers that can't handle the data are left out. Meant for the SERIALIZERS_PREFERRED config item.
+    """
+    data = _benchmark_data if data is None else data
+    timer = getattr(time, "perf_counter", time.time)
+    durations = []
+    for name in available_serializers(names):
+        serializer = _serializers[name]
+        try:
+            start = timer()
+            for _ in range(rounds):
+                serializer.deserializeData(serializer.serializeData(data)[0])
+            durations.append((timer() - start, name))
+        except Exception:
+            log.debug("serializer %s can't handle the benchmark data", name)
+    return [name for _, name in sorted(durations)]
+
+
 # determine the serializers that are supported
 try:
     import cPickle as pickle
@@ -821,6 +1030,250 @@ except ImportError:
 del _ser
 
 
+class Compressor(object):
+    """
+    Base class for compression codecs of the message data (which must be thread safe).
+    Messages that are compressed with another codec than zlib carry the codec's name in their
+    'CMPR' annotation, so the receiving side must have a codec registered under that name.
+    """
+    name = None
+
+    def compress(self, data):
+        raise NotImplementedError("implement in subclass")
+
+    def decompress(self, data):
+        raise NotImplementedError("implement in subclass")
+
+    def with_level(self, level):
+        """returns a codec of the same kind that compresses with the given level"""
+        raise errors.SerializeError("compression codec '%s' has no compression levels" % self.name)
+
+
+class ZlibCompressor(Compressor):
+    """
+    Zlib compression (the default, understood by every Pyro version).
+    Register one under another name with a preset dictionary (zdict, Python 3.3+) to better compress
+    small messages that contain recurring strings. Both sides must use the same dictionary.
+    """
+    def __init__(self, level=zlib.Z_DEFAULT_COMPRESSION, zdict=None, name="zlib"):
+        if zdict and sys.version_info < (3, 3):
+            raise errors.PyroError("zlib preset dictionaries require Python 3.3 or newer")
+        self.name = name
+        self.level = level
+        self.zdict = zdict
+
+    def compress(self, data):
+        if self.zdict:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL, zlib.Z_DEFAULT_STRATEGY, self.zdict)
+            return compressor.compress(data) + compressor.flush()
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data):
+        if self.zdict:
+            decompressor = zlib.decompressobj(zdict=self.zdict)
+            return decompressor.decompress(data) + decompressor.flush()
+        return zlib.decompress(data)
+
+    def with_level(self, level):
+        return ZlibCompressor(level, self.zdict, self.name)
+
+
+class Bz2Compressor(Compressor):
+    """bz2 compression: strong but slow"""
+    name = "bz2"
+
+    def __init__(self, level=9):
+        self.level = level
+
+    def compress(self, data):
+        return bz2.compress(data, self.level)
+
+    def decompress(self, data):
+        return bz2.decompress(data)
+
+    def with_level(self, level):
+        return Bz2Compressor(level)
+
+
+class LzmaCompressor(Compressor):
+    """lzma compression: the strongest, and the slowest"""
+    name = "lzma"
+
+    def __init__(self, level=None):
+        self.level = level
+
+    def compress(self, data):
+        return lzma.compress(data, preset=self.level)
+
+    def decompress(self, data):
+        return lzma.decompress(data)
+
+    def with_level(self, level):
+        return LzmaCompressor(level)
+
+
+class Lz4Compressor(Compressor):
+    """lz4 compression (requires the lz4 library): very fast, but weaker"""
+    name = "lz4"
+
+    def __init__(self, level=0):
+        self.level = level
+
+    def compress(self, data):
+        return lz4.frame.compress(data, compression_level=self.level)
+
+    def decompress(self, data):
+        return lz4.frame.decompress(data)
+
+    def with_level(self, level):
+        return Lz4Compressor(level)
+
+
+class ZstdCompressor(Compressor):
+    """zstd compression (requires the zstandard library): fast, and strong at higher levels"""
+    name = "zstd"
+
+    def __init__(self, level=3):
+        self.level = level
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor(level=self.level).compress(data)   # (these objects aren't thread safe)
+
+    def decompress(self, data):
+        return zstandard.ZstdDecompressor().decompress(data)
+
+    def with_level(self, level):
+        return ZstdCompressor(level)
+
+
+class CompressionStream(object):
+    """
+    Connection-scoped zlib compression (``COMPRESSION_STREAM``), negotiated in the connection handshake.
+    Instead of compressing every message on its own, all messages that are sent over the connection are part
+    of one zlib stream (flushed with Z_SYNC_FLUSH after each message), and so are all the messages that are received.
+    Small messages that resemble earlier ones (method names, dict keys, class names) then compress very well.
+    Because of this, messages must be compressed in the order they're sent, and decompressed in the order they're received.
+    """
+    name = "zstream"
+
+    def __init__(self, level=zlib.Z_DEFAULT_COMPRESSION):
+        self.lock = threading.Lock()   # held while compressing and sending a message
+        self.compressor = zlib.compressobj(level)
+        self.decompressor = zlib.decompressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def decompress(self, data):
+        if sys.version_info < (3, 0) and type(data) is not bytes:
+            data = bytes(data)
+        return self.decompressor.decompress(data)
+
+
+class CompressionPolicy(object):
+    """
+    Adaptive compression (``COMPRESSION_ADAPTIVE``): learns per codec, method and payload size class
+    whether compression pays off. Data that doesn't shrink by at least ``min_saving`` is no longer compressed,
+    but every ``probe_interval`` messages it is tried again, in case the data has changed.
+    """
+    min_saving = 0.1
+    probe_interval = 32
+
+    def __init__(self):
+        self.skipped = {}   # (codec name, method, size class) -> number of messages sent uncompressed since the last try
+
+    def shouldCompress(self, compressor, method, size):
+        key = (compressor.name, method, size.bit_length())
+        skipped = self.skipped.get(key)
+        if skipped is None:
+            return True
+        if skipped >= self.probe_interval:
+            return True
+        self.skipped[key] = skipped + 1
+        return False
+
+    def record(self, compressor, method, size, compressed_size):
+        key = (compressor.name, method, size.bit_length())
+        if compressed_size > size * (1.0 - self.min_saving):
+            self.skipped[key] = 0   # compression doesn't pay off, skip it for a while
+        else:
+            self.skipped.pop(key, None)
+
+    def clear(self):
+        self.skipped.clear()
+
+
+compressionPolicy = CompressionPolicy()
+
+"""The compression codecs that are supported"""
+_compressors = {}
+_compressors_by_spec = {}
+
+
+def register_compressor(compressor):
+    """Registers a compression codec under its name (replacing any codec with the same name)."""
+    _compressors[compressor.name] = compressor
+    _compressors_by_spec.clear()
+
+
+def get_compressor(spec):
+    """
+    Returns the compression codec for the spec: a codec name, optionally followed by
+    a compression level such as ``"zlib:9"`` or ``"lzma:1"``. This is meant for configured specs,
+    use :func:`get_compressor_by_name` for the codec names in received messages.
+    """
+    try:
+        return _compressors_by_spec[spec]
+    except KeyError:
+        name, _, level = spec.partition(":")
+        compressor = get_compressor_by_name(name)
+        if level:
+            try:
+                compressor = compressor.with_level(int(level))
+            except ValueError:
+                raise errors.SerializeError("invalid compression level in '%s'" % spec)
+        _compressors_by_spec[spec] = compressor
+        return compressor
+
+
+def available_compressors():
+    """Returns the names of the compression codecs that are available."""
+    return sorted(_compressors)
+
+
+def get_compressor_by_name(name):
+    """Returns the registered compression codec with the given name (with its default level)."""
+    try:
+        return _compressors[name]
+    except KeyError:
+        raise errors.SerializeError("compression codec '%s' is unknown or not available" % name)
+
+
+# determine the compression codecs that are supported
+_zlibCompressor = ZlibCompressor()
+register_compressor(_zlibCompressor)
+try:
+    import bz2
+    register_compressor(Bz2Compressor())
+except ImportError:
+    pass
+try:
+    import lzma
+    register_compressor(LzmaCompressor())
+except ImportError:
+    pass
+try:
+    import lz4.frame
+    register_compressor(Lz4Compressor())
+except ImportError:
+    pass
+try:
+    import zstandard
+    register_compressor(ZstdCompressor())
+except ImportError:
+    pass
+
+
 def getAttribute(obj, attr):
     """
     Resolves an attribute name to an object.  Raises
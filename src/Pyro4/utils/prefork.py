@@ -0,0 +1,182 @@
+"""
+Prefork server: runs a Pyro daemon in multiple worker processes that all listen on the same address,
+so that CPU-bound Pyro objects are not limited by a single process (and its GIL).
+The worker sockets use SO_REUSEPORT so that the operating system distributes the connections over them.
+Requires a system with os.fork and a load balancing SO_REUSEPORT (such as Linux 3.9 or newer).
+
+Pyro - Python Remote Objects.  Copyright by Irmen de Jong (irmen@razorvine.net).
+"""
+
+from __future__ import print_function
+import os
+import time
+import errno
+import signal
+import socket
+import logging
+from Pyro4 import core, socketutil
+from Pyro4.configuration import config
+
+
+__all__ = ["PreforkServer"]
+
+log = logging.getLogger("Pyro4.prefork")
+
+
+class PreforkServer(object):
+    """
+    Runs a Pyro daemon on the given host and port in a number of worker processes (default: the number of cpus).
+    The setup function is called with the new daemon in every worker process, it must register the Pyro objects.
+    Use fixed object ids when registering them, so that the objects have the same uri in every worker.
+    The server itself (the parent process) supervises the workers, and restarts them if they die.
+    """
+    poll_interval = 0.2     # seconds between the checks for workers that exited
+    def __init__(self, setup, workers=None, host=None, port=0, nathost=None, natport=None):
+        if not hasattr(os, "fork") or not hasattr(socket, "SO_REUSEPORT"):
+            raise RuntimeError("the prefork server requires os.fork and SO_REUSEPORT support")
+        self.setup = setup
+        self.workers = workers or _cpu_count()
+        self.nathost = nathost
+        self.natport = natport
+        self.pids = set()
+        self.running = False
+        host = host or config.HOST
+        # Reserve the port for the workers. This socket doesn't listen, so it won't be given any connections.
+        family = socket.AF_INET6 if socketutil.getIpVersion(host) == 6 else socket.AF_INET
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        socketutil.setReusePort(self.sock)
+        self.sock.bind((host, port))
+        self.host, self.port = host, self.sock.getsockname()[1]
+        if ":" in self.host:  # ipv6
+            self.locationStr = "[%s]:%d" % (self.host, self.port)
+        else:
+            self.locationStr = "%s:%d" % (self.host, self.port)
+
+    def __repr__(self):
+        return "<%s.%s at 0x%x; %s; %d workers>" % (self.__class__.__module__, self.__class__.__name__,
+                                                     id(self), self.locationStr, len(self.pids))
+
+    def uriFor(self, objectId, nat=True):
+        """Get a URI for the object with the given id, that is served by the workers."""
+        if nat and self.nathost:
+            return core.URI("PYRO:%s@%s:%d" % (objectId, self.nathost, self.natport or self.port))
+        return core.URI("PYRO:%s@%s" % (objectId, self.locationStr))
+
+    def serve(self):
+        """Start the worker processes and supervise them, until shutdown() is called or a KeyboardInterrupt occurs."""
+        log.info("prefork server on %s starting %d workers", self.locationStr, self.workers)
+        self.running = True
+        started = {}
+        try:
+            for _ in range(self.workers):
+                pid = self._startWorker()
+                started[pid] = time.time()
+            while self.running and self.pids:
+                exited = self._reapWorkers()
+                if not exited:
+                    time.sleep(self.poll_interval)
+                for pid, status in exited:
+                    if self.running:
+                        log.warning("worker %d exited with status %d, restarting it", pid, status)
+                        if time.time() - started.pop(pid, 0) < 1.0:
+                            time.sleep(1.0)     # don't restart a worker that keeps failing too quickly
+                        pid = self._startWorker()
+                        started[pid] = time.time()
+        except KeyboardInterrupt:
+            log.debug("stopping on break signal")
+        finally:
+            self.running = False
+            self._stopWorkers()
+
+    def shutdown(self):
+        """Stop the worker processes. The workers finish their request loop as if they got a KeyboardInterrupt."""
+        self.running = False
+        self._signalWorkers(signal.SIGINT)
+
+    def close(self):
+        """Release the reserved port."""
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+        self.close()
+
+    def _startWorker(self):
+        pid = os.fork()
+        if pid:
+            self.pids.add(pid)
+            log.debug("started worker %d", pid)
+            return pid
+        # in the worker process
+        status = 1
+        try:
+            signal.signal(signal.SIGINT, signal.default_int_handler)    # shutdown() stops a worker with a SIGINT
+            self.sock.close()
+            config.SOCK_REUSEPORT = True
+            daemon = core.Daemon(host=self.host, port=self.port, nathost=self.nathost, natport=self.natport)
+            with daemon:
+                self.setup(daemon)
+                daemon.requestLoop()
+            status = 0
+        except KeyboardInterrupt:
+            status = 0
+        except Exception:
+            log.exception("worker %d failed", os.getpid())
+        finally:
+            os._exit(status)
+
+    def _reapWorkers(self):
+        """
+        Reap the workers that have exited, returns a list of their (pid, status).
+        Only the workers are waited for, not any other child processes (that the setup function might have started, for instance).
+        """
+        exited = []
+        for pid in list(self.pids):
+            try:
+                wpid, status = os.waitpid(pid, os.WNOHANG)
+            except OSError as x:
+                if x.errno == errno.EINTR:
+                    continue
+                if x.errno != errno.ECHILD:
+                    raise
+                wpid, status = pid, 0     # already reaped by someone else
+            if wpid:
+                self.pids.discard(pid)
+                exited.append((pid, status))
+        return exited
+
+    def _signalWorkers(self, signum):
+        for pid in list(self.pids):
+            try:
+                os.kill(pid, signum)
+            except OSError:
+                self.pids.discard(pid)  # already gone
+
+    def _stopWorkers(self, timeout=5.0):
+        self._signalWorkers(signal.SIGINT)
+        deadline = time.time() + timeout
+        while self.pids and time.time() < deadline:
+            self._reapWorkers()
+            time.sleep(0.05)
+        if self.pids:
+            log.warning("killing %d workers that didn't stop in time", len(self.pids))
+            self._signalWorkers(signal.SIGKILL)
+            for pid in list(self.pids):
+                try:
+                    os.waitpid(pid, 0)
+                except OSError:
+                    pass
+            self.pids.clear()
+
+
+def _cpu_count():
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        return 2
@@ -0,0 +1,222 @@
+"""
+Tests for the asyncio proxy and server.
+
+Pyro - Python Remote Objects.  Copyright by Irmen de Jong (irmen@razorvine.net).
+"""
+
+from __future__ import print_function
+import sys
+import time
+import threading
+import unittest
+import Pyro4.core
+import Pyro4.errors
+from Pyro4.configuration import config
+
+if sys.version_info >= (3, 5):
+    import asyncio
+    import Pyro4.aio
+    from testsupport_aio import CoroutineThing, attachedLoopClient
+
+
+@Pyro4.expose
+class AioTestObject(object):
+    def __init__(self):
+        self.oneway_calls = 0
+
+    def multiply(self, x, y):
+        return x * y
+
+    def divide(self, x, y):
+        return x // y
+
+    def delayAndId(self, delay, id):
+        time.sleep(delay)
+        return "slept for " + str(id)
+
+    def generator(self):
+        yield "one"
+        yield "two"
+        yield "three"
+
+    @Pyro4.oneway
+    def oneway_call(self):
+        self.oneway_calls += 1
+
+    @property
+    def value(self):
+        return 42
+
+
+@unittest.skipUnless(sys.version_info >= (3, 5), "requires asyncio with async/await")
+class AsyncProxyTests(unittest.TestCase):
+    def setUp(self):
+        self.daemon = Pyro4.core.Daemon(port=0)
+        self.obj = AioTestObject()
+        self.uri = self.daemon.register(self.obj, "aiotest")
+        self.daemonthread = threading.Thread(target=self.daemon.requestLoop)
+        self.daemonthread.daemon = True
+        self.daemonthread.start()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+        self.daemon.shutdown()
+        self.daemonthread.join()
+
+    def run_coro(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def testCalls(self):
+        proxy = Pyro4.aio.AsyncProxy(self.uri)
+        self.assertTrue(self.run_coro(proxy._pyroBind()))
+        self.assertFalse(self.run_coro(proxy._pyroBind()))
+        self.assertIn("multiply", proxy._pyroMethods)
+        self.assertEqual(55, self.run_coro(proxy.multiply(5, 11)))
+        self.assertEqual(42, self.run_coro(proxy.value))
+        with self.assertRaises(ZeroDivisionError):
+            self.run_coro(proxy.divide(1, 0))
+        with self.assertRaises(AttributeError):
+            proxy.nonexisting()
+        self.assertIsNone(self.run_coro(proxy.oneway_call()))
+        self.assertEqual(4, self.run_coro(proxy.divide(8, 2)))
+        for _ in range(50):
+            if self.obj.oneway_calls:
+                break
+            time.sleep(0.02)    # the oneway call runs in another thread
+        self.assertEqual(1, self.obj.oneway_calls)
+        self.run_coro(proxy._pyroRelease())
+        self.assertIn("not connected", repr(proxy))
+        self.assertEqual(55, self.run_coro(proxy.multiply(5, 11)))   # reconnects
+        self.run_coro(proxy._pyroRelease())
+
+    def testConcurrentCalls(self):
+        proxy = Pyro4.aio.AsyncProxy(self.uri)
+        calls = [proxy.delayAndId(0.5 - i * 0.1, i) for i in range(5)]
+        start = time.time()
+        results = self.run_coro(asyncio.gather(*calls))
+        self.assertLess(time.time() - start, 0.9)
+        self.assertEqual(["slept for %d" % i for i in range(5)], results)
+        self.run_coro(proxy._pyroRelease())
+
+    def testStreamIteration(self):
+        proxy = Pyro4.aio.AsyncProxy(self.uri)
+        stream = self.run_coro(proxy.generator())
+        self.assertIs(stream, stream.__aiter__())
+        self.assertEqual("one", self.run_coro(stream.__anext__()))
+        self.assertEqual("two", self.run_coro(stream.__anext__()))
+        self.assertEqual("three", self.run_coro(stream.__anext__()))
+        with self.assertRaises(StopAsyncIteration):
+            self.run_coro(stream.__anext__())
+        stream = self.run_coro(proxy.generator())
+        self.assertEqual("one", self.run_coro(stream.__anext__()))
+        self.run_coro(stream.aclose())
+        with self.assertRaises(StopAsyncIteration):
+            self.run_coro(stream.__anext__())
+        self.run_coro(proxy._pyroRelease())
+
+    def testTimeout(self):
+        proxy = Pyro4.aio.AsyncProxy(self.uri)
+        proxy._pyroTimeout = 0.2
+        with self.assertRaises(Pyro4.errors.TimeoutError):
+            self.run_coro(proxy.delayAndId(0.5, 1))
+        # the connection is still usable, the late response is ignored
+        self.assertEqual(55, self.run_coro(proxy.multiply(5, 11)))
+        self.run_coro(proxy._pyroRelease())
+
+    def testConnectFail(self):
+        proxy = Pyro4.aio.AsyncProxy("PYRO:aiotest@localhost:1")
+        with self.assertRaises(Pyro4.errors.CommunicationError):
+            self.run_coro(proxy.multiply(5, 11))
+
+
+@unittest.skipUnless(sys.version_info >= (3, 5), "requires asyncio with async/await")
+class AsyncioServerTests(unittest.TestCase):
+    def setUp(self):
+        config.SERVERTYPE = "asyncio"
+        self.daemon = Pyro4.core.Daemon(port=0)
+        self.obj = CoroutineThing()
+        self.uri = self.daemon.register(self.obj, "coroutines")
+
+    def tearDown(self):
+        config.SERVERTYPE = "thread"
+        self.daemon.close()
+
+    def runDaemon(self):
+        thread = threading.Thread(target=self.daemon.requestLoop)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def testCoroutineMethods(self):
+        thread = self.runDaemon()
+        with Pyro4.core.Proxy(self.uri) as p:
+            self.assertEqual("blocking", p.blocking("blocking"))
+            self.assertEqual(55, p.multiply(5, 11))
+            self.assertEqual(["one", "two"], list(p.iterator()))
+            with self.assertRaises(ValueError) as x:
+                p.fail()
+            self.assertEqual("coroutine failed", str(x.exception))
+            p.oneway_call()
+            self.assertEqual(55, p.multiply(5, 11))
+            self.assertEqual(1, self.obj.oneway_calls)
+            seq, seq_after_await = p.seq()
+            self.assertEqual(seq, seq_after_await)
+        self.daemon.shutdown()
+        thread.join()
+
+    def testCoroutineResponseAnnotations(self):
+        class HalgProxy(Pyro4.core.Proxy):
+            def _pyroAnnotations(self):
+                return {"HALG": b"sha256"}
+
+        self.daemon._pyroHmacKey = b"secret"
+        thread = self.runDaemon()
+        with HalgProxy(self.uri) as p:
+            p._pyroHmacKey = b"secret"
+            p._pyroFlowControl = True
+            self.assertEqual(55, p.multiply(5, 11))
+            annotations = Pyro4.core.current_context.response_annotations
+            self.assertEqual(str(config.ONEWAY_CREDITS).encode(), bytes(annotations["CRED"]))
+            self.assertEqual(b"sha256", bytes(annotations["HALG"]))
+        self.daemon.shutdown()
+        thread.join()
+
+    def testConcurrentCoroutines(self):
+        thread = self.runDaemon()
+        proxy = Pyro4.core.Proxy(self.uri)
+        proxy._pyroPipelined = True
+        results = []
+        threads = [threading.Thread(target=lambda i=i: results.append(proxy.delayAndId(0.5, i))) for i in range(10)]
+        start = time.time()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertLess(time.time() - start, 0.9)
+        self.assertEqual(["slept for %d" % i for i in range(10)], sorted(results))
+        proxy._pyroRelease()
+        self.daemon.shutdown()
+        thread.join()
+
+    def testAttachLoop(self):
+        loop = asyncio.new_event_loop()
+        self.daemon.attachLoop(loop)
+        with self.assertRaises(Pyro4.errors.PyroError):
+            self.daemon.attachLoop(loop)
+        results, connections = loop.run_until_complete(attachedLoopClient(self.daemon, self.uri))
+        self.assertEqual([55, 42], results)
+        self.assertEqual([1, 0], connections, "the client should be disconnected when the daemon shuts down")
+        loop.close()
+
+    def testAttachLoopWrongServertype(self):
+        config.SERVERTYPE = "thread"
+        with Pyro4.core.Daemon(port=0) as daemon:
+            with self.assertRaises(Pyro4.errors.PyroError):
+                daemon.attachLoop(None)
+
+
+if __name__ == "__main__":
+    unittest.main()
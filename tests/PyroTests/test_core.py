@@ -14,6 +14,7 @@ import uuid
 import socket
 import unittest
 import warnings
+import weakref
 import Pyro4.core
 import Pyro4.errors
 import Pyro4.constants
@@ -478,7 +479,8 @@ class CoreTests(unittest.TestCase):
         old_dir_method = getattr(Pyro4.core.Proxy, '__dir__')
         try:
             delattr(Pyro4.core.Proxy, '__dir__')
-            self.assertEqual(dir_result, dir(p))
+            # (except for the remote methods that other proxies put on the class)
+            self.assertEqual(dir_result, [name for name in dir(p) if name not in Pyro4.core._remoteMethodDescriptors])
         finally:
             setattr(Pyro4.core.Proxy, '__dir__', old_dir_method)
         p._pyroRelease()
@@ -513,6 +515,45 @@ class CoreTests(unittest.TestCase):
         p1._pyroRelease()
         p2._pyroRelease()
 
+    def testProxyRemoteMethodNoCycle(self):
+        # the remote method objects refer to the proxy, the proxy must not refer to them (that would be a reference cycle)
+        p = Pyro4.core.Proxy("PYRO:9999@localhost:15555")
+        p._pyroMethods = {"method"}
+        method = p.method
+        self.assertIsNot(method, p.method)
+        proxy_ref = weakref.ref(p)
+        del p
+        self.assertIsNotNone(proxy_ref())
+        del method
+        self.assertIsNone(proxy_ref())
+
+    def testProxyRemoteMethodDescriptor(self):
+        p = Pyro4.core.Proxy("PYRO:9999@localhost:15555")
+        p._Proxy__processMetadata({"methods": ["descriptormethod", "_private"], "oneway": [], "attrs": ["descriptorattr"]})
+        self.assertIsInstance(Pyro4.core.Proxy.__dict__["descriptormethod"], Pyro4.core._RemoteMethodDescriptor)
+        self.assertNotIn("_private", Pyro4.core.Proxy.__dict__)
+        self.assertNotIn("descriptorattr", Pyro4.core.Proxy.__dict__)
+        method = p.descriptormethod
+        self.assertIsInstance(method, Pyro4.core._RemoteMethod)
+        self.assertEqual("descriptormethod", method._RemoteMethod__name)
+        # other proxies don't get the method of this one
+        p2 = Pyro4.core.Proxy("PYRO:9999@localhost:15555")
+        p2._pyroMethods = {"othermethod"}
+        with self.assertRaises(AttributeError):
+            p2.descriptormethod
+        self.assertNotIn("descriptormethod", dir(p2))
+        self.assertIn("descriptormethod", dir(p))
+        # a proxy that overrides __getattr__ still gets its own result
+        class MyProxy(Pyro4.core.Proxy):
+            def __getattr__(self, name):
+                return "custom " + name
+        p3 = MyProxy("PYRO:9999@localhost:15555")
+        p3._pyroMethods = {"descriptormethod"}
+        self.assertEqual("custom descriptormethod", p3.descriptormethod)
+        p._pyroRelease()
+        p2._pyroRelease()
+        p3._pyroRelease()
+
     def testProxyWithStmt(self):
         class ConnectionMock(object):
             closeCalled = False
@@ -665,6 +706,36 @@ class CoreTests(unittest.TestCase):
         self.assertEqual(corr_id2, Pyro4.core.current_context.correlation_id)
         Pyro4.core.current_context.correlation_id = None
 
+    @unittest.skipUnless(hasattr(socket, "socketpair"), "requires socketpair")
+    def testConnectionPool(self):
+        location = (("localhost", 9999), None)
+        with Pyro4.core.ConnectionPool(max_idle=2, min_idle=1, idle_timeout=0.2) as pool:
+            self.assertIsNone(pool.checkout(location))
+            pairs = [socket.socketpair() for _ in range(3)]
+            conns = [Pyro4.socketutil.SocketConnection(s1) for s1, _ in pairs]
+            for conn in conns:
+                pool.checkin(location, conn)
+            self.assertEqual(2, pool.idleCount(location))  # the third one exceeded max_idle and is closed
+            self.assertEqual(-1, conns[2].sock.fileno())
+            self.assertIs(conns[1], pool.checkout(location))  # most recently used first
+            pool.checkin(location, conns[1])
+            pairs[1][1].close()  # the other side closes the connection
+            self.assertIs(conns[0], pool.checkout(location))  # so it's discarded
+            self.assertEqual(0, pool.idleCount())
+            pool.checkin(location, conns[0])
+            self.assertEqual(1, pool.idleCount())
+            time.sleep(0.3)
+            pool.evict()
+            self.assertEqual(1, pool.idleCount())  # min_idle connections are kept
+            proxy = pool.proxy("PYRO:object@localhost:9999")
+            self.assertIs(pool, proxy._pyroConnectionPool)
+            self.assertIs(pool, copy.copy(proxy)._pyroConnectionPool)
+            for _, s2 in pairs:
+                s2.close()
+        self.assertEqual(0, pool.idleCount())
+        self.assertEqual(-1, conns[0].sock.fileno())
+        self.assertRaises(ValueError, Pyro4.core.ConnectionPool, max_idle=1, min_idle=2)
+
 
 class ExposeDecoratorTests(unittest.TestCase):
     # note: the bulk of the tests for the @expose decorator are found in the test_util module
@@ -688,6 +759,28 @@ class ExposeDecoratorTests(unittest.TestCase):
             self.assertEqual(("session", None), TestClassTwo._pyroInstancing)
             self.assertEqual(("session", None), TestClassThree._pyroInstancing)
 
+    def testExposeExecutor(self):
+        @Pyro4.core.expose(executor="process")
+        class TestClass:
+            def method(self):
+                pass
+
+        class TestClass2:
+            @Pyro4.core.expose(executor="process")
+            def method(self):
+                pass
+
+            @Pyro4.core.expose
+            def method2(self):
+                pass
+        self.assertTrue(TestClass._pyroExposed)
+        self.assertEqual("process", TestClass.method._pyroExecutor)
+        self.assertTrue(TestClass2.method._pyroExposed)
+        self.assertEqual("process", TestClass2.method._pyroExecutor)
+        self.assertFalse(hasattr(TestClass2.method2, "_pyroExecutor"))
+        with self.assertRaises(ValueError):
+            Pyro4.core.expose(executor="gpu")
+
 
 class BehaviorDecoratorTests(unittest.TestCase):
     def testBehaviorInstancemodeInvalid(self):
@@ -7,6 +7,7 @@ Pyro - Python Remote Objects.  Copyright by Irmen de Jong (irmen@razorvine.net).
 from __future__ import print_function
 import sys
 import time
+import threading
 import socket
 import uuid
 import unittest
@@ -47,10 +48,12 @@ class DaemonTests(unittest.TestCase):
     def setUp(self):
         config.POLLTIMEOUT = 0.1
 
-    def sendHandshakeMessage(self, conn, correlation_id=None):
+    def sendHandshakeMessage(self, conn, correlation_id=None, annotations=None):
         ser = Pyro4.util.get_serializer_by_id(Pyro4.util.MarshalSerializer.serializer_id)
         data, _ = ser.serializeData({"handshake": "hello", "object": Pyro4.constants.DAEMON_NAME}, False)
-        annotations = {"CORR": correlation_id.bytes} if correlation_id else None
+        annotations = dict(annotations or {})
+        if correlation_id:
+            annotations["CORR"] = correlation_id.bytes
         msg = Pyro4.message.Message(Pyro4.message.MSG_CONNECT, data, Pyro4.util.MarshalSerializer.serializer_id, 0, 99, annotations=annotations)
         msg.send(conn)
 
@@ -182,6 +185,16 @@ class DaemonTests(unittest.TestCase):
             self.assertTrue(len(d.sockets) == 1, "daemon without connections should have just 1 socket")
         config.SERVERTYPE = old_servertype
 
+    @unittest.skipUnless(sys.version_info >= (3, 5), "requires asyncio with async/await")
+    def testServertypeAsyncio(self):
+        old_servertype = config.SERVERTYPE
+        config.SERVERTYPE = "asyncio"
+        with Pyro4.core.Daemon(port=0) as d:
+            self.assertIn(d.sock, d.sockets, "daemon's socketlist should contain the server socket")
+            self.assertTrue(len(d.sockets) == 1, "daemon without connections should have just 1 socket")
+            self.assertRaises(TypeError, lambda: d.selector)
+        config.SERVERTYPE = old_servertype
+
     def testServertypeFoobar(self):
         old_servertype = config.SERVERTYPE
         config.SERVERTYPE = "foobar"
@@ -413,6 +426,51 @@ class DaemonTests(unittest.TestCase):
             self.assertEqual(Pyro4.message.MSG_CONNECTOK, msg.type)
             self.assertEqual(99, msg.seq)
 
+    def testCompressionNegotiation(self):
+        config.COMPRESSION = True
+        config.COMPRESSION_CODEC = "lzma"
+        try:
+            with Pyro4.core.Daemon(port=0) as d:
+                conn = ConnectionMock()
+                self.sendHandshakeMessage(conn)     # a client that doesn't say which codecs it has
+                self.assertTrue(d._handshake(conn))
+                Pyro4.message.Message.recv(conn, hmac_key=d._pyroHmacKey)
+                self.assertEqual({"zlib"}, conn.compressionCodecs)
+                self.assertEqual("zlib", Pyro4.core._compression(conn).name)
+                conn = ConnectionMock()
+                self.sendHandshakeMessage(conn, annotations={"CMPA": b"bz2,lzma,zlib"})
+                self.assertTrue(d._handshake(conn))
+                Pyro4.message.Message.recv(conn, hmac_key=d._pyroHmacKey)
+                self.assertEqual("lzma", Pyro4.core._compression(conn).name)
+                bz2 = Pyro4.util.get_compressor("bz2")
+                self.assertIs(bz2, Pyro4.core._compression(conn, bz2))   # the codec of the request
+            self.assertIs(True, Pyro4.core._compression(ConnectionMock()))    # client side: the configured codec
+        finally:
+            config.COMPRESSION = False
+            config.COMPRESSION_CODEC = "zlib"
+
+    def testSerializerNegotiation(self):
+        with Pyro4.core.Daemon(port=0) as d:
+            self.assertEqual("marshal", d._negotiateSerializer(["pickle", "foobar", "marshal", "serpent"]))
+            self.assertIsNone(d._negotiateSerializer(["pickle", "foobar"]))
+            config.SERIALIZERS_PREFERRED = ["serpent", "json", "marshal"]
+            try:
+                self.assertEqual("serpent", d._negotiateSerializer(["marshal", "serpent", "json"]))   # best combined rank
+                self.assertEqual("marshal", d._negotiateSerializer(["marshal", "json", "serpent"]))   # tie: the client decides
+                self.assertEqual("json", d._negotiateSerializer(["json"]))
+            finally:
+                config.SERIALIZERS_PREFERRED = []
+            conn = ConnectionMock()
+            self.sendHandshakeMessage(conn, annotations={"SERP": b"pickle,json,serpent"})
+            self.assertTrue(d._handshake(conn))
+            msg = Pyro4.message.Message.recv(conn, hmac_key=d._pyroHmacKey)
+            self.assertEqual(Pyro4.message.MSG_CONNECTOK, msg.type)
+            self.assertEqual(b"json", msg.annotations["SERP"])
+            self.sendHandshakeMessage(conn)
+            self.assertTrue(d._handshake(conn))
+            msg = Pyro4.message.Message.recv(conn, hmac_key=d._pyroHmacKey)
+            self.assertNotIn("SERP", msg.annotations)
+
     def testHandshakeDenied(self):
         class HandshakeFailDaemon(Pyro4.core.Daemon):
             def validateHandshake(self, conn, data):
@@ -435,6 +493,28 @@ class DaemonTests(unittest.TestCase):
             self.assertEqual(99, msg.seq)
             self.assertTrue(b"no way, handshake denied" in msg.data)
 
+    def testResponseCorrelationId(self):
+        class CorrelationDaemon(Pyro4.core.Daemon):
+            def validateHandshake(self, conn, data):
+                return str(current_context.correlation_id)
+        conn = ConnectionMock()
+        with Pyro4.core.Daemon(port=0) as d:
+            self.sendHandshakeMessage(conn)
+            d._handshake(conn)
+            msg = Pyro4.message.Message.recv(conn, hmac_key=d._pyroHmacKey)
+            self.assertNotIn("CORR", msg.annotations)   # no id was sent or used, none is created
+            corr_id = uuid.uuid4()
+            self.sendHandshakeMessage(conn, correlation_id=corr_id)
+            d._handshake(conn)
+            msg = Pyro4.message.Message.recv(conn, hmac_key=d._pyroHmacKey)
+            self.assertEqual(corr_id.bytes, msg.annotations["CORR"])
+        with CorrelationDaemon(port=0) as d:
+            self.sendHandshakeMessage(conn)
+            d._handshake(conn)
+            msg = Pyro4.message.Message.recv(conn, hmac_key=d._pyroHmacKey)
+            ser = Pyro4.util.get_serializer_by_id(msg.serializer_id)
+            self.assertEqual(str(uuid.UUID(bytes=msg.annotations["CORR"])), ser.deserializeData(msg.data))
+
     def testCustomHandshake(self):
         conn = ConnectionMock()
         class CustomHandshakeDaemon(Pyro4.core.Daemon):
@@ -452,13 +532,221 @@ class DaemonTests(unittest.TestCase):
             msg = Pyro4.message.Message.recv(conn, hmac_key=d._pyroHmacKey)
             self.assertEqual(Pyro4.message.MSG_CONNECTOK, msg.type)
             self.assertEqual(99, msg.seq)
-            self.assertEqual(2, len(msg.annotations))
+            self.assertEqual(3, len(msg.annotations))
             self.assertEqual(corr_id.bytes, msg.annotations["CORR"])
             self.assertEqual(b"custom annotation set by daemon", msg.annotations["XYZZ"])
+            self.assertIn("STRM", msg.annotations)
             ser = Pyro4.util.get_serializer_by_id(msg.serializer_id)
             data = ser.deserializeData(msg.data, msg.flags & Pyro4.message.FLAGS_COMPRESSED)
             self.assertEqual(["sure", "have", "fun"], data)
 
+    def testStreamLifecycle(self):
+        orig_lifetime = config.ITER_STREAM_LIFETIME
+        orig_linger = config.ITER_STREAM_LINGER
+        orig_limit = config.ITER_STREAM_CLIENT_LIMIT
+        try:
+            config.ITER_STREAM_LIFETIME = 0.2
+            config.ITER_STREAM_LINGER = 10
+            config.ITER_STREAM_CLIENT_LIMIT = 2
+            with Pyro4.core.Daemon(port=0) as d:
+                conn1 = ConnectionMock()
+                conn2 = ConnectionMock()
+                _, stream1 = d._streamResponse(iter([1, 2]), conn1)
+                _, stream2 = d._streamResponse(iter([3, 4]), conn1)
+                with self.assertRaises(PyroError) as x:
+                    d._streamResponse(iter([5, 6]), conn1)
+                self.assertIn("too many", str(x.exception))
+                _, stream3 = d._streamResponse(iter([5, 6]), conn2)
+                self.assertEqual({"streams": 3, "lingering": 0, "clients": 2, "created": 3, "expired": 0}, d.streamStats())
+                d._clientDisconnect(conn1)
+                self.assertEqual({"streams": 3, "lingering": 2, "clients": 1, "created": 3, "expired": 0}, d.streamStats())
+                d._getStream(stream1, conn2)    # a lingering stream is resumed by the new client
+                self.assertEqual({"streams": 3, "lingering": 1, "clients": 1, "created": 3, "expired": 0}, d.streamStats())
+                d._removeStream(stream2)
+                self.assertEqual({"streams": 2, "lingering": 0, "clients": 1, "created": 3, "expired": 0}, d.streamStats())
+                d._housekeeping()
+                self.assertEqual(2, d.streamStats()["streams"])
+                time.sleep(0.3)
+                d._housekeeping()
+                self.assertEqual({"streams": 0, "lingering": 0, "clients": 0, "created": 3, "expired": 2}, d.streamStats())
+                with self.assertRaises(PyroError):
+                    d._getStream(stream3, conn2)
+        finally:
+            config.ITER_STREAM_LIFETIME = orig_lifetime
+            config.ITER_STREAM_LINGER = orig_linger
+            config.ITER_STREAM_CLIENT_LIMIT = orig_limit
+
+    def testResolveMethod(self):
+        class Thing(object):
+            @Pyro4.core.expose
+            def exposed(self, x):
+                return x + 1
+
+            @Pyro4.core.expose
+            @Pyro4.core.callback
+            def called_back(self):
+                return "callback"
+
+            def unexposed(self):
+                return "unexposed"
+
+            def _private(self):
+                return "private"
+
+        with Pyro4.core.Daemon(port=0) as d:
+            thing = Thing()
+            method, isCallback = d._resolveMethod(thing, "exposed")
+            self.assertEqual(43, method(42))
+            self.assertFalse(isCallback)
+            self.assertIn("exposed", d._dispatchTables[Thing])
+            method, isCallback = d._resolveMethod(thing, "called_back")
+            self.assertEqual("callback", method())
+            self.assertTrue(isCallback)
+            with self.assertRaises(AttributeError):
+                d._resolveMethod(thing, "unexposed")
+            with self.assertRaises(AttributeError):
+                d._resolveMethod(thing, "_private")
+            with self.assertRaises(AttributeError):
+                d._resolveMethod(thing, "nonexisting")
+            self.assertEqual({"exposed", "called_back"}, set(d._dispatchTables[Thing]))  # other names aren't stored
+            thing.exposed = lambda x: x * 2     # an instance attribute takes precedence over the dispatch table
+            with self.assertRaises(AttributeError):
+                d._resolveMethod(thing, "exposed")
+            config.REQUIRE_EXPOSE = False
+            try:
+                method, _ = d._resolveMethod(thing, "unexposed")
+                self.assertEqual("unexposed", method())
+                method, _ = d._resolveMethod(thing, "exposed")
+                self.assertEqual(84, method(42))
+            finally:
+                config.REQUIRE_EXPOSE = True
+
+    def testChunkedResponse(self):
+        class Thing(object):
+            @Pyro4.core.expose
+            def items(self, count, broken=False):
+                return list(range(count)) + ([object()] if broken else [])
+
+        def call(daemon, vargs, flags):
+            ser = Pyro4.util.get_serializer("marshal")
+            data, _ = ser.serializeCall("thing", "items", vargs, {})
+            msg = Pyro4.message.Message(Pyro4.message.MSG_INVOKE, data, ser.serializer_id, flags, 42, hmac_key=daemon._pyroHmacKey)
+            conn = ConnectionMock(msg)
+            conn.peername = None
+            daemon.handleRequest(conn)
+            responses = []
+            while conn.received:
+                msg = Pyro4.message.Message.recv(conn, [Pyro4.message.MSG_RESULT], hmac_key=daemon._pyroHmacKey)
+                self.assertEqual(42, msg.seq)
+                responses.append((msg.flags & ~Pyro4.message.FLAGS_COMPRESSED, ser.deserializeData(msg.data, msg.compressor())))
+            return responses
+
+        config.RESULT_CHUNKSIZE = 10
+        try:
+            with Pyro4.core.Daemon(port=0) as d:
+                d.register(Thing(), "thing")
+                chunked = Pyro4.message.FLAGS_CHUNKED
+                self.assertEqual([(chunked, list(range(10))), (chunked, list(range(10, 20))), (0, list(range(20, 25)))],
+                                 call(d, (25,), chunked))
+                self.assertEqual([(chunked, list(range(10))), (0, list(range(10, 20)))], call(d, (20,), chunked))
+                self.assertEqual([(0, list(range(10)))], call(d, (10,), chunked))
+                self.assertEqual([(0, list(range(25)))], call(d, (25,), 0))    # the client doesn't accept chunks
+                responses = call(d, (15, True), chunked)   # the second chunk can't be serialized
+                self.assertEqual(2, len(responses))
+                self.assertEqual((chunked, list(range(10))), responses[0])
+                self.assertEqual(Pyro4.message.FLAGS_EXCEPTION, responses[1][0])
+                self.assertIsInstance(responses[1][1], Exception)
+                config.RESULT_CHUNKSIZE = 0
+                self.assertEqual([(0, list(range(25)))], call(d, (25,), chunked))
+        finally:
+            config.RESULT_CHUNKSIZE = 0
+
+    def testResponseAnnotationsPerClient(self):
+        class Thing(object):
+            @Pyro4.core.expose
+            def method(self):
+                return 42
+
+            @Pyro4.core.oneway
+            @Pyro4.core.expose
+            def oneway_method(self):
+                pass
+
+        def call(daemon, method, flags, annotations):
+            ser = Pyro4.util.get_serializer("marshal")
+            data, _ = ser.serializeCall("thing", method, (), {})
+            msg = Pyro4.message.Message(Pyro4.message.MSG_INVOKE, data, ser.serializer_id, flags, 42, annotations=annotations)
+            conn = ConnectionMock(msg)
+            conn.peername = None
+            daemon.handleRequest(conn)
+            if conn.received:
+                return Pyro4.message.Message.recv(conn, [Pyro4.message.MSG_RESULT]).annotations
+            return None
+
+        with Pyro4.core.Daemon(port=0) as d:
+            d.register(Thing(), "thing")
+            # client A: a flow controlled oneway call with a custom hmac algorithm; it gets no response
+            self.assertIsNone(call(d, "oneway_method", Pyro4.message.FLAGS_ONEWAY, {"CRED": b"", "HALG": b"sha256"}))
+            # client B, served by the same thread, mustn't get the credits or the hmac algorithm of client A
+            annotations = call(d, "method", 0, {})
+            self.assertNotIn("CRED", annotations)
+            self.assertNotIn("HALG", annotations)
+            annotations = call(d, "method", 0, {"CRED": b""})
+            self.assertIn("CRED", annotations)
+
+    def testLazyCorrelationId(self):
+        corr_id = uuid.uuid4()
+        current_context._received({"CORR": corr_id.bytes})
+        self.assertEqual(corr_id, current_context.correlation_id)
+        current_context._received({})
+        corr_id = current_context.correlation_id
+        self.assertIsInstance(corr_id, uuid.UUID)
+        self.assertEqual(corr_id, current_context.correlation_id)
+        self.assertEqual(corr_id, current_context.to_global()["correlation_id"])
+        current_context.correlation_id = None
+        self.assertIsNone(current_context.correlation_id)
+
+    def testOnewayOverflowConfig(self):
+        config.ONEWAY_OVERFLOW = "foobar"
+        try:
+            with self.assertRaises(ValueError):
+                Pyro4.core.Daemon(port=0)
+        finally:
+            config.ONEWAY_OVERFLOW = "block"
+
+    def testPipelinedExecutorBounded(self):
+        config.THREADPOOL_SIZE = 2
+        executor = Pyro4.core._PipelinedExecutor()
+        release = threading.Event()
+        submitted = []
+
+        def submitCalls():
+            for i in range(5):
+                executor.submit(release.wait, (), {}, "client")
+                submitted.append(i)
+        try:
+            submitter = threading.Thread(target=submitCalls)
+            submitter.start()
+            time.sleep(0.3)
+            stats = executor.stats()
+            self.assertEqual(2, stats["workers"])
+            self.assertEqual(2, stats["queue_depth"])
+            self.assertEqual(4, len(submitted), "the last call should wait until there's room in the queue")
+            release.set()
+            submitter.join()
+            self.assertEqual(5, len(submitted))
+            for _ in range(50):
+                if executor.stats()["processed"] == 5:
+                    break
+                time.sleep(0.02)
+            stats = executor.stats()
+            self.assertEqual(5, stats["processed"])
+            self.assertEqual(2, stats["workers"], "the worker threads should be reused")
+        finally:
+            config.THREADPOOL_SIZE = 40
+            release.set()
+            executor.close()
+
     def testNAT(self):
         with Pyro4.core.Daemon() as d:
             self.assertIsNone(d.natLocationStr)
@@ -662,7 +950,7 @@ class MetaInfoTests(unittest.TestCase):
             daemon_obj = d.objectsById[Pyro4.constants.DAEMON_NAME]
             self.assertTrue(len(daemon_obj.info()) > 10)
             meta = daemon_obj.get_metadata(Pyro4.constants.DAEMON_NAME)
-            self.assertEqual({"get_metadata", "get_next_stream_item", "close_stream",
+            self.assertEqual({"get_metadata", "get_next_stream_item", "get_next_stream_items", "close_stream",
                               "info", "ping", "registered"}, meta["methods"])
 
     def testMetaSerialization(self):
@@ -6,6 +6,7 @@ Pyro - Python Remote Objects.  Copyright by Irmen de Jong (irmen@razorvine.net).
 
 import hashlib
 import hmac
+import pickle
 import unittest
 import zlib
 import Pyro4.message
@@ -122,6 +123,53 @@ class MessageTestsHmac(unittest.TestCase):
         self.assertEqual(b"abcde", msg.annotations["TEST"])
         self.assertIn("HMAC", msg.annotations)
 
+    def testToBuffers(self):
+        annotations = {"TEST": b"abcde", "XYZZ": b"12"}
+        msg = Message(Pyro4.message.MSG_INVOKE, b"hello" * 100, self.ser.serializer_id, 0, 0, annotations, b"secret")
+        buffers = msg.to_buffers()
+        self.assertEqual(1 + 2 * 3 + 1, len(buffers))
+        self.assertIs(msg.data, buffers[-1])
+        self.assertEqual(msg.to_bytes(), b"".join(buffers))
+
+    def testSendVectored(self):
+        class VectoredConnectionMock(ConnectionMock):
+            def sendv(self, buffers):
+                self.buffers = buffers
+                self.received += b"".join(buffers)
+        msg = Message(Pyro4.message.MSG_INVOKE, b"hello", self.ser.serializer_id, 0, 0, {"TEST": b"abcde"}, b"secret")
+        c = VectoredConnectionMock()
+        msg.send(c)
+        self.assertIs(msg.data, c.buffers[-1])
+        msg = Message.recv(c, hmac_key=b"secret")
+        self.assertEqual(b"hello", msg.data)
+        self.assertEqual(b"abcde", msg.annotations["TEST"])
+        c = ConnectionMock()
+        Message(Pyro4.message.MSG_INVOKE, b"hello", self.ser.serializer_id, 0, 0).send(c)
+        self.assertEqual(b"hello", Message.recv(c).data)
+
+    def testRecvIntoPooledBuffer(self):
+        class RecvIntoConnectionMock(ConnectionMock):
+            def recv_into(self, buffer, size=None):
+                view = memoryview(buffer)
+                size = size or len(view)
+                view[:size] = self.recv(size)
+                return size
+        data = b"x" * 100000
+        msg = Message(Pyro4.message.MSG_RESULT, data, self.ser.serializer_id, 0, 0, {"TEST": b"abcde"}, b"secret")
+        c = RecvIntoConnectionMock(msg)
+        msg = Message.recv(c, hmac_key=b"secret")
+        self.assertIsInstance(msg.data, memoryview)
+        self.assertEqual(data, msg.data)
+        self.assertIsNotNone(msg.recv_buffer)
+        msg.release_buffer()
+        self.assertIsNone(msg.recv_buffer)
+        self.assertEqual(b"", msg.data)
+        # small messages don't use a pooled buffer
+        c = RecvIntoConnectionMock(Message(Pyro4.message.MSG_RESULT, b"hello", self.ser.serializer_id, 0, 0))
+        msg = Message.recv(c)
+        self.assertEqual(b"hello", msg.data)
+        self.assertIsNone(msg.recv_buffer)
+
     def testProtocolVersion(self):
         version = Pyro4.constants.PROTOCOL_VERSION
         Pyro4.constants.PROTOCOL_VERSION = 0  # fake invalid protocol version number
@@ -157,6 +205,44 @@ class MessageTestsHmac(unittest.TestCase):
         with self.assertRaises(TypeError):
             data.hmac()
 
+    def testHmacAlgorithms(self):
+        algorithms = ["sha1", "sha256", "blake2b", "blake2s"] if hasattr(hashlib, "blake2b") else ["sha1", "sha256"]
+        try:
+            for algorithm in algorithms:
+                config.HMAC_ALGORITHM = algorithm
+                msg = Message(Pyro4.message.MSG_RESULT, b"test", 42, 0, 1, annotations={"XYZZ": b"a"}, hmac_key=b"secret")
+                if algorithm == "sha1":
+                    self.assertNotIn("HALG", msg.annotations)
+                    self.assertEqual(pyrohmac(b"test", b"secret", msg.annotations), msg.annotations["HMAC"])
+                else:
+                    self.assertEqual(algorithm.encode(), msg.annotations["HALG"])
+                config.HMAC_ALGORITHM = "sha1"
+                # the receiving side uses the algorithm that the message names
+                c = ConnectionMock(msg.to_bytes())
+                received = Message.recv(c, hmac_key=b"secret")
+                self.assertEqual(b"test", received.data)
+                c = ConnectionMock(msg.to_bytes())
+                with self.assertRaises(Pyro4.errors.SecurityError):
+                    Message.recv(c, hmac_key=b"wrong key")
+            if hasattr(hashlib, "blake2b"):
+                msg = Message(Pyro4.message.MSG_RESULT, b"test", 42, 0, 1, annotations={"HALG": b"blake2b"}, hmac_key=b"k" * 100)
+                self.assertEqual(64, len(msg.annotations["HMAC"]))
+            with self.assertRaises(Pyro4.errors.SecurityError):
+                Message(Pyro4.message.MSG_RESULT, b"test", 42, 0, 1, annotations={"HALG": b"md4"}, hmac_key=b"secret")
+        finally:
+            config.HMAC_ALGORITHM = "sha1"
+
+    def testHmacStats(self):
+        Pyro4.message.hmacStats.reset()
+        msg = Message(Pyro4.message.MSG_RESULT, b"x" * 1000, 42, 0, 1, hmac_key=b"secret")
+        Message.recv(ConnectionMock(msg), hmac_key=b"secret")
+        stats = Pyro4.message.hmacStats.stats()
+        self.assertEqual(2, stats["count"])
+        self.assertEqual(2000, stats["bytes"])
+        self.assertGreater(stats["seconds"], 0.0)
+        Message(Pyro4.message.MSG_RESULT, b"x" * 1000, 42, 0, 1)
+        self.assertEqual(2, Pyro4.message.hmacStats.stats()["count"])
+
     def testSecureCompare(self):
         self.assertFalse(Pyro4.message.secure_compare("apple", "banana"))
         self.assertFalse(Pyro4.message.secure_compare(b"apple", b"banana"))
@@ -192,6 +278,127 @@ class MessageTestsHmac(unittest.TestCase):
         self.assertEqual(0, msg.flags)
         self.assertGreater(msg.data_size, data_size)
 
+    @unittest.skipIf(pickle.HIGHEST_PROTOCOL < 5, "out-of-band buffers require pickle protocol 5")
+    def testOutOfBandFrames(self):
+        data = Pyro4.util.OutOfBandData(b"stream", [memoryview(b"buffer1"), memoryview(bytearray(b"buf2"))])
+        msg = Message(Pyro4.message.MSG_INVOKE, data, 42, 0, 1, hmac_key=b"secret")
+        self.assertEqual(17, msg.data_size)
+        self.assertIn("OOBF", msg.annotations)
+        buffers = msg.to_buffers()
+        self.assertEqual([b"stream", b"buffer1", b"buf2"], [bytes(b) for b in buffers[-3:]])
+        self.assertEqual(b"".join(bytes(b) for b in buffers), msg.to_bytes())
+        received = Message.recv(ConnectionMock(msg), hmac_key=b"secret")
+        self.assertIsInstance(received.data, Pyro4.util.OutOfBandData)
+        self.assertEqual(b"stream", received.data.stream.tobytes())
+        self.assertEqual([b"buffer1", b"buf2"], [b.tobytes() for b in received.data.buffers])
+        self.assertFalse(any(b.readonly for b in received.data.buffers), "received without recv_into, still writable")
+        # received with recv_into: the buffers are writable, and not taken from the buffer pool
+        class RecvIntoConnectionMock(ConnectionMock):
+            def recv_into(self, buffer, size=None):
+                view = memoryview(buffer)
+                size = size or len(view)
+                view[:size] = self.recv(size)
+                return size
+        data = Pyro4.util.OutOfBandData(b"stream", [memoryview(b"x" * 100000)])
+        received = Message.recv(RecvIntoConnectionMock(Message(Pyro4.message.MSG_INVOKE, data, 42, 0, 1)))
+        self.assertIsNone(received.recv_buffer)
+        self.assertFalse(received.data.buffers[0].readonly)
+        self.assertEqual(b"x" * 100000, received.data.buffers[0])
+
+    def testFragments(self):
+        class ProgressConnectionMock(ConnectionMock):
+            def __init__(self, msg):
+                super(ProgressConnectionMock, self).__init__(msg)
+                self.progress = lambda *args: self.reports.append(args)
+                self.reports = []
+                self.closed = False
+
+            def close(self):
+                self.closed = True
+        data = bytes(bytearray(range(256))) * 10
+        config.FRAGMENT_SIZE = 1000
+        try:
+            msg = Message(Pyro4.message.MSG_RESULT, data, 42, Pyro4.message.FLAGS_COMPRESSED, 1,
+                          annotations={"XYZZ": b"custom"}, hmac_key=b"secret")
+            self.assertEqual(2560, msg.data_size)
+            self.assertEqual(msg.to_bytes(), b"".join(bytes(b) for b in msg.to_buffers()))
+            self.assertEqual(len(data) + 3 * Message.header_size + msg.annotations_size + 14, len(msg.to_bytes()))
+            connection = ProgressConnectionMock(msg)
+            received = Message.recv(connection, [Pyro4.message.MSG_RESULT], hmac_key=b"secret")
+            self.assertEqual(data, bytes(received.data))
+            self.assertEqual(2560, received.data_size)
+            self.assertEqual(Pyro4.message.FLAGS_COMPRESSED, received.flags)
+            self.assertEqual({"XYZZ", "HMAC"}, set(received.annotations))
+            self.assertEqual([("recv", 1000, 2560), ("recv", 2000, 2560), ("recv", 2560, 2560)], connection.reports)
+            # out-of-band frames are split over the fragments as well
+            oob = Pyro4.util.OutOfBandData(b"stream", [memoryview(b"x" * 1500), memoryview(b"y" * 700)])
+            received = Message.recv(ConnectionMock(Message(Pyro4.message.MSG_INVOKE, oob, 42, 0, 1)))
+            self.assertEqual(b"stream", received.data.stream.tobytes())
+            self.assertEqual([b"x" * 1500, b"y" * 700], [b.tobytes() for b in received.data.buffers])
+            # very large data is received in a memory mapped temporary file
+            config.FRAGMENT_SPOOL_MINSIZE = 2000
+            received = Message.recv(ConnectionMock(msg), hmac_key=b"secret")
+            self.assertEqual(data, bytes(received.data))
+            self.assertFalse(isinstance(received.data.obj, bytearray))
+            config.MAX_MESSAGE_SIZE = 2000
+            connection = ProgressConnectionMock(msg)
+            with self.assertRaises(Pyro4.errors.MessageTooLargeError):
+                Message.recv(connection, hmac_key=b"secret")    # (every fragment is smaller than the max size)
+            self.assertTrue(connection.closed)
+            self.assertEqual([], connection.reports)
+            config.MAX_MESSAGE_SIZE = 0
+            with self.assertRaises(Pyro4.errors.ConnectionClosedError):
+                Message.recv(ConnectionMock(msg.to_bytes()[:-600]), hmac_key=b"secret")    # the last fragment is missing
+        finally:
+            config.FRAGMENT_SIZE = 0
+            config.FRAGMENT_SPOOL_MINSIZE = 0
+            config.MAX_MESSAGE_SIZE = 0
+
+    def testCompressionCodec(self):
+        data = b"The quick brown fox jumps over the lazy dog."*10
+        msg = Message(Pyro4.message.MSG_INVOKE, data, 42, 0, 1)
+        self.assertIsNone(msg.compressor())
+        msg = Message(Pyro4.message.MSG_INVOKE, zlib.compress(data), 42, Pyro4.message.FLAGS_COMPRESSED, 1)
+        self.assertEqual("zlib", msg.compressor().name)
+        codec = Pyro4.util.get_compressor("bz2")
+        msg = Message(Pyro4.message.MSG_INVOKE, codec.compress(data), 42, Pyro4.message.FLAGS_COMPRESSED, 1,
+                      annotations={"CMPR": b"bz2"})
+        self.assertIs(codec, msg.compressor())
+        msg.decompress_if_needed()
+        self.assertEqual(data, msg.data)
+        msg = Message(Pyro4.message.MSG_INVOKE, data, 42, Pyro4.message.FLAGS_COMPRESSED, 1,
+                      annotations={"CMPR": b"foobar"})
+        with self.assertRaises(Pyro4.errors.SerializeError):
+            msg.compressor()
+        # a received codec name is only looked up, a level in it isn't parsed (or cached)
+        cached = dict(Pyro4.util._compressors_by_spec)
+        for name in [b"zlib:1", b"zlib:01", b"zlib:x", b"\xff"]:
+            msg = Message(Pyro4.message.MSG_INVOKE, data, 42, Pyro4.message.FLAGS_COMPRESSED, 1, annotations={"CMPR": name})
+            with self.assertRaises(Pyro4.errors.SerializeError):
+                msg.compressor()
+        self.assertEqual(cached, Pyro4.util._compressors_by_spec)
+
+    def testCompressionStream(self):
+        connection = ConnectionMock()
+        connection.compressionStream = Pyro4.util.CompressionStream()   # compresses and decompresses its own messages
+        sizes = []
+        for i in range(3):
+            data = b"{'method': 'get_customer', 'args': (%d,), 'kwargs': {'fields': ['name', 'address']}}" % i
+            msg = Message(Pyro4.message.MSG_INVOKE, data, 42, 0, i, annotations={"XYZZ": b"a"}, hmac_key=b"secret")
+            msg.send(connection)
+            sizes.append(len(connection.received))
+            msg = Message.recv(connection, hmac_key=b"secret")
+            self.assertEqual(data, msg.data)
+            self.assertEqual(0, msg.flags)
+            self.assertEqual({"XYZZ", "HMAC"}, set(msg.annotations))
+        self.assertLess(sizes[1], sizes[0] - 20)
+        self.assertLess(sizes[2], sizes[0] - 20)
+        msg = Message(Pyro4.message.MSG_INVOKE, b"data", 42, 0, 1)
+        msg.send(connection)
+        connection.compressionStream = None
+        with self.assertRaises(Pyro4.errors.ProtocolError):
+            Message.recv(connection)
+
 
 class MessageTestsNoHmac(unittest.TestCase):
     def testRecvNoAnnotations(self):
@@ -209,10 +416,8 @@ class MessageTestsNoHmac(unittest.TestCase):
         msg = Message(Pyro4.message.MSG_CONNECT, b"hello", 42, 0, 0)
         msg.data_size = 0x7fffffff  # still within 32 bits signed limits
         msg.to_bytes()
-        msg.data_size = 0x80000000  # overflow, Pyro has a 2 gigabyte message size limitation
-        with self.assertRaises(ValueError) as ex:
-            msg.to_bytes()
-        self.assertEqual("invalid message size (outside range 0..2Gb)", str(ex.exception))
+        msg.data_size = 0x80000000  # overflow, the data has to be sent in fragments of at most 2 gigabyte
+        self.assertIn(b"FRAG", msg.to_bytes())
         msg.data_size = -42
         with self.assertRaises(ValueError) as ex:
             msg.to_bytes()
@@ -0,0 +1,78 @@
+"""
+Tests for the prefork multi-process server.
+
+Pyro - Python Remote Objects.  Copyright by Irmen de Jong (irmen@razorvine.net).
+"""
+
+from __future__ import print_function
+import os
+import sys
+import time
+import socket
+import subprocess
+import threading
+import unittest
+import Pyro4.core
+from Pyro4.utils.prefork import PreforkServer
+
+
+@Pyro4.expose
+class Worker(object):
+    def pid(self):
+        return os.getpid()
+
+
+def setup(daemon):
+    daemon.register(Worker, "prefork.worker")
+
+
+@unittest.skipUnless(hasattr(os, "fork") and hasattr(socket, "SO_REUSEPORT"), "requires os.fork and SO_REUSEPORT")
+class PreforkTests(unittest.TestCase):
+    def setUp(self):
+        self.server = PreforkServer(setup, workers=3, host="127.0.0.1")
+        self.thread = threading.Thread(target=self.server.serve)
+        self.thread.daemon = True
+        self.thread.start()
+        time.sleep(0.5)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.close()
+
+    def testUri(self):
+        uri = self.server.uriFor("prefork.worker")
+        self.assertEqual("PYRO:prefork.worker@127.0.0.1:%d" % self.server.port, str(uri))
+        self.server.nathost = "example.com"
+        self.assertEqual("PYRO:prefork.worker@example.com:%d" % self.server.port, str(self.server.uriFor("prefork.worker")))
+        self.assertEqual(uri, self.server.uriFor("prefork.worker", nat=False))
+
+    def testWorkers(self):
+        self.assertEqual(3, len(self.server.pids))
+        uri = self.server.uriFor("prefork.worker")
+        pids = set()
+        for _ in range(30):
+            with Pyro4.core.Proxy(uri) as p:
+                pids.add(p.pid())
+        self.assertGreater(len(pids), 1)
+        self.assertTrue(pids <= self.server.pids)
+
+    def testRestartWorker(self):
+        victim = next(iter(self.server.pids))
+        os.kill(victim, 9)
+        time.sleep(1.5)     # a worker that dies young is restarted after a delay
+        self.assertNotIn(victim, self.server.pids)
+        self.assertEqual(3, len(self.server.pids))
+        with Pyro4.core.Proxy(self.server.uriFor("prefork.worker")) as p:
+            self.assertIn(p.pid(), self.server.pids)
+
+    def testOtherChildProcess(self):
+        # the server must only reap its workers, not other child processes
+        process = subprocess.Popen([sys.executable, "-c", "import sys; sys.exit(3)"])
+        time.sleep(1.0)
+        self.assertEqual(3, process.wait())
+        self.assertEqual(3, len(self.server.pids))
+
+
+if __name__ == "__main__":
+    unittest.main()
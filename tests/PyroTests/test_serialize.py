@@ -4,7 +4,9 @@ Tests for the data serializer.
 Pyro - Python Remote Objects.  Copyright by Irmen de Jong (irmen@razorvine.net).
 """
 
+import os
 import sys
+import array
 import collections
 import copy
 import pprint
@@ -13,6 +15,7 @@ import base64
 import unittest
 import serpent
 import math
+import struct
 import uuid
 import Pyro4.util
 import Pyro4.errors
@@ -888,6 +891,191 @@ class GenericTests(unittest.TestCase):
         self.assertTrue(math.isnan(s2[2]))
 
 
+class CompressionTests(unittest.TestCase):
+    def setUp(self):
+        self.ser = Pyro4.util.get_serializer("marshal")
+        self.data = "the quick brown fox jumps over the lazy dog. " * 100
+
+    def tearDown(self):
+        config.reset()
+        Pyro4.util.compressionPolicy.clear()
+
+    def testCodecs(self):
+        for spec in ["zlib", "zlib:1", "zlib:9", "bz2", "lzma:1"]:
+            codec = Pyro4.util.get_compressor(spec)
+            d, c = self.ser.serializeData(self.data, compress=spec)
+            self.assertIs(codec, c)
+            self.assertEqual(spec.partition(":")[0], c.name)
+            self.assertEqual(self.data, self.ser.deserializeData(d, compressed=c))
+        self.assertIs(Pyro4.util.get_compressor("zlib:9"), Pyro4.util.get_compressor("zlib:9"))
+        self.assertEqual(9, Pyro4.util.get_compressor("zlib:9").level)
+        with self.assertRaises(Pyro4.errors.SerializeError):
+            Pyro4.util.get_compressor("foobar")
+        with self.assertRaises(Pyro4.errors.SerializeError):
+            Pyro4.util.get_compressor("zlib:x")
+        self.assertIs(Pyro4.util.get_compressor("zlib"), Pyro4.util.get_compressor_by_name("zlib"))
+        with self.assertRaises(Pyro4.errors.SerializeError):
+            Pyro4.util.get_compressor_by_name("zlib:9")
+
+    def testConfiguredCodec(self):
+        config.COMPRESSION_CODEC = "bz2"
+        d, c = self.ser.serializeCall("object", "method", (self.data,), {}, compress=True)
+        self.assertEqual("bz2", c.name)
+        self.assertEqual(("object", "method", (self.data,), {}), self.ser.deserializeCall(d, compressed=c))
+        config.COMPRESSION_MINSIZE = 100000
+        d, c = self.ser.serializeCall("object", "method", (self.data,), {}, compress=True)
+        self.assertFalse(c)
+
+    @unittest.skipIf(sys.version_info < (3, 3), "zlib preset dictionaries require Python 3.3+")
+    def testZlibDictionary(self):
+        codec = Pyro4.util.ZlibCompressor(zdict=b"the quick brown fox jumps over the lazy dog. ", name="zlib-test")
+        Pyro4.util.register_compressor(codec)
+        config.COMPRESSION_MINSIZE = 0
+        try:
+            data = "the quick brown fox jumps over the lazy dog. quick!"
+            d, c = self.ser.serializeData(data, compress="zlib-test")
+            self.assertIs(codec, c)
+            self.assertLess(len(d), len(self.ser.serializeData(data, compress="zlib")[0]))
+            self.assertEqual(data, self.ser.deserializeData(d, compressed=Pyro4.util.get_compressor("zlib-test")))
+        finally:
+            del Pyro4.util._compressors["zlib-test"]
+            Pyro4.util._compressors_by_spec.clear()
+
+    def testAdaptive(self):
+        config.COMPRESSION_ADAPTIVE = True
+        policy = Pyro4.util.compressionPolicy
+        randomdata = os.urandom(1000)    # doesn't compress
+        d, c = self.ser.serializeCall("object", "random", (randomdata,), {}, compress=True)
+        self.assertFalse(c)
+        for _ in range(policy.probe_interval):
+            d, c = self.ser.serializeCall("object", "random", (randomdata,), {}, compress=True)
+            self.assertFalse(c)
+        self.assertEqual(policy.probe_interval, policy.skipped[("zlib", "random", len(d).bit_length())])
+        # other methods are still compressed
+        d, c = self.ser.serializeCall("object", "text", (self.data,), {}, compress=True)
+        self.assertTrue(c)
+        # results are recorded under the name of the method that returned them
+        d, c = self.ser.serializeData(randomdata, compress=True, method="random_result")
+        self.assertFalse(c)
+        self.assertEqual(0, policy.skipped[("zlib", "random_result", len(d).bit_length())])
+
+
+@unittest.skipIf(pickle.HIGHEST_PROTOCOL < 5, "out-of-band buffers require pickle protocol 5")
+class OutOfBandTests(unittest.TestCase):
+    def setUp(self):
+        config.PICKLE_OOB_MINSIZE = 1000
+        self.ser = Pyro4.util.get_serializer("pickle")
+
+    def tearDown(self):
+        config.reset()
+
+    def testOutOfBand(self):
+        big = bytearray(b"x" * 5000)
+        data, compressed = self.ser.serializeData({"big": pickle.PickleBuffer(big), "small": pickle.PickleBuffer(b"small")}, compress=True)
+        self.assertIsInstance(data, Pyro4.util.OutOfBandData)
+        self.assertFalse(compressed)
+        self.assertEqual(1, len(data.buffers))
+        self.assertEqual(5000, data.buffers[0].nbytes)
+        self.assertLess(len(data.stream), 200)
+        self.assertEqual(len(data.stream) + 5000, len(data))
+        big[0:1] = b"y"     # the buffer is not a copy
+        self.assertEqual(b"y", data.buffers[0][0:1].tobytes())
+        received = Pyro4.util.OutOfBandData.from_frames(memoryview(data.tobytes()), data.layout())
+        result = self.ser.deserializeData(received)
+        self.assertEqual(b"small", result["small"])
+        self.assertIsInstance(result["big"], memoryview)
+        self.assertEqual(b"y" + b"x" * 4999, result["big"].tobytes())
+        data, _ = self.ser.serializeCall("object", "method", (pickle.PickleBuffer(b"z" * 2000),), {})
+        self.assertIsInstance(data, Pyro4.util.OutOfBandData)
+        obj, method, vargs, kwargs = self.ser.deserializeCall(data)
+        self.assertEqual(b"z" * 2000, vargs[0].tobytes())
+
+    def testInBand(self):
+        data, _ = self.ser.serializeData([pickle.PickleBuffer(b"small")])
+        self.assertIs(bytes, type(data))
+        config.PICKLE_OOB_MINSIZE = 0
+        data, _ = self.ser.serializeData([pickle.PickleBuffer(b"x" * 5000)])
+        self.assertIs(bytes, type(data))
+        self.assertEqual([b"x" * 5000], self.ser.deserializeData(data))
+        config.PICKLE_OOB_MINSIZE = 1000
+        config.PICKLE_PROTOCOL_VERSION = 4
+        data, _ = self.ser.serializeData(["x" * 5000])
+        self.assertIs(bytes, type(data))
+
+    def testInvalidLayout(self):
+        with self.assertRaises(Pyro4.errors.ProtocolError):
+            Pyro4.util.OutOfBandData.from_frames(memoryview(b"abc"), b"\x00" * 7)
+        with self.assertRaises(Pyro4.errors.ProtocolError):
+            Pyro4.util.OutOfBandData.from_frames(memoryview(b"abc"), struct.pack("!Q", 4))
+
+
+class AttachmentTests(unittest.TestCase):
+    def setUp(self):
+        config.ATTACHMENT_MINSIZE = 1000
+
+    def tearDown(self):
+        config.reset()
+
+    @unittest.skipIf(sys.version_info < (3, 0), "sending attachments requires Python 3")
+    def testAttachments(self):
+        data = {"bytes": b"x" * 2000, "small": b"small", "nested": [(bytearray(b"y" * 1000), array.array("i", range(300)))],
+                "view": memoryview(b"z" * 5000), "text": "hello"}
+        for name in ["serpent", "json", "marshal"]:
+            ser = Pyro4.util.get_serializer(name)
+            if name == "json":
+                del data["small"]   # json can't serialize bytes
+            serialized, compressed = ser.serializeData(data, compress=True)
+            self.assertIsInstance(serialized, Pyro4.util.OutOfBandData)
+            self.assertFalse(compressed)
+            self.assertEqual([1000, 1200, 2000, 5000], sorted(b.nbytes for b in serialized.buffers))
+            self.assertLess(len(serialized.stream), 500)
+            received = Pyro4.util.OutOfBandData.from_frames(memoryview(serialized.tobytes()), serialized.layout())
+            result = ser.deserializeData(received)
+            self.assertEqual(b"x" * 2000, result["bytes"])
+            self.assertEqual(b"z" * 5000, result["view"])
+            self.assertEqual("hello", result["text"])
+            if "small" in data:
+                # small binary values are not attachments, but they're received as the same type
+                self.assertEqual(b"small", result["small"])
+                self.assertIs(type(result["bytes"]), type(result["small"]))
+            blob, numbers = result["nested"][0]
+            self.assertEqual(bytearray(b"y" * 1000), blob)
+            self.assertIs(bytearray, type(blob))
+            self.assertEqual(array.array("i", range(300)), numbers)
+            serialized, _ = ser.serializeCall("object", "method", (b"x" * 2000, 42), {"data": bytearray(1000)})
+            obj, method, vargs, kwargs = ser.deserializeCall(
+                Pyro4.util.OutOfBandData.from_frames(memoryview(serialized.tobytes()), serialized.layout()))
+            self.assertEqual("method", method)
+            self.assertEqual([b"x" * 2000, 42], list(vargs))
+            self.assertEqual({"data": bytearray(1000)}, kwargs)
+
+    def testNoAttachments(self):
+        ser = Pyro4.util.get_serializer("serpent")
+        data = {"small": [b"small"], "text": "x" * 2000}
+        serialized, _ = ser.serializeData(data)
+        self.assertIs(bytes, type(serialized))
+        config.ATTACHMENT_MINSIZE = 0
+        serialized, _ = ser.serializeData(b"x" * 2000)
+        self.assertIs(bytes, type(serialized))
+        config.ATTACHMENT_MINSIZE = 1000
+        ser = Pyro4.util.get_serializer("pickle")
+        serialized, _ = ser.serializeData(b"x" * 2000)
+        self.assertIs(bytes, type(serialized))
+        ser = Pyro4.util.get_serializer("serpent")
+        invalid = Pyro4.util.OutOfBandData(ser.dumps({"__class__": "Pyro4.attachment", "index": 1, "type": "bytes"}), [b""])
+        with self.assertRaises(Pyro4.errors.SerializeError):
+            ser.deserializeData(invalid)
+
+
+class SerializerRankingTests(unittest.TestCase):
+    def testRankSerializers(self):
+        self.assertEqual(["marshal", "serpent"], Pyro4.util.available_serializers(["foobar", "marshal", "serpent"]))
+        ranked = Pyro4.util.rank_serializers(["serpent", "foobar", "json", "marshal"], rounds=5)
+        self.assertEqual({"serpent", "json", "marshal"}, set(ranked))
+        ranked = Pyro4.util.rank_serializers(["serpent", "json", "marshal"], data={"blob": b"\x00\xff" * 10}, rounds=5)
+        self.assertEqual({"serpent", "marshal"}, set(ranked))  # json can't serialize bytes
+
+
 def mything_dict(obj):
     return {
         "__class__": "CUSTOM-Mythingymabob",
@@ -5,7 +5,9 @@ Pyro - Python Remote Objects.  Copyright by Irmen de Jong (irmen@razorvine.net).
 """
 
 from __future__ import print_function
+import os
 import time
+import socket
 import sys
 import threading
 import uuid
@@ -108,6 +110,48 @@ class ServerTestObject(object):
         return ServerTestObject()
 
 
+class ProcessExecutorTestObject(object):
+    def __init__(self):
+        self.value = 42
+
+    @Pyro4.core.expose(executor="process")
+    def inProcess(self, x):
+        self.value = 0
+        return [os.getpid(), 42 * x]
+
+    @Pyro4.core.expose
+    def multiply(self, x, y):
+        return x * y
+
+
+class SlotsProcessExecutorTestObject(ProcessExecutorTestObject):
+    __slots__ = ("name", "__secret")
+
+    def __init__(self, secret):
+        self.name = "slots"
+        self.__secret = secret
+
+    @Pyro4.core.expose(executor="process")
+    def state(self):
+        return [self.name, self.__secret, self.value]
+
+
+class UnpicklableProcessExecutorTestObject(ProcessExecutorTestObject):
+    def __init__(self):
+        self.lock = threading.Lock()
+
+
+@Pyro4.core.expose
+class StreamTestObject(object):
+    def numbers(self, count):
+        return iter(range(count))
+
+    def failing(self):
+        yield 1
+        yield 2
+        raise ValueError("generator failed")
+
+
 class NotEverythingExposedClass(object):
     def __init__(self, name):
         self.name = name
@@ -513,6 +557,29 @@ class ServerTestsOnce(unittest.TestCase):
             finally:
                 config.SERIALIZER = "serpent"
 
+    @unittest.skipUnless(sys.version_info >= (3, 2), "requires concurrent.futures")
+    def testProcessExecutor(self):
+        obj = ProcessExecutorTestObject()
+        with Pyro4.core.Proxy(self.daemon.register(obj)) as p:
+            pid, result = p.inProcess(2)
+            self.assertNotEqual(os.getpid(), pid)
+            self.assertEqual(84, result)
+            self.assertEqual(42, obj.value)   # the call ran on a copy
+            batch = Pyro4.core.batch(p)
+            batch.inProcess(1)
+            batch.multiply(2, 3)
+            results = list(batch())
+            self.assertEqual(42, results[0][1])
+            self.assertEqual(6, results[1])
+        obj = SlotsProcessExecutorTestObject("secret")
+        obj.value = 99      # (the base class has no slots, so there's a __dict__ too, which Pyro needs for its own attributes)
+        with Pyro4.core.Proxy(self.daemon.register(obj)) as p:
+            self.assertEqual(["slots", "secret", 99], p.state())
+        with Pyro4.core.Proxy(self.daemon.register(UnpicklableProcessExecutorTestObject())) as p:
+            with self.assertRaises(Pyro4.errors.SerializeError) as x:
+                p.inProcess(2)
+            self.assertIn("can't be copied", str(x.exception))
+
     def testBatchProxy(self):
         with Pyro4.core.Proxy(self.objectUri) as p:
             batch = Pyro4.core.batch(p)
@@ -755,6 +822,49 @@ class ServerTestsOnce(unittest.TestCase):
                 next(generator)
             generator.close()
 
+    def testStreamChunks(self):
+        with Pyro4.core.Proxy(self.daemon.register(StreamTestObject())) as p:
+            numbers = p.numbers(5000)
+            self.assertEqual(list(range(5000)), list(numbers))
+            self.assertGreater(numbers.chunk_size, 16)
+            with self.assertRaises(StopIteration):
+                next(numbers)
+            failing = p.failing()
+            self.assertEqual(1, next(failing))
+            self.assertEqual(2, next(failing))
+            with self.assertRaises(ValueError) as x:
+                next(failing)
+            self.assertEqual("generator failed", str(x.exception))
+            self.assertIn("generator failed", "".join(x.exception._pyroTraceback))
+            with self.assertRaises(StopIteration):
+                next(failing)
+            self.assertEqual(0, len(self.daemon.streaming_responses))
+            self.assertTrue(p._pyroConnection.streamChunks)
+            p._pyroConnection.streamChunks = False      # as if the daemon is from an older Pyro version
+            numbers = p.numbers(50)
+            self.assertEqual(list(range(50)), list(numbers))
+            self.assertEqual(1, numbers.chunk_size)
+            self.assertEqual(0, len(self.daemon.streaming_responses))
+
+    def testStreamCloseDeferred(self):
+        with Pyro4.core.Proxy(self.daemon.register(StreamTestObject())) as p:
+            numbers = p.numbers(10)
+            self.assertEqual(0, next(numbers))
+            self.assertEqual(1, len(self.daemon.streaming_responses))
+            numbers.close()
+            time.sleep(0.1)     # close_stream is a oneway call
+            self.assertEqual(0, len(self.daemon.streaming_responses))
+            numbers = p.numbers(10)
+            self.assertEqual(0, next(numbers))
+            other = p.numbers(10)     # the first stream is now out of sync with the proxy, as if it is closed during another call
+            numbers.close()
+            time.sleep(0.1)
+            self.assertEqual(2, len(self.daemon.streaming_responses))
+            self.assertEqual(0, next(other))    # this call closes the first stream
+            time.sleep(0.1)
+            self.assertEqual(1, len(self.daemon.streaming_responses))
+            other.close()
+
     def testCleanup(self):
         p1 = Pyro4.core.Proxy(self.objectUri)
         p2 = Pyro4.core.Proxy(self.objectUri)
@@ -956,6 +1066,193 @@ class ServerTestsThreadNoTimeout(unittest.TestCase):
         finally:
             config.ONEWAY_THREADED = True  # back to normal
 
+    def testOnewayQueue(self):
+        def waitForStats(busy, processed):
+            for _ in range(100):
+                stats = self.daemon.onewayStats()
+                if stats["busy"] == busy and stats["queue_depth"] == 0 and stats["processed"] == processed:
+                    return
+                time.sleep(0.02)
+            self.fail("oneway calls not processed in time: " + str(stats))
+        config.ONEWAY_THREADPOOL_SIZE = 1
+        config.ONEWAY_QUEUE_SIZE = 2
+        try:
+            with Pyro4.core.Proxy(self.objectUri) as p:
+                config.ONEWAY_OVERFLOW = "block"
+                p.oneway_delay(0.4)
+                waitForStats(1, 0)
+                now = time.time()
+                for _ in range(3):
+                    p.oneway_delay(0)
+                p.ping()
+                self.assertGreater(time.time() - now, 0.2, "the last oneway call should have waited for room in the queue")
+                self.assertEqual(1, self.daemon.onewayStats()["workers"])
+                waitForStats(0, 4)
+                config.ONEWAY_OVERFLOW = "drop"
+                p.oneway_delay(0.4)
+                waitForStats(1, 4)
+                for _ in range(4):
+                    p.oneway_delay(0)
+                p.ping()
+                stats = self.daemon.onewayStats()
+                self.assertEqual(2, stats["dropped"])
+                self.assertEqual(2, stats["queue_depth"])
+                self.assertEqual(1, stats["busy"])
+                config.ONEWAY_OVERFLOW = "reject"
+                p.oneway_delay(0)
+                p.ping()    # the call was rejected, but the client is still connected
+                self.assertEqual(1, self.daemon.onewayStats()["rejected"])
+                waitForStats(0, 7)
+                self.assertEqual(55, p.multiply(5, 11))
+        finally:
+            config.ONEWAY_THREADPOOL_SIZE = 40
+            config.ONEWAY_QUEUE_SIZE = 10000
+            config.ONEWAY_OVERFLOW = "block"
+
+    def testOnewayFlowControl(self):
+        config.ONEWAY_CREDITS = 3
+        try:
+            with Pyro4.core.Proxy(self.objectUri) as p:
+                p._pyroBind()
+                p._pyroFlowControl = True
+                p._pyroOneway.add("ping")   # asking for credits mustn't become a oneway call that needs a credit itself
+                now = time.time()
+                for _ in range(3):
+                    p.oneway_delay(0.3)
+                self.assertLess(time.time() - now, 0.2)
+                p.oneway_delay(0.3)     # must wait for credits
+                self.assertGreater(time.time() - now, 0.25)
+                p._pyroTimeout = 0.1
+                p.oneway_delay(0.3)
+                p.oneway_delay(0.3)
+                with self.assertRaises(Pyro4.errors.TimeoutError):
+                    p.oneway_delay(0.3)
+                p._pyroTimeout = None
+                batch = Pyro4.core.batch(p)
+                batch.multiply(5, 11)
+                self.assertIsNone(batch(oneway=True))   # waits for a credit as well
+                self.assertGreater(time.time() - now, 0.55)
+            with Pyro4.core.Proxy(self.objectUri) as p:
+                p._pyroFlowControl = True
+                p._pyroPipelined = True
+                for _ in range(4):
+                    p.oneway_delay(0.1)
+                self.assertEqual(55, p.multiply(5, 11))
+        finally:
+            config.ONEWAY_CREDITS = 100
+
+    def testCompressionCodec(self):
+        config.COMPRESSION = True
+        config.COMPRESSION_CODEC = "lzma"
+        try:
+            with Pyro4.core.Proxy(self.objectUri) as p:
+                data = "the quick brown fox jumps over the lazy dog. " * 100
+                self.assertEqual(data, p.echo(data))
+                self.assertEqual(b"lzma", Pyro4.core.current_context.response_annotations["CMPR"])
+                config.COMPRESSION_LOCAL = False    # it's a loopback connection
+                self.assertEqual(data, p.echo(data))
+                self.assertNotIn("CMPR", Pyro4.core.current_context.response_annotations)
+        finally:
+            config.COMPRESSION = False
+            config.COMPRESSION_CODEC = "zlib"
+            config.COMPRESSION_LOCAL = True
+
+    def testCompressionStream(self):
+        config.COMPRESSION = True
+        config.COMPRESSION_STREAM = True
+        try:
+            with Pyro4.core.Proxy(self.objectUri) as p:
+                data = {"name": "the quick brown fox", "items": list(range(20))}
+                for _ in range(5):
+                    self.assertEqual(data, p.echo(data))
+                # the asyncio server doesn't support compression streams, it declines the request
+                self.assertEqual(self.SERVERTYPE != "asyncio", p._pyroConnection.compressionStream is not None)
+                self.assertEqual(["one", "two", "three", "four", "five"], list(p.generator()))
+                batch = Pyro4.core.batch(p)
+                batch.multiply(5, 11)
+                batch.echo(data)
+                self.assertEqual([55, data], list(batch()))
+        finally:
+            config.COMPRESSION = False
+            config.COMPRESSION_STREAM = False
+
+    def testChunkedResult(self):
+        config.RESULT_CHUNKSIZE = 100
+        try:
+            with Pyro4.core.Proxy(self.objectUri) as p:
+                data = [{"number": i, "name": str(i)} for i in range(1050)]
+                self.assertEqual(data, p.echo(data))
+                self.assertEqual(tuple(range(500)), p.echo(tuple(range(500))))
+                self.assertEqual(list(range(100)), p.echo(list(range(100))))
+                self.assertEqual(55, p.multiply(5, 11))
+                self.assertEqual(["one", "two", "three", "four", "five"], list(p.generator()))
+                batch = Pyro4.core.batch(p)
+                batch.echo(data)
+                batch.multiply(5, 11)
+                self.assertEqual([data, 55], list(batch()))
+        finally:
+            config.RESULT_CHUNKSIZE = 0
+
+    def testChunkedResultError(self):
+        config.RESULT_CHUNKSIZE = 100
+        serializer = Pyro4.util.get_serializer(config.SERIALIZER)
+        try:
+            with Pyro4.core.Proxy(self.objectUri) as p:
+                self.assertEqual(55, p.multiply(5, 11))
+                connection = p._pyroConnection
+                chunks = []
+
+                def deserializeData(data, compressed=False):
+                    chunks.append(data)
+                    if len(chunks) == 2:
+                        raise ValueError("broken chunk")
+                    return Pyro4.util.SerializerBase.deserializeData(serializer, data, compressed)
+                serializer.deserializeData = deserializeData
+                with self.assertRaises(ValueError):
+                    p.echo(list(range(1050)))
+                del serializer.deserializeData
+                self.assertEqual(2, len(chunks))
+                # the remaining chunks have been read, the connection can still be used
+                self.assertIs(connection, p._pyroConnection)
+                self.assertEqual(55, p.multiply(5, 11))
+                self.assertEqual(list(range(1050)), p.echo(list(range(1050))))
+        finally:
+            config.RESULT_CHUNKSIZE = 0
+            serializer.__dict__.pop("deserializeData", None)
+
+    def testFragmentedMessages(self):
+        config.FRAGMENT_SIZE = 10000
+        try:
+            with Pyro4.core.Proxy(self.objectUri) as p:
+                reports = []
+                p._pyroProgress = lambda direction, done, total: reports.append((direction, done == total))
+                data = "x" * 50000
+                self.assertEqual(data, p.echo(data))
+                self.assertEqual(6, reports.count(("send", False)) + reports.count(("send", True)))
+                self.assertEqual([("send", True), ("recv", True)], [r for r in reports if r[1]])
+                del reports[:]
+                self.assertEqual(55, p.multiply(5, 11))
+                self.assertEqual([], reports)
+                config.FRAGMENT_SPOOL_MINSIZE = 20000
+                self.assertEqual([data, data], p.echo([data, data]))
+        finally:
+            config.FRAGMENT_SIZE = 0
+            config.FRAGMENT_SPOOL_MINSIZE = 0
+
+    def testSerializerNegotiation(self):
+        config.SERIALIZERS_PREFERRED = ["foobar", "marshal", "serpent"]
+        try:
+            with Pyro4.core.Proxy(self.objectUri) as p:
+                self.assertEqual(55, p.multiply(5, 11))
+                self.assertEqual("marshal", p._pyroConnection.serializer)  # foobar isn't available
+                self.assertEqual({"name": "x", "numbers": [1, 2]}, p.echo({"name": "x", "numbers": [1, 2]}))
+            with Pyro4.core.Proxy(self.objectUri) as p:
+                p._pyroSerializer = "json"     # a serializer that is set on the proxy is not negotiated
+                self.assertEqual(55, p.multiply(5, 11))
+                self.assertIsNone(p._pyroConnection.serializer)
+        finally:
+            config.SERIALIZERS_PREFERRED = []
+
     def testSerializeConnected(self):
         # online serialization tests
         ser = Pyro4.util.get_serializer(config.SERIALIZER)
@@ -1124,6 +1421,54 @@ class ServerTestsThreadNoTimeout(unittest.TestCase):
             # so 6 threads taking 0.5 seconds =~ 0.5 seconds passed
             self.assertTrue(0.4 < duration < 0.9)
 
+    def testPipelinedProxy(self):
+        results = {}
+
+        def call(proxy, delay, name):
+            results[name] = proxy.delayAndId(delay, name)
+
+        with Pyro4.core.Proxy(self.objectUri) as p:
+            p._pyroPipelined = True
+            p._pyroTimeout = 5.0
+            self.assertEqual(55, p.multiply(5, 11))
+            threads = [threading.Thread(target=call, args=(p, 0.5 - i * 0.1, "t%d" % i)) for i in range(5)]
+            start = time.time()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            duration = time.time() - start
+            # the calls are done concurrently over the single connection, and the responses arrive out of order
+            self.assertLess(duration, 0.9)
+            self.assertEqual({"t%d" % i: "slept for t%d" % i for i in range(5)}, results)
+            with self.assertRaises(ZeroDivisionError):
+                p.divide(1, 0)
+            self.assertEqual(4, p.divide(8, 2))
+
+    def testConnectionPool(self):
+        with Pyro4.core.ConnectionPool(max_idle=2) as pool:
+            with pool.proxy(self.objectUri) as p:
+                self.assertEqual(55, p.multiply(5, 11))
+                conn = p._pyroConnection
+            self.assertEqual(1, pool.idleCount())
+            with pool.proxy(self.objectUri) as p:
+                self.assertEqual(55, p.multiply(5, 11))
+                self.assertIs(conn, p._pyroConnection)  # borrowed the pooled connection
+                self.assertIn("multiply", p._pyroMethods)
+                self.assertEqual(0, pool.idleCount())
+                with pool.proxy(self.objectUri) as p2:
+                    self.assertEqual(10, p2.multiply(5, 2))
+                    self.assertIsNot(conn, p2._pyroConnection)
+            self.assertEqual(2, pool.idleCount())
+            with pool.proxy(self.objectUri) as p:
+                with self.assertRaises(ZeroDivisionError):
+                    p.divide(1, 0)
+                # a connection that had a communication error is not given back to the pool
+                p._pyroConnection.sock.shutdown(socket.SHUT_RDWR)
+                with self.assertRaises(Pyro4.errors.ConnectionClosedError):
+                    p.multiply(5, 11)
+            self.assertEqual(1, pool.idleCount())
+
     def testGeneratorProxyClose(self):
         p = Pyro4.core.Proxy(self.objectUri)
         generator = p.generator()
@@ -1141,6 +1486,7 @@ class ServerTestsThreadNoTimeout(unittest.TestCase):
             config.POLLTIMEOUT = 0.2
             p = Pyro4.core.Proxy(self.objectUri)
             generator = p.generator()
+            generator.max_chunk_size = 1    # don't fetch items ahead, they would still be available after the linger time
             self.assertEqual("one", next(generator))
             p._pyroRelease()
             with self.assertRaises(Pyro4.errors.ConnectionClosedError):
@@ -1188,6 +1534,46 @@ class ServerTestsMultiplexNoTimeout(ServerTestsThreadNoTimeout):
         pass
 
 
+class ServerTestsThreadRequestDispatch(ServerTestsThreadNoTimeout):
+    def setUp(self):
+        config.THREADPOOL_DISPATCH = "request"
+        config.THREADPOOL_SIZE = 8
+        super(ServerTestsThreadRequestDispatch, self).setUp()
+
+    def tearDown(self):
+        super(ServerTestsThreadRequestDispatch, self).tearDown()
+        config.THREADPOOL_DISPATCH = "connection"
+        config.THREADPOOL_SIZE = 40
+
+    def testMoreConnectionsThanWorkers(self):
+        proxies = [Pyro4.core.Proxy(self.objectUri) for _ in range(30)]
+        try:
+            for p in proxies:
+                p._pyroTimeout = 2.0
+                p._pyroBind()
+            time.sleep(0.1)   # the last connection is handed back to the selector asynchronously
+            self.assertEqual(32, len(self.daemon.sockets), "server socket, wakeup socket and 30 idle connections")
+            self.assertLessEqual(self.daemon.transportServer.pool.num_workers(), 8)
+            for p in proxies:
+                self.assertEqual(6, p.multiply(2, 3))
+            results = []
+            threads = [threading.Thread(target=lambda p=p: results.append(p.delayAndId(0.2, "x"))) for p in proxies]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertEqual(["slept for x"] * 30, results)
+        finally:
+            for p in proxies:
+                p._pyroRelease()
+
+
+@unittest.skipUnless(sys.version_info >= (3, 5), "requires asyncio with async/await")
+class ServerTestsAsyncioNoTimeout(ServerTestsThreadNoTimeout):
+    SERVERTYPE = "asyncio"
+    COMMTIMEOUT = None
+
+
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
     unittest.main()
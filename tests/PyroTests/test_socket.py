@@ -19,6 +19,7 @@ except ImportError:
 import Pyro4.socketutil as SU
 import Pyro4.util
 import Pyro4.constants
+import Pyro4.message
 from Pyro4.configuration import config
 from Pyro4 import errors
 from Pyro4.socketserver.multiplexserver import SocketServer_Multiplex
@@ -211,6 +212,17 @@ class TestSocketutil(unittest.TestCase):
         bs.close()
         self.assertRaises(ValueError, SU.createSocket, bind=('::1', 12345), connect=('::1', 1234))
 
+    @unittest.skipUnless(hasattr(socket, "SO_REUSEPORT"), "SO_REUSEPORT required")
+    def testCreateReusePortSockets(self):
+        s1 = SU.createSocket(bind=('127.0.0.1', 0), reuseport=True)
+        port = s1.getsockname()[1]
+        s2 = SU.createSocket(bind=('127.0.0.1', port), reuseport=True)
+        self.assertEqual(port, s2.getsockname()[1])
+        self.assertEqual(1, s2.getsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT))
+        s2.close()
+        self.assertRaises(socket.error, SU.createSocket, bind=('127.0.0.1', port))
+        s1.close()
+
     @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "unix domain sockets required")
     def testCreateBoundUnixSockets(self):
         SOCKNAME = "test_unixsocket"
@@ -255,6 +267,103 @@ class TestSocketutil(unittest.TestCase):
         ss.close()
         cs.close()
 
+    def testSendVectored(self):
+        ss = SU.createSocket(bind=("localhost", 0))
+        port = ss.getsockname()[1]
+        cs = SU.createSocket(connect=("localhost", port))
+        payload = bytearray(b"x" * 200000)
+        SU.sendDataVectored(cs, [b"head", b"", memoryview(b"er"), payload])
+        cs.shutdown(socket.SHUT_WR)
+        a = ss.accept()
+        data = SU.receiveData(a[0], 6)
+        self.assertEqual(b"header", data)
+        data = SU.receiveData(a[0], len(payload))
+        self.assertEqual(payload, data)
+        a[0].close()
+        ss.close()
+        cs.close()
+
+    def testReceiveInto(self):
+        ss = SU.createSocket(bind=("localhost", 0))
+        port = ss.getsockname()[1]
+        cs = SU.createSocket(connect=("localhost", port))
+        SU.sendData(cs, b"x" * 100000 + b"abc")
+        cs.shutdown(socket.SHUT_WR)
+        a = ss.accept()
+        buf = bytearray(120000)
+        self.assertEqual(100000, SU.receiveDataInto(a[0], buf, 100000))
+        self.assertEqual(b"x" * 100000, buf[:100000])
+        self.assertEqual(bytearray(20000), buf[100000:])
+        buf = bytearray(10)
+        with self.assertRaises(errors.ConnectionClosedError) as x:
+            SU.receiveDataInto(a[0], buf)
+        self.assertEqual(b"abc", x.exception.partialData)
+        a[0].close()
+        ss.close()
+        cs.close()
+
+    def testBufferedReceive(self):
+        ss = SU.createSocket(bind=("localhost", 0))
+        port = ss.getsockname()[1]
+        cs = SU.createSocket(connect=("localhost", port))
+        msg1 = Pyro4.message.Message(Pyro4.message.MSG_INVOKE, b"hello", 42, 0, 1, {"TEST": b"abcde"})
+        msg2 = Pyro4.message.Message(Pyro4.message.MSG_INVOKE, b"y" * 100000, 42, 0, 2)
+        SU.sendData(cs, msg1.to_bytes() + msg2.to_bytes() + b"abc")
+        cs.shutdown(socket.SHUT_WR)
+        conn = SU.SocketConnection(ss.accept()[0])
+        msg = Pyro4.message.Message.recv(conn)
+        self.assertEqual(b"hello", msg.data)
+        self.assertEqual(b"abcde", msg.annotations["TEST"])
+        self.assertGreater(conn.pending(), 0)    # the start of the second message is already buffered
+        msg = Pyro4.message.Message.recv(conn)
+        self.assertEqual(2, msg.seq)
+        self.assertEqual(b"y" * 100000, msg.data)
+        msg.release_buffer()
+        self.assertEqual(b"ab", conn.recv(2))
+        with self.assertRaises(errors.ConnectionClosedError) as x:
+            conn.recv(10)
+        self.assertEqual(b"c", x.exception.partialData)
+        self.assertEqual(0, conn.pending())
+        conn.close()
+        ss.close()
+        cs.close()
+
+    def testPendingSSL(self):
+        class SSLSocketMock(object):
+            def pending(self):
+                return 5    # decrypted data that is buffered in the ssl socket
+
+        conn = SU.SocketConnection(SSLSocketMock(), keep_open=True)
+        self.assertEqual(5, conn.pending())
+
+    def testBufferPool(self):
+        pool = SU.BufferPool(min_size=65536)
+        self.assertEqual(65536, pool.size_class(65536))
+        self.assertEqual(65536 + 8192, pool.size_class(65537))
+        self.assertEqual(10 * 1024 * 1024, pool.size_class(10 * 1024 * 1024 - 1))
+        buf = pool.acquire(100000)
+        self.assertGreaterEqual(len(buf), 100000)
+        self.assertLess(len(buf), 100000 * 1.125)
+        pool.release(buf)
+        self.assertEqual(len(buf), pool.pooled_size)
+        self.assertIs(buf, pool.acquire(99000))
+        self.assertEqual(0, pool.pooled_size)
+        pool.release(bytearray(1000))   # too small, not pooled
+        self.assertEqual(0, pool.pooled_size)
+        old_size = config.BUFFER_POOL_SIZE
+        try:
+            config.BUFFER_POOL_SIZE = 0
+            pool.release(buf)
+            self.assertEqual(0, pool.pooled_size)
+        finally:
+            config.BUFFER_POOL_SIZE = old_size
+
+    def testCoalesceBuffers(self):
+        big = b"x" * 100000
+        chunks = list(SU._coalesceBuffers([b"a", b"b", big, b"", b"c", b"d"]))
+        self.assertEqual([b"ab", big, b"cd"], chunks)
+        self.assertIs(big, chunks[1])
+
     @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "unix domain sockets required")
     def testSendUnix(self):
         SOCKNAME = "test_unixsocket"
@@ -96,6 +96,56 @@ class PoolTests(unittest.TestCase):
             self.assertEqual(0, len(p.busy))
             self.assertEqual(config.THREADPOOL_SIZE_MIN, len(p.idle))
 
+    def testQueue(self):
+        config.THREADPOOL_QUEUE_SIZE = 2
+        with Pool() as p:
+            for i in range(config.THREADPOOL_SIZE + 2):
+                p.process(Job(str(i + 1)))
+            self.assertEqual(config.THREADPOOL_SIZE, len(p.busy))
+            self.assertEqual(2, len(p.queue))
+            with self.assertRaises(NoFreeWorkersError):
+                p.process(Job("toomuch"))
+            stats = p.stats()
+            self.assertEqual(2, stats["queue_depth"])
+            self.assertEqual(1, stats["rejected"])
+            time.sleep(JOB_TIME * 2.5)
+            stats = p.stats()
+            self.assertEqual(0, stats["queue_depth"])
+            self.assertEqual(config.THREADPOOL_SIZE + 2, stats["processed"])
+            self.assertEqual(2, stats["queued"])
+            self.assertGreater(stats["wait_time_max"], 0.05)
+            self.assertGreater(stats["wait_time_avg"], 0.05)
+
+    def testQueueTimeout(self):
+        config.THREADPOOL_QUEUE_TIMEOUT = JOB_TIME * 3
+        with Pool() as p:
+            for i in range(config.THREADPOOL_SIZE):
+                p.process(Job(str(i + 1)))
+            start = time.time()
+            p.process(SlowJob("waits for a free worker"))
+            self.assertGreater(time.time() - start, 0.05)
+            self.assertLessEqual(p.num_workers(), config.THREADPOOL_SIZE)
+            for i in range(config.THREADPOOL_SIZE - 1):
+                p.process(SlowJob(str(i + 1)))
+            config.THREADPOOL_QUEUE_TIMEOUT = 0.1
+            start = time.time()
+            with self.assertRaises(NoFreeWorkersError):
+                p.process(SlowJob("toomuch"))
+            self.assertGreater(time.time() - start, 0.09)
+
+    def testIdleTimeout(self):
+        config.THREADPOOL_IDLE_TIMEOUT = JOB_TIME * 2
+        with Pool() as p:
+            for i in range(config.THREADPOOL_SIZE):
+                p.process(Job(str(i + 1)))
+            time.sleep(JOB_TIME * 1.5)
+            self.assertEqual(config.THREADPOOL_SIZE, len(p.idle), "workers linger for a while after their job")
+            p.process(Job("reuses an idle worker"))
+            self.assertEqual(config.THREADPOOL_SIZE, p.num_workers())
+            time.sleep(JOB_TIME * 4)
+            self.assertEqual(0, len(p.busy))
+            self.assertEqual(config.THREADPOOL_SIZE_MIN, len(p.idle))
+
 
 class ServerCallback(core.Daemon):
     def __init__(self):
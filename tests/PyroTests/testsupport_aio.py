@@ -0,0 +1,61 @@
+"""
+Support code for the asyncio tests, this module requires Python 3.5 or newer.
+
+Pyro - Python Remote Objects.  Copyright by Irmen de Jong (irmen@razorvine.net).
+"""
+
+import asyncio
+from Pyro4 import expose, oneway, current_context
+from Pyro4.aio import AsyncProxy
+
+
+__all__ = ["CoroutineThing", "attachedLoopClient"]
+
+
+@expose
+class CoroutineThing(object):
+    def __init__(self):
+        self.oneway_calls = 0
+
+    def blocking(self, x):
+        return x
+
+    async def multiply(self, x, y):
+        await asyncio.sleep(0)
+        return x * y
+
+    async def delayAndId(self, delay, id):
+        await asyncio.sleep(delay)
+        return "slept for " + str(id)
+
+    async def fail(self):
+        await asyncio.sleep(0)
+        raise ValueError("coroutine failed")
+
+    async def iterator(self):
+        return iter(["one", "two"])
+
+    async def seq(self):
+        seq = current_context.seq
+        await asyncio.sleep(0.01)
+        return seq, current_context.seq
+
+    @oneway
+    async def oneway_call(self):
+        self.oneway_calls += 1
+
+
+async def attachedLoopClient(daemon, uri):
+    """
+    Calls the daemon that runs on the current event loop, then shuts it down.
+    Returns the call results and the number of client connections before and after the shutdown.
+    """
+    server = daemon.transportServer
+    proxy = AsyncProxy(uri)
+    results = await asyncio.gather(proxy.multiply(5, 11), proxy.blocking(42))
+    connections = [len(server.connections)]
+    daemon.shutdown()
+    await asyncio.sleep(0.1)
+    connections.append(len(server.connections))
+    await proxy._pyroRelease()
+    return results, connections